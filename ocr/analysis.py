@@ -0,0 +1,69 @@
+"""
+Resultado único de OCR de un tooltip.
+
+Una sola pasada de image_to_words sobre el recorte elegido produce un
+TooltipAnalysis con palabras, líneas, confianzas y texto crudo. El nombre, el
+trait y la fila del CSV se sacan de ese objeto, en vez de volver a llamar a
+tesseract en cada etapa.
+"""
+from dataclasses import dataclass, field
+from typing import List, Tuple
+
+from ocr.ocr_engine import image_to_words
+
+@dataclass
+class Line:
+    words: List[dict]                 # ordenadas por x
+    text: str
+    box: Tuple[int, int, int, int]    # x1,y1,x2,y2
+    conf: float                       # confianza media de sus palabras
+
+@dataclass
+class TooltipAnalysis:
+    words: List[dict]
+    lines: List[Line]
+    raw: str
+    size: Tuple[int, int]             # (ancho, alto) de la imagen analizada
+    lang: str = "eng"
+    psm: int = 6
+    meta: dict = field(default_factory=dict)
+
+    @property
+    def mean_conf(self) -> float:
+        confs = [w["conf"] for w in self.words if w["conf"] >= 0]
+        return sum(confs) / len(confs) if confs else -1.0
+
+    def line_texts(self) -> List[str]:
+        return [l.text for l in self.lines]
+
+def _box(words):
+    x1 = min(w["x"] for w in words); y1 = min(w["y"] for w in words)
+    x2 = max(w["x"] + w["w"] for w in words); y2 = max(w["y"] + w["h"] for w in words)
+    return (x1, y1, x2, y2)
+
+def from_words(words, size, lang: str = "eng", psm: int = 6) -> TooltipAnalysis:
+    """Agrupa palabras de tesseract en líneas (bloque, párrafo, línea) en orden de lectura."""
+    by_line = {}
+    for w in words:
+        by_line.setdefault((w["block"], w.get("par", 0), w["line"]), []).append(w)
+    lines = []
+    for key in sorted(by_line):
+        lw = sorted(by_line[key], key=lambda r: r["x"])
+        confs = [w["conf"] for w in lw if w["conf"] >= 0]
+        lines.append(Line(words=lw, text=" ".join(w["text"] for w in lw), box=_box(lw),
+                          conf=sum(confs) / len(confs) if confs else -1.0))
+    raw = "\n".join(l.text for l in lines)
+    return TooltipAnalysis(words=list(words), lines=lines, raw=raw, size=tuple(size), lang=lang, psm=psm)
+
+def analyze(img, lang: str = "eng", psm: int = 6, preprocess: str = "none") -> TooltipAnalysis:
+    """Una pasada de OCR sobre `img` (PIL o array); `preprocess` es el modo ya aplicado."""
+    size = (img.shape[1], img.shape[0]) if hasattr(img, "shape") else img.size
+    words = image_to_words(img, lang=lang, psm=psm, preprocess=preprocess)
+    return from_words(words, size, lang=lang, psm=psm)
+
+def scaled(analysis: TooltipAnalysis, factor: float) -> TooltipAnalysis:
+    """Copia con las cajas divididas por `factor` (p.ej. OCR hecho sobre un upsample 1.5x)."""
+    words = [dict(w, x=int(w["x"] / factor), y=int(w["y"] / factor),
+                  w=int(w["w"] / factor), h=int(w["h"] / factor)) for w in analysis.words]
+    size = (int(analysis.size[0] / factor), int(analysis.size[1] / factor))
+    return from_words(words, size, lang=analysis.lang, psm=analysis.psm)
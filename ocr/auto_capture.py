@@ -0,0 +1,187 @@
+"""
+Captura automática: dispara la captura completa cuando aparece un tooltip nuevo
+y se queda quieto, sin pulsar F12.
+
+Un hilo muestrea a ritmo fijo (config: auto_fps) un recorte pequeño junto al
+cursor (donde el juego pinta el tooltip), lo pasa a gris y lo reduce SCALE
+veces. Sobre esas miniaturas:
+
+  - mientras el mouse se mueve no se captura nada (solo se lee su posición);
+  - con el mouse quieto, diferencia media absoluta entre muestras seguidas:
+    STABLE_FRAMES muestras por debajo de STILL_DIFF = imagen estable;
+  - estable + "parece un panel" (fracción de píxeles oscuros >= PANEL_MIN) +
+    no es el mismo tooltip en el mismo sitio que ya se disparó -> on_trigger()
+    (en capture.py, pipeline.submit: grab a resolución completa + OCR);
+  - ya asentado, solo una muestra cada RECHECK_SECONDS para ver si el tooltip
+    apareció tarde o cambió (diferencia > CHANGE_DIFF).
+
+La comprobación de panel es un filtro barato, no una detección: el worker que
+procesa el frame descarta en silencio los automáticos sin tooltip. El ratón y
+la captura de pantalla son inyectables (mouse=, grab=) para probar sin pantalla.
+"""
+import time, threading
+from collections import deque
+from typing import Callable, Optional, Tuple
+
+import cv2
+import numpy as np
+
+from ocr import frames
+from ocr.tooltip_dedup import dhash, hamming
+
+# recorte de muestreo, relativo al cursor (el tooltip sale a su izquierda)
+SAMPLE_LEFT = 400
+SAMPLE_RIGHT = 8
+SAMPLE_TOP = 160
+SAMPLE_BOTTOM = 160
+SCALE = 4               # reducción de la muestra (INTER_AREA: media por bloques)
+
+FPS = 10
+MOVE_PX = 3             # desplazamiento del mouse que cuenta como movimiento
+STILL_DIFF = 2.0        # diferencia media (0-255) por debajo de la cual dos muestras son iguales
+CHANGE_DIFF = 6.0       # ya asentado: diferencia que indica tooltip nuevo/cambiado
+STABLE_FRAMES = 3
+RECHECK_SECONDS = 0.5
+DARK_PANEL_MAX = 60     # como detect_tooltip_cv: gris por debajo = fondo de panel
+PANEL_MIN = 0.5         # fracción mínima de píxeles de panel en la muestra
+
+SIG_SIZE = 8            # dHash 8x8 de la muestra para no repetir el mismo tooltip
+SIG_MAX_DISTANCE = 10
+SAME_SPOT_PX = 48
+RECENT = 256
+
+def _default_mouse():
+    import pyautogui
+    return pyautogui.position()
+
+def sample_bbox(mouse: Tuple[int, int]) -> Tuple[int, int, int, int]:
+    x, y = mouse
+    return (max(0, x - SAMPLE_LEFT), max(0, y - SAMPLE_TOP), x + SAMPLE_RIGHT, y + SAMPLE_BOTTOM)
+
+def diff(a: np.ndarray, b: np.ndarray) -> float:
+    """Diferencia media absoluta entre dos muestras (inf si cambió el tamaño)."""
+    if a.shape != b.shape:
+        return float("inf")
+    return float(np.abs(a.astype(np.int16) - b).mean())
+
+def panel_fraction(g: np.ndarray) -> float:
+    return float((g < DARK_PANEL_MAX).mean())
+
+class AutoCapture:
+    def __init__(self, on_trigger: Callable[[], object], fps: int = FPS,
+                 mouse: Callable[[], Tuple[int, int]] = None, grab: Callable = None):
+        self.on_trigger = on_trigger
+        self.period = 1.0 / max(1, fps)
+        self.mouse = mouse or _default_mouse
+        self.grab = grab or frames.grab
+        self.recent = deque(maxlen=RECENT)   # (x, y, firma) de lo ya disparado
+        self._stop = threading.Event()
+        self._paused = threading.Event()
+        self._thread = None
+        self._reset(None)
+        self.ticks = self.samples = self.triggers = self.repeats = self.no_panel = 0
+        self.cpu_s = self.wall_s = 0.0
+
+    def _reset(self, pos):
+        self.pos = pos
+        self.prev = None
+        self.stable = 0
+        self.settled = False
+        self.last_sample = 0.0
+
+    def sample(self, pos) -> np.ndarray:
+        g = frames.gray(self.grab(sample_bbox(pos)))
+        if SCALE > 1:
+            g = cv2.resize(g, (g.shape[1] // SCALE, g.shape[0] // SCALE), interpolation=cv2.INTER_AREA)
+        self.samples += 1
+        return g
+
+    def step(self, now: float = None):
+        """Un tick del muestreo (el hilo lo llama cada 1/fps s; público para pruebas)."""
+        now = time.perf_counter() if now is None else now
+        self.ticks += 1
+        pos = tuple(self.mouse())
+        if self.pos is None or max(abs(pos[0] - self.pos[0]), abs(pos[1] - self.pos[1])) > MOVE_PX:
+            self._reset(pos)   # en movimiento: ni se captura
+            return
+        if self.settled and now - self.last_sample < RECHECK_SECONDS:
+            return
+        g = self.sample(pos)
+        self.last_sample = now
+        prev, self.prev = self.prev, g
+        if prev is None:
+            return
+        d = diff(g, prev)
+        if self.settled:
+            if d > CHANGE_DIFF:   # apareció o cambió el tooltip con el mouse quieto
+                self.settled = False
+                self.stable = 0
+            return
+        self.stable = self.stable + 1 if d <= STILL_DIFF else 0
+        if self.stable >= STABLE_FRAMES:
+            self.settled = True
+            self._maybe_trigger(pos, g)
+
+    def _maybe_trigger(self, pos, g):
+        if panel_fraction(g) < PANEL_MIN:
+            self.no_panel += 1
+            return
+        sig = dhash(g, SIG_SIZE)
+        for x, y, s in self.recent:
+            if (abs(x - pos[0]) <= SAME_SPOT_PX and abs(y - pos[1]) <= SAME_SPOT_PX
+                    and hamming(s, sig) <= SIG_MAX_DISTANCE):
+                self.repeats += 1   # el mismo item otra vez bajo el cursor: no se cuenta dos veces
+                return
+        self.recent.append((pos[0], pos[1], sig))
+        self.triggers += 1
+        self.on_trigger()
+
+    def _run(self):
+        wall0, cpu0 = time.perf_counter(), time.thread_time()
+        next_t = wall0
+        while not self._stop.is_set():
+            if not self._paused.is_set():
+                try:
+                    self.step()
+                except Exception as e:  # p.ej. la captura de pantalla falla un instante
+                    print(f"[auto] {type(e).__name__}: {e}")
+                    self._reset(None)
+            next_t += self.period
+            delay = next_t - time.perf_counter()
+            if delay < 0:   # nos retrasamos: no acumular ticks
+                next_t, delay = time.perf_counter(), 0
+            self._stop.wait(delay)
+            self.wall_s = time.perf_counter() - wall0
+            self.cpu_s = time.thread_time() - cpu0
+
+    def start(self):
+        if self._thread is None:
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="auto-capture", daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self, timeout: Optional[float] = 2.0):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def toggle(self) -> bool:
+        """Pausa/reanuda; devuelve True si queda activo."""
+        if self._paused.is_set():
+            self._reset(None)
+            self._paused.clear()
+            return True
+        self._paused.set()
+        return False
+
+    def stats(self) -> dict:
+        return {"ticks": self.ticks, "samples": self.samples, "triggers": self.triggers,
+                "repeats": self.repeats, "no_panel": self.no_panel,
+                "cpu_pct": 100.0 * self.cpu_s / self.wall_s if self.wall_s else 0.0}
+
+    def format_stats(self) -> str:
+        s = self.stats()
+        return (f"Auto-captura: {s['triggers']} disparos, {s['repeats']} repetidos, {s['no_panel']} sin panel  |  "
+                f"{s['samples']} muestras en {s['ticks']} ticks  |  CPU del muestreo {s['cpu_pct']:.1f} %")
@@ -0,0 +1,158 @@
+"""
+Re-OCR por lotes de capturas ya guardadas (por defecto data/snaps/tooltip_*.{png,webp,jpg}).
+
+Pasa cada imagen por un pool de procesos que detecta el tooltip (detect_tooltip_cv)
+y aplica parse_tooltip sobre el recorte. Las filas se escriben al CSV de salida a
+medida que llegan, así que si se interrumpe basta con relanzar el mismo comando:
+las imágenes que ya están en el CSV se saltan.
+
+Con --archive las imágenes salen del archivo de pack files (ocr/snapshot_archive.py)
+en vez de archivos sueltos: una vez por contenido, sin detección (ya son recortes)
+y con la referencia archive:<hash> en tooltip_img.
+
+Uso:
+    python ocr/batch_reocr.py [dir|glob ...] [--out data/inventory_reocr.csv] [--workers N]
+    python ocr/batch_reocr.py --archive [--item X] [--since ISO] [--out ...]
+"""
+import os, re, sys, csv, time, argparse
+from datetime import datetime
+from multiprocessing import Pool
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(ROOT)
+
+SNAPS_DIR = os.path.join(ROOT, "data", "snaps")
+DEFAULT_OUT = os.path.join(ROOT, "data", "inventory_reocr.csv")
+HEADER = ["item_name", "trait", "qty", "slot_img", "tooltip_img", "last_seen"]
+
+def expand_inputs(inputs):
+    """Directorios -> sus tooltip_*.{png,webp,jpg}; el resto se trata como glob. Orden estable."""
+    from ocr.snapshot_writer import snapshot_paths
+    return snapshot_paths(inputs or [SNAPS_DIR])
+
+def already_done(out_csv):
+    """Rutas ya procesadas en una corrida anterior (columna tooltip_img)."""
+    if not os.path.exists(out_csv):
+        return set()
+    with open(out_csv, "r", newline="", encoding="utf-8") as f:
+        return {row["tooltip_img"] for row in csv.DictReader(f) if row.get("tooltip_img")}
+
+def snap_time(path):
+    """Fecha de captura desde el nombre tooltip_YYYYmmdd_HHMMSS[_mmm].png (o mtime)."""
+    m = re.search(r"(\d{8}_\d{6})", os.path.basename(path))
+    if m:
+        return datetime.strptime(m.group(1), "%Y%m%d_%H%M%S").isoformat(timespec="seconds")
+    return datetime.fromtimestamp(os.path.getmtime(path)).isoformat(timespec="seconds")
+
+# --- Worker -----------------------------------------------------------------
+
+_lang = "eng"
+_detect = True
+
+def _init_worker(detect):
+    """Se ejecuta una vez por proceso: importa OCR/CV y deja el motor caliente."""
+    global _lang, _detect
+    from ocr.config import get_config
+    from ocr.ocr_engine import configure_cache
+    cfg = get_config()
+    _lang = cfg["language"]
+    _detect = detect
+    configure_cache(cfg["ocr_cache"], cfg["ocr_cache_max_entries"])
+
+def _read(img):
+    """item_name/trait con el mismo criterio que la captura en vivo (anclas y, si no, parse_tooltip)."""
+    from ocr.parse_tooltip import parse_tooltip
+    from ocr.detect_from_mouse_roi import item_and_trait
+    item_name, trait, _, _ = item_and_trait(img, parse_tooltip(img, lang=_lang))
+    return item_name, trait
+
+def _process(path):
+    from PIL import Image
+    from ocr.snapshot_archive import REF_PREFIX
+    t0 = time.perf_counter()
+    try:
+        if path.startswith(REF_PREFIX):
+            return _process_archived(path, t0)
+        img = Image.open(path).convert("RGB")
+        if _detect:
+            from ocr.detect_tooltip_cv import locate_tooltip
+            # Sin posición de mouse: se permite cualquier candidato de la imagen
+            cand = locate_tooltip(img, (img.width, img.height // 2), (0, 0, img.width, img.height))
+            if cand:
+                img = img.crop(cand.box)
+        item_name, trait = _read(img)
+        row = [item_name, trait, 1, "", path, snap_time(path)]
+        return path, row, None, time.perf_counter() - t0
+    except Exception as e:
+        return path, None, f"{type(e).__name__}: {e}", time.perf_counter() - t0
+
+def _process_archived(ref, t0):
+    """Recorte del archivo de pack files: lectura por mmap, sin detección."""
+    from ocr.snapshot_archive import get_archive
+    archive = get_archive()
+    img = archive.get(ref)
+    seen = datetime.fromtimestamp(archive.record(archive.index_of(ref))["time"]).isoformat(timespec="seconds")
+    item_name, trait = _read(img)
+    row = [item_name, trait, 1, "", ref, seen]
+    return ref, row, None, time.perf_counter() - t0
+
+def archive_inputs(item=None, since=None):
+    """Referencias únicas del archivo (una por contenido), de la más antigua a la más reciente."""
+    from ocr.snapshot_archive import get_archive
+    archive = get_archive()
+    t = datetime.fromisoformat(since).timestamp() if since else None
+    refs = [archive.record(i)["ref"] for i in archive.find(item=item, since=t)]
+    return list(dict.fromkeys(refs))
+
+# --- Main -------------------------------------------------------------------
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Re-OCR por lotes de tooltips guardados")
+    ap.add_argument("inputs", nargs="*", help="directorios o globs (default: data/snaps)")
+    ap.add_argument("--out", default=DEFAULT_OUT, help="CSV de salida (se reanuda si existe)")
+    ap.add_argument("--workers", type=int, default=max(1, (os.cpu_count() or 2) - 1))
+    ap.add_argument("--no-detect", action="store_true", help="OCR de la imagen completa, sin buscar el tooltip")
+    ap.add_argument("--restart", action="store_true", help="ignora el CSV existente y empieza de cero")
+    ap.add_argument("--archive", action="store_true", help="leer del archivo de pack files (data/archive)")
+    ap.add_argument("--item", help="con --archive: solo las capturas de este item")
+    ap.add_argument("--since", help="con --archive: solo desde esta fecha ISO")
+    args = ap.parse_args(argv)
+
+    paths = archive_inputs(args.item, args.since) if args.archive else expand_inputs(args.inputs)
+    if not paths:
+        print("No hay imágenes que procesar.")
+        return 1
+    if args.restart and os.path.exists(args.out):
+        os.remove(args.out)
+    done = already_done(args.out)
+    todo = [p for p in paths if p not in done]
+    print(f"{len(paths)} imágenes, {len(paths) - len(todo)} ya procesadas, {len(todo)} pendientes")
+    if not todo:
+        return 0
+
+    new_file = not os.path.exists(args.out)
+    ok = failed = 0
+    t_start = time.perf_counter()
+    with open(args.out, "a", newline="", encoding="utf-8") as f, \
+         Pool(args.workers, initializer=_init_worker, initargs=(not args.no_detect,)) as pool:
+        writer = csv.writer(f)
+        if new_file:
+            writer.writerow(HEADER)
+        for path, row, err, secs in pool.imap_unordered(_process, todo):
+            if err:
+                failed += 1
+                print(f"[-] {os.path.basename(path)}: {err}")
+                continue
+            writer.writerow(row)
+            f.flush()  # cada fila queda en disco: se puede reanudar tras Ctrl+C
+            ok += 1
+            elapsed = time.perf_counter() - t_start
+            print(f"[{ok + failed}/{len(todo)}] {os.path.basename(path)} ({secs:.2f}s)  {ok / elapsed:.2f} img/s")
+
+    elapsed = time.perf_counter() - t_start
+    print(f"\nListo: {ok} ok, {failed} con error en {elapsed:.1f}s "
+          f"({ok / elapsed if elapsed else 0:.2f} img/s, {args.workers} workers) -> {args.out}")
+    return 0 if ok or not failed else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
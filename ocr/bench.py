@@ -0,0 +1,205 @@
+"""
+Benchmark de latencia y acierto sobre las capturas guardadas (data/snaps/tooltip_*.{png,webp,jpg}).
+
+Cada imagen pasa por las etapas del flujo real, cada una cronometrada por separado:
+
+    find_tooltip_rect      contornos + OCR de los top-K sobre la captura completa
+    locate_tooltip         plantillas de esquinas (y contornos si fallan)
+    _preprocess            preprocesado de config (ocr_preprocess) sobre el recorte
+    parse_tooltip          preprocesado + OCR + heurísticas sobre el recorte
+    detect_name_and_trait  anclas sobre el análisis ya hecho (sin OCR)
+
+Por etapa se da p50/p95, llamadas a tesseract por imagen y pico de memoria
+(tracemalloc, en una pasada aparte para no ensuciar los tiempos; solo ve la
+memoria de Python/NumPy, no la interna de tesseract). El nombre/trait
+final se compara con data/bench_truth.json ({"archivo.png": {"item_name", "trait"}}).
+
+El resultado (JSON) se añade como una línea a cache/bench_history.jsonl y se
+compara con la ejecución anterior, así las regresiones se ven entre corridas.
+La caché de OCR se desactiva salvo con --cache, para medir a tesseract de verdad.
+
+Uso:
+    python ocr/bench.py [dir|glob ...] [--repeat 3] [--truth data/bench_truth.json]
+                        [--out cache/bench_history.jsonl] [--cache] [--no-rect]
+"""
+import os, sys, json, time, argparse, subprocess, tracemalloc
+from datetime import datetime
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(ROOT)
+
+from PIL import Image
+from ocr.batch_reocr import expand_inputs, SNAPS_DIR
+from ocr.config import get_config
+from ocr.ocr_engine import configure_cache, stats as ocr_stats, BACKEND
+from ocr.detect_tooltip_cv import find_tooltip_rect, locate_tooltip
+from ocr.parse_tooltip import parse_tooltip, _preprocess
+from ocr.detect_from_mouse_roi import detect_name_and_trait
+from ocr.normalizer import norm
+
+TRUTH_PATH = os.path.join(ROOT, "data", "bench_truth.json")
+HISTORY_PATH = os.path.join(ROOT, "cache", "bench_history.jsonl")
+
+STAGES = ["find_tooltip_rect", "locate_tooltip", "_preprocess", "parse_tooltip", "detect_name_and_trait"]
+
+def pct(values, p):
+    if not values:
+        return 0.0
+    v = sorted(values)
+    return v[min(len(v) - 1, int(round(p / 100.0 * (len(v) - 1))))]
+
+def git_rev():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True,
+                              text=True, timeout=5).stdout.strip() or None
+    except Exception:
+        return None
+
+class Stage:
+    """Acumula tiempos, llamadas a tesseract y pico de memoria de una etapa."""
+
+    def __init__(self):
+        self.ms = []
+        self.calls = []
+        self.peak_kb = 0.0
+
+    def run(self, fn, *args, trace=False, **kwargs):
+        if trace:
+            tracemalloc.reset_peak()
+            base = tracemalloc.get_traced_memory()[0]
+            out = fn(*args, **kwargs)
+            self.peak_kb = max(self.peak_kb, (tracemalloc.get_traced_memory()[1] - base) / 1024)
+            return out
+        c0 = ocr_stats()["calls"]
+        t0 = time.perf_counter()
+        out = fn(*args, **kwargs)
+        self.ms.append((time.perf_counter() - t0) * 1000)
+        self.calls.append(ocr_stats()["calls"] - c0)
+        return out
+
+    def summary(self) -> dict:
+        return {
+            "n": len(self.ms),
+            "p50_ms": round(pct(self.ms, 50), 2), "p95_ms": round(pct(self.ms, 95), 2),
+            "mean_ms": round(sum(self.ms) / len(self.ms), 2) if self.ms else 0.0,
+            "tesseract_calls": round(sum(self.calls) / len(self.calls), 2) if self.calls else 0.0,
+            "peak_kb": round(self.peak_kb, 1),
+        }
+
+def run_image(path, stages, cfg, rect=True, trace=False):
+    """Una pasada de todas las etapas sobre una captura; devuelve nombre/trait final."""
+    img = Image.open(path).convert("RGB")
+    w, h = img.size
+    mouse, bbox = (w, h // 2), (0, 0, w, h)  # como batch_reocr: sin mouse, tooltip a la izquierda
+    if rect:
+        stages["find_tooltip_rect"].run(find_tooltip_rect, img, mouse, bbox, trace=trace)
+    cand = stages["locate_tooltip"].run(locate_tooltip, img, mouse, bbox, trace=trace)
+    crop = img.crop(cand.box) if cand else img
+    stages["_preprocess"].run(_preprocess, crop, cfg["ocr_preprocess"], trace=trace)
+    ocr = stages["parse_tooltip"].run(parse_tooltip, crop, lang=cfg["language"], trace=trace)
+    name, _, trait, _ = stages["detect_name_and_trait"].run(detect_name_and_trait, crop, ocr["analysis"],
+                                                            trace=trace)
+    # mismo criterio que capture.append_inventory_row
+    return {"item_name": name or ocr.get("item_name") or "", "trait": trait or ocr.get("trait") or "",
+            "box": list(cand.box) if cand else None}
+
+def last_run(path):
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            lines = [l for l in f if l.strip()]
+        return json.loads(lines[-1]) if lines else None
+    except (OSError, ValueError):
+        return None
+
+def print_report(res, prev=None):
+    print(f"\n{res['images']} imágenes x {res['repeat']}  |  backend {res['backend']}  |  "
+          f"preprocess {res['preprocess']!r}  |  caché OCR {'sí' if res['ocr_cache'] else 'no'}")
+    print(f"{'etapa':24s} {'p50 ms':>9s} {'p95 ms':>9s} {'tess/img':>9s} {'pico KB':>9s}")
+    for name, s in res["stages"].items():
+        delta = ""
+        old = (prev or {}).get("stages", {}).get(name)
+        if old and old.get("p50_ms"):
+            delta = f"  ({(s['p50_ms'] - old['p50_ms']) / old['p50_ms'] * 100:+.0f}% p50)"
+        print(f"{name:24s} {s['p50_ms']:9.1f} {s['p95_ms']:9.1f} {s['tesseract_calls']:9.2f} {s['peak_kb']:9.0f}{delta}")
+    acc = res["accuracy"]
+    if acc["total"]:
+        line = f"\nAcierto: nombre {acc['name']}/{acc['total']}, trait {acc['trait']}/{acc['total']}"
+        if prev and prev.get("accuracy", {}).get("total"):
+            pa = prev["accuracy"]
+            line += f"  (antes {pa['name']}/{pa['total']}, {pa['trait']}/{pa['total']})"
+        print(line)
+        for it in res["items"]:
+            if "ok_name" in it and not (it["ok_name"] and it["ok_trait"]):
+                print(f"  {os.path.basename(it['path'])}: {it['item_name']!r} / {it['trait']!r}  "
+                      f"esperado {it['expected']['item_name']!r} / {it['expected']['trait']!r}")
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Benchmark de detección/OCR sobre data/snaps.")
+    ap.add_argument("inputs", nargs="*", default=[SNAPS_DIR], help="directorios o globs (por defecto data/snaps)")
+    ap.add_argument("--repeat", type=int, default=3, help="pasadas cronometradas por imagen")
+    ap.add_argument("--truth", default=TRUTH_PATH, help="JSON con el nombre/trait esperado por imagen")
+    ap.add_argument("--out", default=HISTORY_PATH, help="JSONL donde se añade el resultado")
+    ap.add_argument("--cache", action="store_true", help="mantener la caché de OCR (mide aciertos, no tesseract)")
+    ap.add_argument("--no-rect", action="store_true", help="saltar find_tooltip_rect (la etapa más lenta)")
+    args = ap.parse_args(argv)
+
+    paths = expand_inputs(args.inputs)
+    if not paths:
+        print("No hay imágenes que medir.")
+        return 1
+    try:
+        with open(args.truth, "r", encoding="utf-8-sig") as f:
+            truth = json.load(f)
+    except FileNotFoundError:
+        truth = {}
+
+    cfg = get_config()
+    configure_cache(args.cache, cfg["ocr_cache_max_entries"])
+    stages = {name: Stage() for name in STAGES if not (args.no_rect and name == "find_tooltip_rect")}
+    rect = not args.no_rect
+
+    # pasada de calentamiento (carga de traineddata, plantillas, vocabularios): no cuenta
+    run_image(paths[0], {name: Stage() for name in stages}, cfg, rect)
+
+    items = []
+    for path in paths:
+        for i in range(max(1, args.repeat)):
+            out = run_image(path, stages, cfg, rect)
+        print(f"  {os.path.basename(path)}: {out['item_name']!r} / {out['trait']!r}")
+        item = {"path": os.path.relpath(path, ROOT), **out}
+        exp = truth.get(os.path.basename(path))
+        if exp:
+            item["expected"] = exp
+            item["ok_name"] = norm(out["item_name"]) == norm(exp.get("item_name", ""))
+            item["ok_trait"] = norm(out["trait"]) == norm(exp.get("trait", ""))
+        items.append(item)
+
+    # pico de memoria por etapa en una pasada aparte (tracemalloc ralentiza)
+    tracemalloc.start()
+    for path in paths:
+        run_image(path, stages, cfg, rect, trace=True)
+    tracemalloc.stop()
+
+    judged = [it for it in items if "ok_name" in it]
+    res = {
+        "time": datetime.now().isoformat(timespec="seconds"),
+        "git": git_rev(), "backend": BACKEND,
+        "preprocess": cfg["ocr_preprocess"], "psm": cfg["ocr_psm"], "ocr_cache": args.cache,
+        "images": len(paths), "repeat": max(1, args.repeat),
+        "stages": {name: st.summary() for name, st in stages.items()},
+        "accuracy": {"total": len(judged),
+                     "name": sum(it["ok_name"] for it in judged),
+                     "trait": sum(it["ok_trait"] for it in judged)},
+        "items": items,
+    }
+
+    prev = last_run(args.out)
+    print_report(res, prev)
+    os.makedirs(os.path.dirname(os.path.abspath(args.out)), exist_ok=True)
+    with open(args.out, "a", encoding="utf-8") as f:
+        f.write(json.dumps(res, ensure_ascii=False) + "\n")
+    print(f"\nResultado añadido a {args.out}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,402 @@
+"""
+Escaneo de una bolsa entera: se detecta la rejilla de casillas una vez y se
+recorre casilla a casilla, con el OCR en paralelo al recorrido.
+
+1) detect_grids(): sobre una captura de pantalla, bordes (Canny) -> contornos
+   cuadrados del tamaño de casilla más frecuente -> rejillas (origen, paso,
+   filas x columnas). Las casillas vacías (casi sin varianza) se saltan.
+2) Por casilla, la fuente de frames pone el mouse en su centro (o, en
+   diferido, lee el frame grabado) y entrega un Frame al CapturePipeline.
+   Los workers localizan el tooltip, hacen OCR y lo pasan al inventario
+   mientras la fuente ya va por las siguientes casillas.
+3) El tooltip sale siempre a la misma distancia horizontal de la casilla: el
+   primero se localiza en la pantalla completa y de él se aprende la colocación
+   (TooltipPlacement). A partir de ahí solo se captura y se busca en la franja
+   donde tiene que estar; si ahí no aparece, se olvida lo aprendido y la
+   siguiente casilla vuelve a capturarse completa.
+
+Sin pantalla se puede reproducir una grabación: --record DIR guarda cada frame
+(slot_rFF_cCC.png) y frames.jsonl con su bbox/mouse/casilla; "replay DIR" los
+pasa por el mismo camino. Imágenes sueltas sin frames.jsonl se tratan como
+pantallas completas (casilla por nombre si lo tiene; si no, mouse a la derecha).
+
+Uso:
+    python ocr/bulk_scan.py grid IMG
+    python ocr/bulk_scan.py live [--grid -1] [--hover 0.35] [--workers N] [--record DIR] [--no-store]
+    python ocr/bulk_scan.py replay DIR|glob ... [--grid -1] [--workers N] [--no-store]
+"""
+import os, re, sys, json, glob, time, argparse, threading
+from collections import Counter
+from dataclasses import dataclass
+from typing import Iterator, List, Optional, Tuple
+
+import cv2
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(ROOT)
+from ocr.capture_pipeline import CapturePipeline, Frame
+from ocr.config import get_config
+from ocr.ocr_engine import configure_cache
+from ocr.detect_tooltip_cv import locate_tooltip
+from ocr.parse_tooltip import parse_tooltip
+from ocr.detect_from_mouse_roi import item_and_trait
+from ocr.tooltip_dedup import DedupIndex, dhash, text_rows
+from ocr.inventory_store import get_store
+from ocr.snapshot_writer import get_writer
+from ocr import frames
+
+CELL_MIN = 50            # lado (px) mínimo/máximo de una casilla
+CELL_MAX = 140
+CELL_SQUARE_TOL = 0.10   # |ancho - alto| <= 10 % del lado
+CELL_SIZE_TOL = 6        # px respecto al tamaño de casilla más frecuente
+MERGE_PX = 6             # dos contornos a menos de esto son la misma casilla
+MIN_CELLS = 6            # casillas para aceptar una rejilla
+LATTICE_TOL = 0.15       # desfase máximo (en pasos) de una casilla respecto a la rejilla
+EMPTY_STD = 4.0          # desviación típica (gris) de una casilla vacía: ~0.5; con icono > 8
+
+HOVER_SECONDS = 0.35     # espera tras mover el mouse a que el juego pinte el tooltip
+BAND_MARGIN = 40         # holgura (px) de la franja donde se espera el tooltip
+
+SLOT_NAME = re.compile(r"slot_r(\d+)_c(\d+)")
+
+@dataclass
+class Grid:
+    x: int               # origen (esquina sup. izq. de la primera casilla), coords de pantalla
+    y: int
+    pitch_x: float
+    pitch_y: float
+    cell: int            # lado de la casilla
+    cols: int
+    rows: int
+
+    def cell_box(self, r: int, c: int) -> Tuple[int, int, int, int]:
+        x1 = int(round(self.x + c * self.pitch_x))
+        y1 = int(round(self.y + r * self.pitch_y))
+        return x1, y1, x1 + self.cell, y1 + self.cell
+
+    def center(self, r: int, c: int) -> Tuple[int, int]:
+        x1, y1, x2, y2 = self.cell_box(r, c)
+        return (x1 + x2) // 2, (y1 + y2) // 2
+
+    def slots(self) -> Iterator[Tuple[int, int]]:
+        for r in range(self.rows):
+            for c in range(self.cols):
+                yield r, c
+
+def _cell_rects(gray: np.ndarray) -> List[Tuple[int, int, int, int]]:
+    edges = cv2.Canny(gray, 40, 120)
+    cnts, _ = cv2.findContours(edges, cv2.RETR_LIST, cv2.CHAIN_APPROX_SIMPLE)
+    rects = [cv2.boundingRect(c) for c in cnts]
+    rects = [r for r in rects if CELL_MIN <= r[2] <= CELL_MAX and abs(r[2] - r[3]) <= CELL_SQUARE_TOL * r[2]]
+    if not rects:
+        return []
+    size = Counter(r[2] // 4 for r in rects).most_common(1)[0][0] * 4 + 2
+    cells = []
+    for r in sorted(rects):
+        if abs(r[2] - size) > CELL_SIZE_TOL:
+            continue
+        if not any(abs(r[0] - c[0]) <= MERGE_PX and abs(r[1] - c[1]) <= MERGE_PX for c in cells):
+            cells.append(r)
+    return cells
+
+def _pitch(values, cell: int) -> Optional[float]:
+    values = sorted(set(values))
+    diffs = [b - a for a, b in zip(values, values[1:]) if cell < b - a < 2 * cell]
+    return float(np.median(diffs)) if diffs else None
+
+def _axis(values, pitch: float):
+    """(inicio, n, paso) del eje: la fase que más casillas explica manda; el resto es ruido."""
+    def inliers(ref):
+        return [v for v in values if abs((v - ref) / pitch - round((v - ref) / pitch)) <= LATTICE_TOL]
+    best = max((inliers(ref) for ref in set(values)), key=len)
+    lo, hi = min(best), max(best)
+    n = int(round((hi - lo) / pitch)) + 1
+    return lo, n, (hi - lo) / (n - 1) if n > 1 else pitch
+
+def detect_grids(img, offset: Tuple[int, int] = (0, 0)) -> List[Grid]:
+    """Rejillas de casillas de la imagen, de izquierda a derecha (coords + offset)."""
+    gray = frames.gray(img)
+    cells = _cell_rects(gray)
+    if len(cells) < MIN_CELLS:
+        return []
+    cell = int(np.median([c[2] for c in cells]))
+    reach = 1.6 * cell   # vecinas: a menos de ~un paso (paso ≈ 1.1 casillas)
+
+    # componentes conexas de casillas vecinas = una rejilla cada una
+    groups, todo = [], set(range(len(cells)))
+    while todo:
+        stack, group = [todo.pop()], []
+        while stack:
+            i = stack.pop()
+            group.append(cells[i])
+            near = [j for j in todo if abs(cells[j][0] - cells[i][0]) <= reach and abs(cells[j][1] - cells[i][1]) <= reach]
+            for j in near:
+                todo.discard(j)
+                stack.append(j)
+        if len(group) >= MIN_CELLS:
+            groups.append(group)
+
+    grids = []
+    for group in groups:
+        xs = [c[0] for c in group]
+        ys = [c[1] for c in group]
+        # casillas cuadradas: el mismo paso en los dos ejes; el menor evita que
+        # iconos sueltos (p.ej. los del set en un tooltip encima) lo estiren
+        found = [p for p in (_pitch(xs, cell), _pitch(ys, cell)) if p]
+        if not found:
+            continue
+        x0, cols, px = _axis(xs, min(found))
+        y0, rows, py = _axis(ys, min(found))
+        grids.append(Grid(x0 + offset[0], y0 + offset[1], px, py, cell, cols, rows))
+    return sorted(grids, key=lambda g: g.x)
+
+def occupied(gray: np.ndarray, grid: Grid, r: int, c: int, offset: Tuple[int, int] = (0, 0)) -> bool:
+    x1, y1, x2, y2 = grid.cell_box(r, c)
+    m = max(2, grid.cell // 16)   # sin el borde de la casilla
+    patch = gray[y1 - offset[1] + m:y2 - offset[1] - m, x1 - offset[0] + m:x2 - offset[0] - m]
+    return patch.size > 0 and float(patch.std()) > EMPTY_STD
+
+class TooltipPlacement:
+    """Dónde sale el tooltip respecto a la casilla, aprendido del primero que se localiza."""
+
+    def __init__(self):
+        self.dx = None       # borde derecho del tooltip - borde izquierdo de la casilla
+        self.width = None
+        self._lock = threading.Lock()
+
+    def learn(self, cell_box, tip_box):
+        with self._lock:
+            self.dx = tip_box[2] - cell_box[0]
+            self.width = tip_box[2] - tip_box[0]
+
+    def forget(self):
+        with self._lock:
+            self.dx = self.width = None
+
+    def band(self, cell_box, screen: Tuple[int, int]) -> Optional[Tuple[int, int, int, int]]:
+        """bbox de pantalla (franja a toda altura) donde debe estar el tooltip; None si no se sabe."""
+        with self._lock:
+            if self.dx is None:
+                return None
+            x2 = cell_box[0] + self.dx + BAND_MARGIN
+            x1 = x2 - self.width - 2 * BAND_MARGIN
+        x1, x2 = max(0, x1), min(screen[0], max(x2, cell_box[2]))  # el mouse (casilla) dentro
+        return (x1, 0, x2, screen[1]) if x2 - x1 > 2 * BAND_MARGIN else None
+
+# --- fuentes de frames ------------------------------------------------------
+
+class LiveSlots:
+    """Mueve el mouse por cada casilla ocupada y captura la franja del tooltip."""
+
+    def __init__(self, grid: Grid, slots, placement: TooltipPlacement, hover: float = HOVER_SECONDS,
+                 record_dir: Optional[str] = None):
+        import pyautogui
+        self.pyautogui = pyautogui
+        self.grid = grid
+        self.slots = list(slots)
+        self.placement = placement
+        self.hover = hover
+        self.screen = tuple(pyautogui.size())
+        self.record_dir = record_dir
+        if record_dir:
+            os.makedirs(record_dir, exist_ok=True)
+
+    def __len__(self):
+        return len(self.slots)
+
+    def __iter__(self):
+        for r, c in self.slots:
+            mouse = self.grid.center(r, c)
+            self.pyautogui.moveTo(*mouse)
+            time.sleep(self.hover)
+            bbox = self.placement.band(self.grid.cell_box(r, c), self.screen) or (0, 0) + self.screen
+            img = frames.grab(bbox)
+            if self.record_dir:
+                self._record(img, bbox, mouse, (r, c))
+            yield Frame(image=img, bbox=bbox, mouse=mouse, source="bulk", slot=(r, c))
+        self.pyautogui.moveTo(self.screen[0] // 2, 10)  # que el último tooltip no tape nada
+
+    def _record(self, img, bbox, mouse, slot):
+        name = f"slot_r{slot[0]:02d}_c{slot[1]:02d}.png"
+        get_writer().write(img, os.path.join(self.record_dir, name))
+        with open(os.path.join(self.record_dir, "frames.jsonl"), "a", encoding="utf-8") as f:
+            f.write(json.dumps({"file": name, "bbox": list(bbox), "mouse": list(mouse), "slot": list(slot)}) + "\n")
+
+class RecordedFrames:
+    """Reproduce una grabación de LiveSlots (frames.jsonl) o capturas sueltas de pantalla completa."""
+
+    def __init__(self, paths: List[str], grid_index: int = -1):
+        self.items = []
+        for p in paths:
+            index = os.path.join(p, "frames.jsonl") if os.path.isdir(p) else None
+            if index and os.path.exists(index):
+                with open(index, "r", encoding="utf-8") as f:
+                    for line in f:
+                        if line.strip():
+                            rec = json.loads(line)
+                            self.items.append((os.path.join(p, rec["file"]), tuple(rec["bbox"]),
+                                               tuple(rec["mouse"]), tuple(rec["slot"])))
+                continue
+            files = sorted(glob.glob(os.path.join(p, "*.png"))) if os.path.isdir(p) else sorted(glob.glob(p))
+            self.items.extend((f, None, None, None) for f in files)
+        # pantallas completas con nombre de casilla: la rejilla se detecta una vez, en la primera
+        named = [path for path, bbox, _, _ in self.items if bbox is None and SLOT_NAME.search(os.path.basename(path))]
+        grids = detect_grids(frames.load(named[0])) if named else []
+        self.grid = grids[grid_index] if grids else None
+
+    def __len__(self):
+        return len(self.items)
+
+    def __iter__(self):
+        for path, bbox, mouse, slot in self.items:
+            img = frames.load(path)
+            w, h = frames.size(img)
+            if bbox is None:  # pantalla completa suelta
+                bbox = (0, 0, w, h)
+                m = SLOT_NAME.search(os.path.basename(path))
+                if m and self.grid is not None:
+                    slot = (int(m.group(1)), int(m.group(2)))
+                    mouse = self.grid.center(*slot)
+                else:
+                    mouse = (w, h // 2)  # como batch_reocr: tooltip a la izquierda
+            yield Frame(image=img, bbox=bbox, mouse=mouse, source="bulk", slot=slot)
+
+# --- proceso de cada casilla -------------------------------------------------
+
+class SlotProcessor:
+    """Worker: tooltip en la franja (o pantalla) -> OCR -> inventario."""
+
+    def __init__(self, grid: Optional[Grid], placement: TooltipPlacement, lang: str,
+                 store=None, dedup: Optional[DedupIndex] = None):
+        self.grid = grid
+        self.placement = placement
+        self.lang = lang
+        self.store = store
+        self.dedup = dedup
+        self._lock = threading.Lock()
+        self.found = self.missing = self.reused = 0
+        self.results = []     # (casilla, item_name, trait)
+
+    def __call__(self, frame: Frame) -> str:
+        cand = locate_tooltip(frame.image, frame.mouse, frame.bbox)
+        where = f"casilla {frame.slot[0]},{frame.slot[1]}" if frame.slot else f"frame #{frame.seq}"
+        if cand is None:
+            with self._lock:
+                self.missing += 1
+            if tuple(frame.bbox) != (0, 0) + frames.size(frame.image):
+                self.placement.forget()  # franja equivocada (¿tooltip al otro lado?) o casilla vacía
+            return f"{where}: sin tooltip"
+        ox, oy = frame.bbox[:2]
+        if self.grid is not None and frame.slot is not None:
+            x1, y1, x2, y2 = cand.box
+            self.placement.learn(self.grid.cell_box(*frame.slot), (x1 + ox, y1 + oy, x2 + ox, y2 + oy))
+        crop = frames.crop(frame.image, cand.box)
+
+        seen, h, rows = None, None, ()
+        if self.dedup is not None:
+            h = dhash(crop)
+            with self._lock:
+                seen = self.dedup.lookup(h, frames.size(crop), crop)
+        if seen:
+            # mismo tooltip que otra casilla: se cuenta, pero sin repetir el OCR
+            item_name, trait = seen["item_name"], seen["trait"]
+        else:
+            ocr = parse_tooltip(crop, lang=self.lang, analysis=cand.analysis)
+            item_name, trait, name_box, trait_box = item_and_trait(crop, ocr)
+            rows = text_rows(name_box, trait_box)
+        with self._lock:
+            self.found += 1
+            self.reused += 1 if seen else 0
+            self.results.append((frame.slot, item_name, trait))
+            if h is not None and not seen:
+                self.dedup.add(h, frames.size(crop), {"item_name": item_name, "trait": trait}, crop, rows)
+        if self.store is not None:
+            self.store.add(item_name, trait)
+        return f"{where}: {item_name!r} / {trait!r}" + (" (repetido, sin OCR)" if seen else "")
+
+def scan(source, process: SlotProcessor, workers: int, queue_size: int) -> dict:
+    """Recorre la fuente de frames con el pipeline (grab secuencial, OCR en paralelo)."""
+    it = iter(source)
+    pipeline = CapturePipeline(lambda: next(it), process, workers=workers, maxsize=queue_size).start()
+    t0 = time.perf_counter()
+    n = 0
+    try:
+        while True:
+            try:
+                pipeline.submit(source="bulk", block=True)   # espera si el OCR va por detrás
+            except StopIteration:
+                break
+            n += 1
+    finally:
+        pipeline.stop(drain=True)
+    wall = time.perf_counter() - t0
+    return {"slots": n, "seconds": wall, "slots_per_s": n / wall if wall > 0 else 0.0,
+            "found": process.found, "missing": process.missing, "reused": process.reused,
+            "pipeline": pipeline.format_stats()}
+
+def print_grids(grids: List[Grid]):
+    for i, g in enumerate(grids):
+        print(f"  [{i}] {g.cols}x{g.rows} casillas de {g.cell}px en ({g.x},{g.y}), "
+              f"paso {g.pitch_x:.1f} x {g.pitch_y:.1f}")
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Escaneo de la bolsa casilla a casilla.")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    g = sub.add_parser("grid", help="detectar las rejillas de una captura")
+    g.add_argument("image")
+    for name in ("live", "replay"):
+        p = sub.add_parser(name)
+        p.add_argument("--workers", type=int, default=None, help="hilos de OCR (por defecto capture_workers)")
+        p.add_argument("--no-store", action="store_true", help="no escribir en el inventario")
+        p.add_argument("--grid", type=int, default=-1, help="rejilla a recorrer (-1 = la de más a la derecha)")
+        if name == "live":
+            p.add_argument("--hover", type=float, default=HOVER_SECONDS, help="espera por casilla (s)")
+            p.add_argument("--record", default=None, help="guardar los frames en este directorio")
+        else:
+            p.add_argument("inputs", nargs="+", help="directorio grabado con --record, o capturas/globs")
+    args = ap.parse_args(argv)
+
+    if args.cmd == "grid":
+        grids = detect_grids(frames.load(args.image))
+        print_grids(grids) if grids else print("No se encontró ninguna rejilla.")
+        return 0 if grids else 1
+
+    cfg = get_config()
+    configure_cache(cfg["ocr_cache"], cfg["ocr_cache_max_entries"])
+    workers = args.workers or cfg["capture_workers"]
+    store = None if args.no_store else get_store()
+    dedup = DedupIndex(max_distance=cfg["dedup_max_distance"]) if cfg["dedup"] else None
+    placement = TooltipPlacement()
+
+    if args.cmd == "live":
+        screen = frames.grab()
+        grids = detect_grids(screen)
+        if not grids:
+            print("No se encontró la rejilla de la bolsa (¿está abierto el inventario?)")
+            return 1
+        print_grids(grids)
+        grid = grids[args.grid]
+        gray = frames.gray(screen)
+        slots = [s for s in grid.slots() if occupied(gray, grid, *s)]
+        print(f"Recorriendo {len(slots)} casillas ocupadas de {grid.cols * grid.rows}…")
+        source = LiveSlots(grid, slots, placement, hover=args.hover, record_dir=args.record)
+    else:
+        source = RecordedFrames(args.inputs, args.grid)
+        if not len(source):
+            print("No hay frames que reproducir.")
+            return 1
+        grid = source.grid
+
+    process = SlotProcessor(grid, placement, cfg["language"], store=store, dedup=dedup)
+    res = scan(source, process, workers, cfg["capture_queue"])
+    print(res["pipeline"])
+    print(f"{res['slots']} casillas en {res['seconds']:.1f} s = {res['slots_per_s']:.2f} casillas/s  |  "
+          f"{res['found']} tooltips, {res['missing']} sin tooltip, {res['reused']} sin OCR por repetidos")
+    get_writer().flush()
+    if store is not None:
+        store.close()
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,89 +1,271 @@
 import os
 import time
-import csv
 from datetime import datetime
-import keyboard
-from PIL import ImageGrab  # viene con Pillow
-import pyautogui
 import threading
-import json
 import sys
-import os
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 from ocr.parse_tooltip import parse_tooltip  # importar nuestro OCR
+from ocr.ocr_engine import configure_cache, stats as ocr_stats
+from ocr.detect_tooltip_cv import grab_big_roi, locate_tooltip
+from ocr.detect_from_mouse_roi import item_and_trait
+from ocr.tooltip_dedup import DedupIndex, dhash, text_rows
+from ocr.capture_pipeline import CapturePipeline, Frame
+from ocr.config import get_config
+from ocr.inventory_store import get_store
+from ocr.auto_capture import AutoCapture
+from ocr.snapshot_writer import get_writer
+from ocr.tooltip_tracker import get_tracker
+from ocr.tooltip_templates import ensure_templates
+from ocr.prices import get_prices, format_price
+from ocr import escalation, frames, snapshot_archive, trace
 
 # --- Rutas ---
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 ROOT = os.path.dirname(BASE_DIR)              # carpeta tlinv
 SNAPS_DIR = os.path.join(ROOT, "data", "snaps")
-INV_CSV = os.path.join(ROOT, "data", "inventory.csv")
-CONFIG_PATH = os.path.join(ROOT, "config.json")
-
-def load_config():
-    try:
-        with open(CONFIG_PATH, "r", encoding="utf-8") as f:
-            return json.load(f)
-    except Exception:
-        return {"language": "eng"}
 
 os.makedirs(SNAPS_DIR, exist_ok=True)
 
 def timestamp():
     return datetime.now().strftime("%Y%m%d_%H%M%S")
 
-def now_iso():
-    return datetime.now().isoformat(timespec="seconds")
+def save_thumbnail(prefix: str, width: int = 640, screen=None) -> str:
+    """
+    Miniatura de la pantalla completa para auditoría (JPEG reducido, no PNG de 4K).
+    `screen` es la pantalla capturada junto al frame (Frame.screen); sin ella se captura ahora.
+    """
+    path = os.path.join(SNAPS_DIR, f"{prefix}_{timestamp()}.jpg")
+    # reducir y codificar va en el hilo del escritor
+    return get_writer().write(screen if screen is not None else frames.grab(), path, width=width, quality=80)
 
-def screenshot_full(prefix: str) -> str:
-    """Captura de pantalla completa (luego recortaremos si hace falta)."""
-    path = os.path.join(SNAPS_DIR, f"{prefix}_{timestamp()}.png")
-    img = ImageGrab.grab()
-    img.save(path)
+def grab_frame() -> Frame:
+    """
+    Solo píxeles: ROI grande relativo al mouse, como array en memoria (sin PNG).
+    Con save_thumbnail también la pantalla completa en el mismo instante: el worker puede
+    procesar el frame bastante después y la miniatura tiene que ser la de esta captura.
+    """
+    tr = trace.begin("capture")
+    with trace.active(tr), trace.span("grab"):
+        roi, bbox, mouse, _ = grab_big_roi(save=False)
+        screen = frames.grab() if get_config()["save_thumbnail"] else None
+    return Frame(image=roi, bbox=bbox, mouse=mouse, trace=tr, screen=screen)
+
+def locate_in_frame(frame: Frame, track: bool = False):
+    """
+    Localiza el tooltip dentro del frame (detect_tooltip_cv).
+    Con track=True se prueba antes la caja de la captura anterior (tooltip_tracker).
+    Devuelve (recorte, candidato); si no se encuentra tooltip, (ROI completo, None).
+    """
+    if track:
+        cand = get_tracker().locate(frame.image, frame.mouse, frame.bbox)
+    else:
+        cand = locate_tooltip(frame.image, frame.mouse, frame.bbox)
+    if not cand:
+        return frame.image, None
+    return frames.crop(frame.image, cand.box), cand  # vista del frame, sin copiar
+
+def save_tooltip_crop(crop, prefix: str = "tooltip") -> str:
+    """Encola el recorte para archivarlo (snapshot_writer) y devuelve su ruta al momento."""
+    writer = get_writer()
+    # milisegundos en el nombre: varios workers pueden guardar en el mismo segundo
+    ms = datetime.now().microsecond // 1000
+    path = os.path.join(SNAPS_DIR, f"{prefix}_{timestamp()}_{ms:03d}{writer.ext}")
+    with trace.span("snapshot_enqueue"):
+        writer.write(crop, path)
+    trace.count("snapshots_queued")
     return path
 
-def append_inventory_row(tooltip_img_path: str):
-    """Agrega una fila al inventario usando OCR para item_name y trait."""
-    cfg = load_config()
-    lang = cfg.get("language", "eng")
+def archive_tooltip_crop(frame: Frame, crop, cand, ref: str, item_name: str, trait: str):
+    """Encola el recorte para el archivo de pack files (ocr/snapshot_archive.py) con su metadata."""
+    if cand is not None:
+        x1, y1, x2, y2 = cand.box
+        bbox = (frame.bbox[0] + x1, frame.bbox[1] + y1, frame.bbox[0] + x2, frame.bbox[1] + y2)
+    else:
+        bbox = frame.bbox
+    captured = time.time() - (time.perf_counter() - frame.t_grab)
+    with trace.span("snapshot_enqueue"):
+        get_writer().archive(crop, ref, captured=captured, mouse=frame.mouse, bbox=bbox,
+                             item_name=item_name, trait=trait, source=frame.source)
+    trace.count("snapshots_queued")
+
+# Varios workers consultan/actualizan el índice de duplicados
+_inv_lock = threading.Lock()
+
+def append_inventory_row(tooltip_img_path: str, analysis=None, img=None):
+    """
+    Registra la captura en el inventario usando OCR para item_name y trait.
+    `img` es el recorte ya en memoria (si no, se abre tooltip_img_path). Si ya hay un
+    TooltipAnalysis de esta captura se reutiliza (sin otra pasada de OCR).
+    Devuelve (item_name, trait, filas de sus líneas en el recorte) para el dedup.
+    """
+    lang = get_config()["language"]
+
+    # OCR del recorte del tooltip; nombre/trait por anclas (Rareza/Trait) y, si no, por líneas
+    ocr = parse_tooltip(img if img is not None else tooltip_img_path, lang=lang, analysis=analysis)
+    item_name, trait, name_box, trait_box = item_and_trait(img, ocr)
+
+    # upsert: el mismo item/trait suma qty en vez de duplicar la fila
+    with trace.span("inventory"):
+        get_store().add(item_name, trait, tooltip_img=tooltip_img_path)
+    return item_name, trait, text_rows(name_box, trait_box)
+
+def bump_inventory_row(item_name: str, trait: str):
+    """Suma 1 a qty y actualiza last_seen del item/trait (sin OCR)."""
+    get_store().add(item_name, trait)
+
+def process_frame(frame: Frame, cfg: dict, dedup: DedupIndex = None) -> str:
+    """
+    Worker: recorte del tooltip -> (dedup) -> PNG del recorte -> OCR -> inventario.
+    Devuelve un mensaje para consola. Con tracing activo deja una línea en cache/trace.jsonl.
+    """
+    try:
+        with trace.active(frame.trace), trace.span("process"):
+            return _process_frame(frame, cfg, dedup)
+    finally:
+        trace.end(frame.trace)
 
-    # Asegurar cabecera si no existe
-    if not os.path.exists(INV_CSV):
-        with open(INV_CSV, "w", newline="", encoding="utf-8") as f:
-            writer = csv.writer(f)
-            writer.writerow(["item_name", "trait", "qty", "slot_img", "tooltip_img", "last_seen"])
+def _process_frame(frame: Frame, cfg: dict, dedup: DedupIndex = None) -> str:
+    with trace.span("locate"):
+        crop, cand = locate_in_frame(frame, track=cfg["tooltip_tracking"])
+    if cand is None and frame.source == "auto":
+        # el filtro de la auto-captura es grueso: sin tooltip no se guarda nada
+        trace.attr("auto_no_tooltip", True)
+        return ""
 
-    # OCR básico (sin ROI por ahora)
-    ocr = parse_tooltip(tooltip_img_path, lang=lang)
-    item_name = ocr.get("item_name") or ""
-    trait = ocr.get("trait") or ""
+    h = None
+    if dedup is not None and cand is not None:
+        with trace.span("dedup"):
+            h = dhash(crop)
+            with _inv_lock:
+                seen = dedup.lookup(h, frames.size(crop), crop)
+        if seen:
+            bump_inventory_row(seen["item_name"], seen["trait"])
+            trace.attr("dedup_hit", True)
+            return (f"Tooltip repetido: +1 a {seen['item_name']!r} / {seen['trait']!r} (sin OCR)"
+                    + _price_note(seen["item_name"], seen["trait"]))
 
-    row = [item_name, trait, 1, "", tooltip_img_path, now_iso()]
-    with open(INV_CSV, "a", newline="", encoding="utf-8") as f:
-        writer = csv.writer(f)
-        writer.writerow(row)
+    archive = cfg["save_snapshots"] and cfg["snapshot_archive"]
+    if archive:
+        # la referencia (hash de píxeles) se conoce ya; el recorte se archiva tras el OCR, con item/trait
+        with trace.span("snapshot_hash"):
+            path = snapshot_archive.ref(crop)
+    else:
+        path = save_tooltip_crop(crop) if cfg["save_snapshots"] else ""
+    if cfg["save_thumbnail"]:
+        with trace.span("thumbnail"):
+            save_thumbnail("frame", cfg["thumbnail_width"], frame.screen)
+    analysis = cand.analysis if cand is not None else None
+    item_name, trait, rows = append_inventory_row(path, analysis=analysis, img=crop)
+    if archive:
+        archive_tooltip_crop(frame, crop, cand, path, item_name, trait)
+    if h is not None:
+        with _inv_lock:
+            dedup.add(h, frames.size(crop), {"item_name": item_name, "trait": trait}, crop, rows)
+    where = "tooltip" if cand is not None else "ROI completo (no se encontró el tooltip)"
+    return (f"Capturado {where}: {item_name!r} / {trait!r}" + _price_note(item_name, trait)
+            + (f" -> {path}" if path else ""))
 
-def main():
+def _price_note(item_name: str, trait: str) -> str:
+    """' ~ precio' desde la tabla local (ocr/prices.py, sin red); vacío si no hay precios."""
+    prices = get_prices()
+    if not prices.configured:
+        return ""
+    return f" ~ {format_price(prices.lookup(item_name, trait))}"
+
+def capture_tooltip(cfg: dict, dedup: DedupIndex = None) -> str:
+    """Captura síncrona (grab + proceso en el mismo hilo)."""
+    return process_frame(grab_frame(), cfg, dedup)
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    import keyboard  # solo la captura en vivo necesita el hook de teclado (importable sin escritorio)
     print("[F12] Capturar TOOLTIP (agrega fila al inventario)")
+    print("[F11] Activar/pausar la captura automática (al pasar el mouse por los items)")
     print("[Ctrl+F12] Salir")
     print("Nota: si las teclas no responden, ejecuta PowerShell como Administrador o pon el juego en modo ventana.")
 
+    cfg = get_config()  # se recarga sola si cambia config.json
+    configure_cache(cfg["ocr_cache"], cfg["ocr_cache_max_entries"])
+    ensure_templates()  # construirlas (OCR) aquí y no en la primera captura
+
     stop_event = threading.Event()
+    dedup = DedupIndex(max_distance=cfg["dedup_max_distance"]) if cfg["dedup"] else None
+    get_prices().refresh_async()  # tabla de precios de la región, en segundo plano si caducó
+
+    # El hotkey solo captura píxeles; detección, OCR y disco van en los workers
+    pipeline = CapturePipeline(
+        grab_frame, lambda frame: process_frame(frame, cfg, dedup),
+        workers=cfg["capture_workers"], maxsize=cfg["capture_queue"],
+    ).start()
 
     def on_tooltip():
-        path = screenshot_full("tooltip")
-        append_inventory_row(path)
-        print(f"Tooltip capturado y agregado a inventario: {path}")
+        if not pipeline.submit():
+            print("Cola de capturas llena: captura descartada (espera a que termine el OCR)")
+
+    # Auto-captura: se muestrea una miniatura junto al cursor y se llama a submit
+    # solo cuando hay un tooltip nuevo y estable (ver ocr/auto_capture.py)
+    auto = AutoCapture(lambda: pipeline.submit(source="auto"), fps=cfg["auto_fps"])
+    if not (cfg["auto_capture"] or "--auto" in argv):
+        auto.toggle()  # arranca en pausa; F11 la activa
+    auto.start()
+
+    def on_auto():
+        print("Captura automática " + ("activada" if auto.toggle() else "en pausa"))
 
     def on_exit():
-        print("Saliendo...")
+        print("Saliendo... (terminando capturas pendientes)")
         stop_event.set()
 
     keyboard.add_hotkey('f12', on_tooltip)
+    keyboard.add_hotkey('f11', on_auto)
     keyboard.add_hotkey('ctrl+f12', on_exit)
 
-    # Espera hasta que presiones Ctrl+F12
-    while not stop_event.is_set():
-        time.sleep(0.1)
+    # Espera hasta que presiones Ctrl+F12 (sin sondear)
+    try:
+        stop_event.wait()
+    finally:
+        keyboard.remove_hotkey('f12')
+        keyboard.remove_hotkey('f11')
+        auto.stop()
+        # los workers aún hacen add(): la cola se vacía antes de cerrar el inventario
+        pipeline.stop(drain=True)
+    print(pipeline.format_stats())
+    if auto.triggers or auto.samples:
+        print(auto.format_stats())
+
+    writer = get_writer()
+    writer.flush()
+    w = writer.stats()
+    if w["written"] or w["errors"]:
+        print(f"Capturas archivadas: {w['written']} ({w['bytes'] / 1e6:.1f} MB, {w['ms_mean']:.0f} ms de media "
+              f"fuera del camino de la captura), {w['errors']} con error")
+
+    if dedup is not None:
+        d = dedup.stats()
+        print(f"Duplicados evitados: {d['hits']} de {d['hits'] + d['misses']} capturas"
+              f" ({d['rejected']} parecidas con otro nombre/trait)")
+    if cfg["tooltip_tracking"] and get_tracker().lookups:
+        print(get_tracker().format_stats())
+    tiers = escalation.format_stats()
+    if tiers:
+        print(tiers)
+    cache = ocr_stats().get("cache")
+    if cache:
+        print(f"Caché OCR: {cache['hits']} aciertos / {cache['misses']} fallos ({cache['entries']} entradas)")
+
+    # inventory.csv se sigue generando para quien lo abra en Excel
+    store = get_store()
+    inv = store.stats()
+    print(f"Inventario: {inv['entries']} items distintos, {inv['qty']} en total -> {store.export_csv()}")
+    prices = get_prices()
+    if prices.configured:
+        p = prices.stats()
+        print(f"Precios: {p['hits']} de {p['lookups']} capturas con precio ({p['entries']} en la tabla local)")
+    store.close()
+
+    if trace.enabled():
+        trace.flush()
+        print(trace.format_summary())
 
 if __name__ == "__main__":
     main()
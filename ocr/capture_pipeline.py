@@ -0,0 +1,146 @@
+"""
+Pipeline productor/consumidor para las capturas.
+
+El hotkey solo llama a submit(): toma píxeles de la fuente de frames (inyectable,
+así se puede probar sin pantalla) y los deja en una cola acotada. Un pool de hilos
+hace detección, OCR y escritura a disco. Si la cola está llena el frame se descarta
+(backpressure: el hotkey nunca espera a tesseract). stop() drena la cola y
+stats() da profundidad de cola y latencias.
+"""
+import time, queue, threading
+from dataclasses import dataclass, field
+from typing import Callable, Optional, Tuple
+
+@dataclass
+class Frame:
+    image: object                          # PIL.Image (o array) con los píxeles capturados
+    bbox: Tuple[int, int, int, int]        # bbox absoluto del recorte en pantalla
+    mouse: Tuple[int, int]                 # posición absoluta del mouse al capturar
+    t_grab: float = field(default_factory=time.perf_counter)
+    seq: int = 0
+    trace: object = None                   # ocr.trace.Trace de esta captura (None si no se traza)
+    source: str = "hotkey"                 # "hotkey" (F12), "auto" (ocr/auto_capture.py) o "bulk"
+    slot: Optional[Tuple[int, int]] = None # (fila, columna) en el escaneo por rejilla (ocr/bulk_scan.py)
+    screen: object = None                  # pantalla completa del mismo instante (solo con save_thumbnail)
+
+def _pct(values, p):
+    if not values:
+        return 0.0
+    v = sorted(values)
+    return v[min(len(v) - 1, int(round(p / 100.0 * (len(v) - 1))))]
+
+class CapturePipeline:
+    def __init__(self, frame_source: Callable[[], Frame], process: Callable[[Frame], object],
+                 workers: int = 2, maxsize: int = 8, on_result: Optional[Callable] = None):
+        self.frame_source = frame_source
+        self.process = process
+        self.on_result = on_result or (lambda frame, result: print(result) if result else None)
+        self.q = queue.Queue(maxsize=maxsize)
+        self.workers = [threading.Thread(target=self._worker, name=f"capture-worker-{i}", daemon=True)
+                        for i in range(max(1, workers))]
+        self._lock = threading.Lock()
+        self._seq = 0
+        self.submitted = self.dropped = self.processed = self.errors = 0
+        self.max_depth = 0
+        self.depths = []
+        self.wait_s = []      # grab -> inicio de proceso
+        self.total_s = []     # grab -> fin de proceso
+        self.grab_s = []      # coste del grab en el hilo del hotkey
+        self._started = False
+
+    def start(self):
+        if not self._started:
+            self._started = True
+            for t in self.workers:
+                t.start()
+        return self
+
+    def submit(self, source: Optional[str] = None, block: bool = False) -> bool:
+        """
+        Hilo del hotkey: solo captura píxeles y encola. False si se descartó.
+        Con block=True espera sitio en la cola en vez de descartar (escaneos por lotes).
+        """
+        t0 = time.perf_counter()
+        frame = self.frame_source()
+        t1 = time.perf_counter()
+        if source:
+            frame.source = source
+        with self._lock:
+            self._seq += 1
+            frame.seq = self._seq
+            self.submitted += 1
+            self.grab_s.append(t1 - t0)
+        try:
+            self.q.put(frame, block=block)
+        except queue.Full:
+            with self._lock:
+                self.dropped += 1
+            return False
+        depth = self.q.qsize()
+        with self._lock:
+            self.depths.append(depth)
+            self.max_depth = max(self.max_depth, depth)
+        return True
+
+    def _worker(self):
+        while True:
+            frame = self.q.get()
+            if frame is None:
+                self.q.task_done()
+                return
+            t_start = time.perf_counter()
+            try:
+                result = self.process(frame)
+                ok = True
+            except Exception as e:
+                result, ok = f"[-] Error procesando captura #{frame.seq}: {type(e).__name__}: {e}", False
+            t_end = time.perf_counter()
+            with self._lock:
+                self.processed += 1
+                self.errors += 0 if ok else 1
+                self.wait_s.append(t_start - frame.t_grab)
+                self.total_s.append(t_end - frame.t_grab)
+            try:
+                self.on_result(frame, result)
+            finally:
+                self.q.task_done()
+
+    def stop(self, drain: bool = True, timeout: Optional[float] = None):
+        """Termina los workers. Con drain=True procesa antes todo lo encolado."""
+        if not self._started:
+            return
+        if not drain:
+            try:
+                while True:
+                    self.q.get_nowait()
+                    self.q.task_done()
+                    with self._lock:
+                        self.dropped += 1
+            except queue.Empty:
+                pass
+        for _ in self.workers:
+            self.q.put(None)  # bloqueante: cada worker recibe su centinela tras lo pendiente
+        for t in self.workers:
+            t.join(timeout)
+        self._started = False
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "submitted": self.submitted, "dropped": self.dropped,
+                "processed": self.processed, "errors": self.errors,
+                "queue_max": self.max_depth,
+                "queue_mean": (sum(self.depths) / len(self.depths)) if self.depths else 0.0,
+                "grab_ms_p50": _pct(self.grab_s, 50) * 1000,
+                "wait_ms_p50": _pct(self.wait_s, 50) * 1000, "wait_ms_p95": _pct(self.wait_s, 95) * 1000,
+                "latency_ms_p50": _pct(self.total_s, 50) * 1000, "latency_ms_p95": _pct(self.total_s, 95) * 1000,
+                "latency_ms_max": (max(self.total_s) * 1000) if self.total_s else 0.0,
+            }
+
+    def format_stats(self) -> str:
+        s = self.stats()
+        return (f"Capturas: {s['submitted']} recibidas, {s['processed']} procesadas, "
+                f"{s['dropped']} descartadas, {s['errors']} con error\n"
+                f"Cola: máx {s['queue_max']}, media {s['queue_mean']:.1f}  |  grab p50 {s['grab_ms_p50']:.1f} ms\n"
+                f"Espera en cola p50/p95: {s['wait_ms_p50']:.0f}/{s['wait_ms_p95']:.0f} ms  |  "
+                f"latencia total p50/p95/máx: {s['latency_ms_p50']:.0f}/{s['latency_ms_p95']:.0f}/{s['latency_ms_max']:.0f} ms")
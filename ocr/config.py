@@ -0,0 +1,192 @@
+"""
+Configuración compartida del paquete ocr (config.json en la raíz).
+
+Se carga una sola vez, se valida y se recarga sola cuando cambia el mtime del
+archivo (como mucho una comprobación cada CHECK_INTERVAL segundos), así que
+editar config.json aplica sin reiniciar y el camino caliente no relee el JSON.
+
+Un config.json inválido al arrancar lanza ConfigError con el motivo. Si se rompe
+mientras el programa corre, se avisa por stderr y se sigue con la última versión
+válida hasta que se corrija.
+"""
+import os, sys, json, time, threading
+from collections.abc import Mapping
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+CONFIG_PATH = os.path.join(ROOT, "config.json")
+
+CHECK_INTERVAL = 0.5  # segundos entre comprobaciones de mtime
+
+DEFAULTS = {
+    "region": "",
+    "language": "eng",
+    "tldb_prices_url": "",
+    "prices_ttl_minutes": 60,
+    "tooltip_tracking": True,
+    "ocr_psm": 6,
+    "ocr_preprocess": "none",
+    "ocr_debug_dumps": False,
+    "ocr_strips": False,
+    "ocr_tiered": False,
+    "ocr_tier_min_conf": 60,
+    "ocr_cache": True,
+    "ocr_cache_max_entries": 20000,
+    "dedup": True,
+    "dedup_max_distance": 20,
+    "save_thumbnail": False,
+    "thumbnail_width": 640,
+    "save_snapshots": True,
+    "snapshot_archive": False,
+    "snapshot_format": "png",
+    "snapshot_png_level": 1,
+    "snapshot_quality": 90,
+    "capture_workers": 2,
+    "capture_queue": 8,
+    "auto_capture": False,
+    "auto_fps": 10,
+    "trace": False,
+    "daemon_timeout_s": 5,
+}
+
+class ConfigError(ValueError):
+    """config.json no se puede leer o tiene valores inválidos."""
+
+def _int_range(lo, hi):
+    def check(v):
+        return isinstance(v, int) and not isinstance(v, bool) and lo <= v <= hi
+    check.expected = f"entero entre {lo} y {hi}"
+    return check
+
+def _is(*types):
+    def check(v):
+        return isinstance(v, types) and not (bool not in types and isinstance(v, bool))
+    check.expected = " o ".join(t.__name__ for t in types)
+    return check
+
+def _one_of(*values):
+    def check(v):
+        return v in values
+    check.expected = "uno de " + ", ".join(repr(x) for x in values)
+    return check
+
+def _preprocess(v):
+    from ocr.preprocess import validate_chain
+    return isinstance(v, str) and validate_chain(v)
+_preprocess.expected = "cadena de etapas de ocr/preprocess.py, p.ej. 'binary' o 'bg+gamma:0.7+adaptive'"
+
+# clave -> validador (con .expected para el mensaje de error)
+SCHEMA = {
+    "region": _is(str),
+    "language": _is(str),
+    "tldb_prices_url": _is(str),
+    "prices_ttl_minutes": _int_range(1, 7 * 24 * 60),
+    "ocr_psm": _int_range(0, 13),
+    "ocr_preprocess": _preprocess,
+    "ocr_debug_dumps": _is(bool),
+    "ocr_strips": _is(bool),
+    "tooltip_tracking": _is(bool),
+    "ocr_tiered": _is(bool),
+    "ocr_tier_min_conf": _int_range(0, 100),
+    "ocr_cache": _is(bool),
+    "ocr_cache_max_entries": _int_range(1, 10_000_000),
+    "dedup": _is(bool),
+    "dedup_max_distance": _int_range(0, 256),
+    "save_thumbnail": _is(bool),
+    "thumbnail_width": _int_range(16, 8192),
+    "save_snapshots": _is(bool),
+    "snapshot_archive": _is(bool),
+    "snapshot_format": _one_of("png", "webp", "jpg"),
+    "snapshot_png_level": _int_range(0, 9),
+    "snapshot_quality": _int_range(1, 100),
+    "capture_workers": _int_range(1, 64),
+    "capture_queue": _int_range(1, 1024),
+    "auto_capture": _is(bool),
+    "auto_fps": _int_range(1, 60),
+    "trace": _is(bool),
+    "daemon_timeout_s": _int_range(1, 600),
+}
+
+def validate(data, path: str = CONFIG_PATH) -> dict:
+    """Devuelve DEFAULTS + data; lanza ConfigError si algo no cuadra."""
+    if not isinstance(data, dict):
+        raise ConfigError(f"{path}: se esperaba un objeto JSON ({{...}}), no {type(data).__name__}")
+    errors = []
+    for key, value in data.items():
+        check = SCHEMA.get(key)
+        if check is not None and not check(value):
+            errors.append(f"  - {key}: {value!r} (se esperaba {check.expected})")
+    if errors:
+        raise ConfigError(f"{path}: valores inválidos:\n" + "\n".join(errors))
+    return {**DEFAULTS, **data}
+
+def read_config(path: str = CONFIG_PATH) -> dict:
+    """Lee y valida un config.json. Si no existe, se usan los valores por defecto."""
+    if not os.path.exists(path):
+        return dict(DEFAULTS)
+    try:
+        with open(path, "r", encoding="utf-8-sig") as f:
+            data = json.load(f)
+    except json.JSONDecodeError as e:
+        raise ConfigError(f"{path}: JSON inválido en línea {e.lineno}, columna {e.colno}: {e.msg}") from None
+    except OSError as e:
+        raise ConfigError(f"{path}: no se pudo leer ({e})") from None
+    return validate(data, path)
+
+class Config(Mapping):
+    """Vista de solo lectura de config.json que se recarga cuando cambia el archivo."""
+
+    def __init__(self, path: str = CONFIG_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        self._mtime = self._stat()
+        self._data = read_config(path)  # al arrancar: si es inválido, falla aquí
+        self._checked = time.monotonic()
+        self.reloads = 0
+
+    def _stat(self):
+        try:
+            return os.stat(self.path).st_mtime_ns
+        except OSError:
+            return None
+
+    def _maybe_reload(self):
+        now = time.monotonic()
+        if now - self._checked < CHECK_INTERVAL:
+            return
+        with self._lock:
+            self._checked = now
+            mtime = self._stat()
+            if mtime == self._mtime:
+                return
+            self._mtime = mtime
+            try:
+                self._data = read_config(self.path)
+                self.reloads += 1
+            except ConfigError as e:
+                print(f"[config] {e}\n[config] Se mantiene la configuración anterior.", file=sys.stderr)
+
+    @property
+    def data(self) -> dict:
+        self._maybe_reload()
+        return self._data
+
+    def __getitem__(self, key):
+        return self.data[key]
+
+    def __iter__(self):
+        return iter(self.data)
+
+    def __len__(self):
+        return len(self.data)
+
+_config = None
+_config_lock = threading.Lock()
+
+def get_config() -> Config:
+    """Config compartida del proceso (se crea en el primer uso)."""
+    global _config
+    if _config is None:
+        with _config_lock:
+            if _config is None:
+                _config = Config()
+    return _config
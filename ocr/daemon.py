@@ -0,0 +1,253 @@
+"""
+Demonio de OCR residente: mantiene cargados cv2/numpy, config, vocabularios,
+plantillas y los handles de tesseract, y atiende peticiones por un socket local.
+
+Cada ejecución de test_ocr.py o de un script paga ~1-2 s de arranque (importar
+cv2/numpy/PIL, abrir tesseract, cargar vocabularios y plantillas) para unos
+cientos de ms de OCR. Con el demonio en marcha el cliente solo importa la
+biblioteca estándar, manda la ruta de la imagen y recibe el resultado.
+
+Protocolo: una línea JSON por petición y otra por respuesta sobre un socket Unix
+(cache/ocr_daemon.sock); donde no hay AF_UNIX (Windows) se usa TCP en
+127.0.0.1:DAEMON_PORT. Operaciones:
+
+    {"op": "ping"}
+    {"op": "parse", "path": "...", "lang": "eng", "locate": false, "full": false}
+    {"op": "stats"}
+    {"op": "shutdown"}
+
+Respuesta: {"ok": true, ...} o {"ok": false, "error": "..."}. "parse" devuelve
+item_name/trait/item_conf/trait_conf/raw/tier como parse_tooltip (con locate=true se
+busca antes el tooltip en una captura completa, como batch_reocr). El OCR corre
+en un pool fijo de hilos, así cada hilo conserva su handle de tesseract.
+
+    python ocr/daemon.py serve [--workers N]
+    python ocr/daemon.py parse IMG [IMG ...] [--locate]
+    python ocr/daemon.py status | stop
+
+Este módulo solo importa la biblioteca estándar: lo pesado se importa en serve().
+"""
+import os, sys, json, time, socket, threading, socketserver
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(ROOT)
+
+SOCKET_PATH = os.path.join(ROOT, "cache", "ocr_daemon.sock")
+DAEMON_HOST = "127.0.0.1"
+DAEMON_PORT = 47251
+USE_UNIX = hasattr(socket, "AF_UNIX") and hasattr(socketserver, "ThreadingUnixStreamServer")
+
+WORKERS = 2
+CONNECT_TIMEOUT = 0.2   # si no hay demonio, el cliente se entera enseguida
+REQUEST_TIMEOUT = 60.0
+PARSE_TIMEOUT = 5.0     # parse(): tras esto se hace el OCR local (config: daemon_timeout_s)
+MAX_LINE = 1 << 20
+
+class DaemonUnavailable(ConnectionError):
+    """No hay demonio escuchando."""
+
+# --- cliente -----------------------------------------------------------------
+
+def _connect(timeout: float) -> socket.socket:
+    if USE_UNIX:
+        s = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        addr = SOCKET_PATH
+    else:
+        s = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        addr = (DAEMON_HOST, DAEMON_PORT)
+    s.settimeout(timeout)
+    try:
+        s.connect(addr)
+    except OSError as e:
+        s.close()
+        raise DaemonUnavailable(str(e)) from e
+    return s
+
+def request(msg: dict, timeout: float = REQUEST_TIMEOUT) -> dict:
+    """Envía una petición y devuelve la respuesta. DaemonUnavailable si no hay demonio."""
+    s = _connect(CONNECT_TIMEOUT)
+    try:
+        s.settimeout(timeout)
+        s.sendall(json.dumps(msg).encode("utf-8") + b"\n")
+        with s.makefile("rb") as f:
+            line = f.readline(MAX_LINE)
+    finally:
+        s.close()
+    if not line:
+        raise DaemonUnavailable("el demonio cerró la conexión sin responder")
+    return json.loads(line)
+
+def parse(path: str, lang: str = None, locate: bool = False, full: bool = False,
+          timeout: float = PARSE_TIMEOUT):
+    """
+    parse_tooltip en el demonio (dict sin 'analysis'); None si no hay demonio o no
+    responde bien en `timeout` s (colgado, lento, respuesta rota): quien llama hace
+    el OCR local.
+    """
+    msg = {"op": "parse", "path": os.path.abspath(path), "locate": locate, "full": full}
+    if lang:
+        msg["lang"] = lang
+    try:
+        resp = request(msg, timeout=timeout)
+    except (OSError, ValueError):   # DaemonUnavailable, socket.timeout, conexión cortada, JSON roto
+        return None
+    if not resp.get("ok"):
+        raise RuntimeError(resp.get("error", "error en el demonio"))
+    return resp["result"]
+
+def running() -> bool:
+    try:
+        return request({"op": "ping"}, timeout=2.0).get("ok", False)
+    except (DaemonUnavailable, OSError, ValueError):
+        return False
+
+# --- servidor ----------------------------------------------------------------
+
+class _Service:
+    def __init__(self, workers: int):
+        from concurrent.futures import ThreadPoolExecutor
+        from ocr.config import get_config
+        from ocr.ocr_engine import configure_cache
+        from ocr.parse_tooltip import parse_tooltip
+        from ocr.detect_tooltip_cv import locate_tooltip
+        from ocr import frames
+        self.get_config, self.parse_tooltip, self.locate_tooltip, self.frames = \
+            get_config, parse_tooltip, locate_tooltip, frames
+        cfg = get_config()
+        configure_cache(cfg["ocr_cache"], cfg["ocr_cache_max_entries"])
+        self.pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="ocr-daemon")
+        self.started = time.time()
+        self.requests = self.errors = 0
+        self.seconds = 0.0
+        self._lock = threading.Lock()
+        self.stop = threading.Event()
+        # precalentar: vocabularios, plantillas y un handle de tesseract por hilo
+        from ocr.normalizer import names, traits
+        from ocr.tooltip_templates import ensure_templates
+        names(); traits(); ensure_templates()
+        import numpy as np
+        blank = np.zeros((32, 64, 3), np.uint8)
+        for f in [self.pool.submit(parse_tooltip, blank, full=True) for _ in range(workers)]:
+            f.result()
+
+    def _parse(self, msg: dict) -> dict:
+        img = self.frames.load(msg["path"])
+        if msg.get("locate"):
+            w, h = self.frames.size(img)
+            # sin mouse: cualquier candidato de la imagen (como batch_reocr)
+            cand = self.locate_tooltip(img, (w, h // 2), (0, 0, w, h))
+            if cand:
+                img = self.frames.crop(img, cand.box)
+        lang = msg.get("lang") or self.get_config()["language"]
+        r = self.parse_tooltip(img, lang=lang, full=bool(msg.get("full")))
+        return {k: r[k] for k in ("item_name", "trait", "item_conf", "trait_conf", "raw", "tier")}
+
+    def handle(self, msg: dict) -> dict:
+        op = msg.get("op")
+        if op == "ping":
+            return {"ok": True, "pid": os.getpid()}
+        if op == "stats":
+            from ocr.ocr_engine import stats as ocr_stats
+            with self._lock:
+                s = {"requests": self.requests, "errors": self.errors,
+                     "ms_mean": self.seconds * 1000 / self.requests if self.requests else 0.0}
+            return {"ok": True, "uptime_s": round(time.time() - self.started, 1), **s, "ocr": ocr_stats()}
+        if op == "shutdown":
+            self.stop.set()
+            return {"ok": True}
+        if op == "parse":
+            t0 = time.perf_counter()
+            try:
+                result = self.pool.submit(self._parse, msg).result()
+                return {"ok": True, "result": result, "ms": round((time.perf_counter() - t0) * 1000, 1)}
+            except Exception as e:
+                with self._lock:
+                    self.errors += 1
+                return {"ok": False, "error": f"{type(e).__name__}: {e}"}
+            finally:
+                with self._lock:
+                    self.requests += 1
+                    self.seconds += time.perf_counter() - t0
+        return {"ok": False, "error": f"operación desconocida: {op!r}"}
+
+def _handler(service: _Service):
+    class Handler(socketserver.StreamRequestHandler):
+        def handle(self):
+            for line in iter(lambda: self.rfile.readline(MAX_LINE), b""):
+                try:
+                    resp = service.handle(json.loads(line))
+                except ValueError as e:
+                    resp = {"ok": False, "error": f"petición no es JSON: {e}"}
+                self.wfile.write(json.dumps(resp, ensure_ascii=False).encode("utf-8") + b"\n")
+                self.wfile.flush()
+    return Handler
+
+def serve(workers: int = WORKERS):
+    if running():
+        print("[-] Ya hay un demonio de OCR en marcha")
+        return 1
+    t0 = time.perf_counter()
+    service = _Service(workers)
+    if USE_UNIX:
+        if os.path.exists(SOCKET_PATH):
+            os.remove(SOCKET_PATH)   # socket huérfano de un demonio que no terminó bien
+        os.makedirs(os.path.dirname(SOCKET_PATH), exist_ok=True)
+        server = socketserver.ThreadingUnixStreamServer(SOCKET_PATH, _handler(service))
+        where = SOCKET_PATH
+    else:
+        socketserver.ThreadingTCPServer.allow_reuse_address = True
+        server = socketserver.ThreadingTCPServer((DAEMON_HOST, DAEMON_PORT), _handler(service))
+        where = f"{DAEMON_HOST}:{DAEMON_PORT}"
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="ocr-daemon-server", daemon=True).start()
+    print(f"Demonio de OCR listo en {where} ({(time.perf_counter() - t0) * 1000:.0f} ms de arranque, "
+          f"{workers} hilos). Ctrl+C o 'python ocr/daemon.py stop' para salir.")
+    try:
+        service.stop.wait()
+    except KeyboardInterrupt:
+        pass
+    server.shutdown()
+    server.server_close()
+    service.pool.shutdown()
+    if USE_UNIX and os.path.exists(SOCKET_PATH):
+        os.remove(SOCKET_PATH)
+    print(f"Demonio detenido: {service.requests} peticiones, {service.errors} con error")
+    return 0
+
+def main(argv=None):
+    import argparse
+    ap = argparse.ArgumentParser(description="Demonio de OCR residente (socket local)")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    p = sub.add_parser("serve", help="arrancar el demonio en primer plano")
+    p.add_argument("--workers", type=int, default=WORKERS)
+    p = sub.add_parser("parse", help="OCR de tooltips a través del demonio")
+    p.add_argument("images", nargs="+")
+    p.add_argument("--locate", action="store_true", help="buscar antes el tooltip (capturas completas)")
+    p.add_argument("--full", action="store_true", help="pasada completa (sin franjas)")
+    sub.add_parser("status", help="¿hay demonio? y sus contadores")
+    sub.add_parser("stop", help="detener el demonio")
+    args = ap.parse_args(argv)
+
+    if args.cmd == "serve":
+        return serve(args.workers)
+    try:
+        if args.cmd == "parse":
+            for path in args.images:
+                r = request({"op": "parse", "path": os.path.abspath(path), "locate": args.locate, "full": args.full})
+                if r.get("ok"):
+                    res = r["result"]
+                    print(f"{path}: {res['item_name']!r} / {res['trait']!r}  ({r['ms']:.0f} ms)")
+                else:
+                    print(f"{path}: [-] {r.get('error')}")
+        elif args.cmd == "status":
+            print(json.dumps(request({"op": "stats"}), indent=1, ensure_ascii=False))
+        else:
+            request({"op": "shutdown"})
+            print("Demonio detenido")
+    except DaemonUnavailable:
+        print("[-] No hay demonio de OCR en marcha (python ocr/daemon.py serve)")
+        return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
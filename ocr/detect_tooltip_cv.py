@@ -1,13 +1,19 @@
-import os, time
-from dataclasses import dataclass
+import os, sys, time, threading
+from bisect import bisect_left, bisect_right
+from dataclasses import dataclass, field
 from typing import Optional, Tuple
 
 import cv2
 import numpy as np
-import pyautogui, keyboard
-from PIL import ImageGrab, Image
 
 ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(ROOT)
+from ocr.analysis import TooltipAnalysis, analyze, scaled
+from ocr.heuristics import get_rules
+from ocr.config import get_config
+from ocr.snapshot_writer import get_writer
+from ocr import frames, trace
+
 CACHE_DIR = os.path.join(ROOT, "cache")
 os.makedirs(CACHE_DIR, exist_ok=True)
 
@@ -27,7 +33,12 @@ PREF_ASPECT_MAX = 1.80
 def clamp(v, lo, hi): 
     return max(lo, min(hi, v))
 
-def grab_big_roi():
+def grab_big_roi(save: bool = False):
+    """
+    ROI grande bajo el mouse como array RGB (ocr/frames.py). Con save=True además
+    se encola cv_big_roi.png en el escritor de fondo (si no, path=None).
+    """
+    import pyautogui  # solo en captura en vivo (el módulo se importa sin escritorio)
     x, y = pyautogui.position()
     sw, sh = pyautogui.size()
     x1 = clamp(x - OFFSET_LEFT, 0, sw)
@@ -37,9 +48,8 @@ def grab_big_roi():
     if x2 <= x1: x2 = clamp(x1 + 10, 0, sw)
     if y2 <= y1: y2 = clamp(y1 + 10, 0, sh)
     bbox = (x1, y1, x2, y2)
-    img = ImageGrab.grab(bbox=bbox)
-    path = os.path.join(CACHE_DIR, "cv_big_roi.png")
-    img.save(path)
+    img = frames.grab(bbox)
+    path = get_writer().write(img, os.path.join(CACHE_DIR, "cv_big_roi.png")) if save else None
     return img, bbox, (x, y), path
 
 @dataclass
@@ -48,17 +58,72 @@ class Candidate:
     area: float
     aspect: float
     score: float
-
-def find_tooltip_rect(roi_img: Image.Image, mouse_abs, bbox_abs) -> Optional[Candidate]:
+    geo_score: float = 0.0       # score de la etapa 1 (sin OCR)
+    # OCR del candidato (coords del recorte) para no repetirlo al leer nombre/trait
+    analysis: Optional[TooltipAnalysis] = field(default=None, repr=False)
+
+# --- Modo de localización ---
+# "template": solo plantillas del marco (sin OCR) | "contours": find_tooltip_rect
+# "auto": plantillas y, si no encuentran nada, contornos + OCR acotado
+DETECT_MODE = "auto"
+
+# --- Detector por etapas (prefiltro geométrico + presupuesto de OCR) ---
+OCR_TOP_K = 3          # solo se hace OCR de los K mejores candidatos geométricos
+DARK_PANEL_MAX = 60    # gris por debajo del cual un píxel cuenta como fondo de panel
+BORDER_BAND = 3        # grosor (px) de la franja donde se buscan los bordes
+SECTION_X_TOL = 10     # tolerancia (px) para considerar alineadas dos secciones del tooltip
+SECTION_MIN_W = 80
+SECTION_MIN_COUNT = 3
+NESTED_FULL = 4        # paneles internos con los que la puntuación de anidado ya es máxima
+
+def _box_sum(ii, x1, y1, x2, y2):
+    """Suma de la máscara en [x1,x2)x[y1,y2) usando la imagen integral."""
+    return float(ii[y2, x2] - ii[y1, x2] - ii[y2, x1] + ii[y1, x1])
+
+def _stacked_unions(rects, tol: int = SECTION_X_TOL):
+    """
+    El marco exterior del tooltip suele fundirse con los slots del inventario, pero
+    sus secciones internas (cabecera, stats, trait…) salen como contornos apilados
+    con los mismos bordes izquierdo/derecho. Agrupa esos contornos y propone su unión.
     """
-    Detecta el rectángulo del tooltip con:
-      - Canny + contornos para proponer candidatos
-      - Filtro por OCR: el candidato debe contener texto suficiente y, de ser posible, anclas (Epic/Heroic… y/o Trait)
+    groups = []  # [x1, x2, [rects]]
+    for x, y, cw, ch in sorted(rects):
+        if cw < SECTION_MIN_W or ch < 8:
+            continue
+        for g in groups:
+            if abs(g[0] - x) <= tol and abs(g[1] - (x + cw)) <= tol:
+                g[2].append((x, y, cw, ch))
+                break
+        else:
+            groups.append([x, x + cw, [(x, y, cw, ch)]])
+    unions = set()
+    for _, _, rs in groups:
+        if len(rs) < SECTION_MIN_COUNT:
+            continue
+        x1 = min(r[0] for r in rs); y1 = min(r[1] for r in rs)
+        x2 = max(r[0] + r[2] for r in rs); y2 = max(r[1] + r[3] for r in rs)
+        unions.add((x1, y1, x2 - x1, y2 - y1))
+    return unions
+
+def find_tooltip_rect(roi_img, mouse_abs, bbox_abs,
+                      top_k: Optional[int] = None, stats: Optional[dict] = None) -> Optional[Candidate]:
+    """
+    Detecta el rectángulo del tooltip en dos etapas:
+      1) Canny + contornos proponen candidatos y se puntúan solo con NumPy/OpenCV:
+         bordes rectos, fondo oscuro y uniforme, aspecto y cercanía al mouse.
+      2) Solo los `top_k` mejores pasan por OCR (anclas Epic/Heroic… y Trait);
+         en cuanto uno tiene ambas anclas se devuelve sin mirar el resto.
+    Con top_k=0 no se hace OCR y se devuelve el mejor candidato geométrico.
     Se descartan candidatos a la derecha del mouse.
+    Si se pasa `stats` (dict) se rellena con candidates / ocr_calls / early_exit.
     """
-    import pytesseract, re
+    if top_k is None:
+        top_k = OCR_TOP_K
+    if stats is None:
+        stats = {}
+    stats.update(candidates=0, ocr_calls=0, early_exit=False)
 
-    img = np.array(roi_img.convert("RGB"))
+    img = frames.rgb(roi_img)
     h, w = img.shape[:2]
     area_img = w * h
 
@@ -67,24 +132,23 @@ def find_tooltip_rect(roi_img: Image.Image, mouse_abs, bbox_abs) -> Optional[Can
     max_x_allowed = mouse_x_rel - 6
 
     # --- 1) Bordes + contornos (propuestas) ---
-    gray = cv2.cvtColor(img, cv2.COLOR_RGB2GRAY)
-    gray = cv2.medianBlur(gray, 3)
-    med = np.median(gray)
-    lower = int(max(0, 0.66 * med))
-    upper = int(min(255, 1.33 * med))
-    edges = cv2.Canny(gray, lower, upper)
-    edges = cv2.dilate(edges, np.ones((3,3), np.uint8), iterations=1)
-
-    cnts, _ = cv2.findContours(edges, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
-
-    # --- 2) Evaluar candidatos con OCR ---
-    RARITY = re.compile(r"(?i)\b(epic|heroic|legendary|rare|common)\b")
-    TRAIT  = re.compile(r"(?i)\btrait\b")
-
-    best: Optional[Candidate] = None
-    cand_list = []  # para volcar top-3 a disco
-
-    def score_candidate(x, y, cw, ch) -> Optional[Candidate]:
+    with trace.span("cv_edges"):
+        gray = cv2.cvtColor(img, cv2.COLOR_RGB2GRAY)
+        gray = cv2.medianBlur(gray, 3)
+        med = np.median(gray)
+        lower = int(max(0, 0.66 * med))
+        upper = int(min(255, 1.33 * med))
+        edges = cv2.Canny(gray, lower, upper)
+        edges = cv2.dilate(edges, np.ones((3,3), np.uint8), iterations=1)
+
+        cnts, _ = cv2.findContours(edges, cv2.RETR_LIST, cv2.CHAIN_APPROX_SIMPLE)
+
+        # imágenes integrales: cada feature por candidato cuesta O(1)
+        ii_edge = cv2.integral((edges > 0).astype(np.uint8))
+        ii_dark = cv2.integral((gray < DARK_PANEL_MAX).astype(np.uint8))
+        ii_gray, ii_gray2 = cv2.integral2(gray)
+
+    def geo_candidate(x, y, cw, ch) -> Optional[Candidate]:
         x2, y2 = x + cw, y + ch
 
         # completamente a la izquierda del mouse
@@ -98,74 +162,152 @@ def find_tooltip_rect(roi_img: Image.Image, mouse_abs, bbox_abs) -> Optional[Can
 
         # aspecto típico
         aspect = cw / (ch + 1e-6)
-        if not (PREF_ASPECT_MIN <= aspect <= PREF_ASPECT_MAX):
-            aspect_penalty = 0.6
-        else:
-            aspect_penalty = 1.0
-
-        # OCR dentro del rectángulo (upsample para mejor lectura)
-        crop = roi_img.crop((x, y, x2, y2))
-        nw, nh = int(crop.width * 1.5), int(crop.height * 1.5)
-        crop_up = crop.resize((nw, nh), Image.BICUBIC)
-
-        data = pytesseract.image_to_data(
-            crop_up, lang="eng", config="--psm 6", output_type=pytesseract.Output.DICT
+        aspect_ok = 1.0 if PREF_ASPECT_MIN <= aspect <= PREF_ASPECT_MAX else 0.6
+
+        # bordes rectos: fracción de píxeles de borde en la franja de cada lado
+        b = BORDER_BAND
+        sides = (
+            _box_sum(ii_edge, x, y, x2, min(y + b, y2)) / (cw * b),
+            _box_sum(ii_edge, x, max(y2 - b, y), x2, y2) / (cw * b),
+            _box_sum(ii_edge, x, y, min(x + b, x2), y2) / (ch * b),
+            _box_sum(ii_edge, max(x2 - b, x), y, x2, y2) / (ch * b),
         )
+        border = min(1.0, sum(sides) / 4.0)
 
-        words = [(data["text"][i] or "").strip() for i in range(len(data["text"])) if (data["text"][i] or "").strip()]
-        text  = " ".join(words)
-
-        has_rarity = bool(RARITY.search(text))
-        has_trait  = bool(TRAIT.search(text))
-        word_count = len(words)
-
-        # si hay poco texto, penaliza (pero no descartes)
-        text_penalty = 1.0 if word_count >= 6 else 0.6
-
-        # anclas (si no hay, el score será menor pero no cero)
-        anchors_score = 0.0
-        if has_rarity: anchors_score += 0.6
-        if has_trait:  anchors_score += 0.6
+        # panel oscuro y uniforme (interior sin la franja del borde)
+        ix1, iy1, ix2, iy2 = x + b, y + b, max(x + b + 1, x2 - b), max(y + b + 1, y2 - b)
+        n = (ix2 - ix1) * (iy2 - iy1)
+        dark = _box_sum(ii_dark, ix1, iy1, ix2, iy2) / n
+        mean = _box_sum(ii_gray, ix1, iy1, ix2, iy2) / n
+        var = max(0.0, _box_sum(ii_gray2, ix1, iy1, ix2, iy2) / n - mean * mean)
+        uniform = 1.0 / (1.0 + np.sqrt(var) / 40.0)
 
         # cercanía al borde derecho (más cerca del mouse = mejor)
         dist_x = abs(x2 - max_x_allowed)
         proximity = 1.0 / (1.0 + dist_x / 120.0)
 
-        score = text_penalty * ((0.45 * anchors_score) + (0.30 * proximity) + (0.25 * aspect_penalty))
-        return Candidate(box=(x, y, x2, y2), area=cw*ch, aspect=aspect, score=score)
-
-    for c in cnts:
-        x, y, cw, ch = cv2.boundingRect(c)
-        cand = score_candidate(x, y, cw, ch)
-        if cand:
-            cand_list.append((cand.score, cand.box))
-            if (best is None) or (cand.score > best.score):
-                best = cand
-
-    # Guardar top-3 candidatos para inspección
-    cand_list.sort(reverse=True, key=lambda t: t[0])
-    for i, (sc, box) in enumerate(cand_list[:3], start=1):
-        x1,y1,x2,y2 = box
-        crop = roi_img.crop((x1,y1,x2,y2))
-        outp = os.path.join(CACHE_DIR, f"cv_cand_{i}.png")
-        crop.save(outp)
+        # secciones anidadas: el tooltip completo contiene varios paneles internos.
+        # by_x va ordenado por x: solo se miran los rects que empiezan dentro de la caja
+        # y se para en NESTED_FULL (más paneles no suben la puntuación)
+        inner = 0
+        for i in range(bisect_left(xs, x - 2), bisect_right(xs, x2 + 2)):
+            rx, ry, rw, rh = by_x[i]
+            if (rw, rh) != (cw, ch) and ry >= y - 2 and rx + rw <= x2 + 2 and ry + rh <= y2 + 2:
+                inner += 1
+                if inner == NESTED_FULL:
+                    break
+        nested = inner / NESTED_FULL
+
+        geo = float((0.20 * border) + (0.20 * dark) + (0.05 * uniform) + (0.15 * proximity)
+               + (0.10 * aspect_ok) + (0.30 * nested))
+        return Candidate(box=(x, y, x2, y2), area=cw*ch, aspect=aspect, score=geo, geo_score=geo)
+
+    with trace.span("cv_score"):
+        rects = {cv2.boundingRect(c) for c in cnts}
+        rects |= _stacked_unions(rects)
+        by_x = sorted(rects)
+        xs = [r[0] for r in by_x]
+
+        cands = []
+        seen = set()
+        for x, y, cw, ch in rects:
+            key = (x // 4, y // 4, cw // 4, ch // 4)  # contornos casi idénticos (RETR_LIST duplica bordes)
+            if key in seen:
+                continue
+            seen.add(key)
+            cand = geo_candidate(x, y, cw, ch)
+            if cand:
+                cands.append(cand)
+        cands.sort(key=lambda c: c.geo_score, reverse=True)
+        stats["candidates"] = len(cands)
+    trace.count("cv_candidates", len(cands))
+
+    # --- 2) OCR solo de los top-K ---
+    best: Optional[Candidate] = cands[0] if cands else None
+    if top_k > 0 and cands:
+        with trace.span("cv_ocr"):
+            rules = get_rules()  # anclas Rareza/Trait de data/heuristics.json
+            best = None
+            for cand in cands[:top_k]:
+                x1, y1, x2, y2 = cand.box
+                # OCR dentro del rectángulo (upsample para mejor lectura)
+                crop = img[y1:y2, x1:x2]
+                crop_up = cv2.resize(crop, None, fx=1.5, fy=1.5, interpolation=cv2.INTER_CUBIC)
+                ana = analyze(crop_up, lang="eng", psm=6)
+                stats["ocr_calls"] += 1
+                trace.count("cv_ocr_candidates")
+                cand.analysis = scaled(ana, 1.5)
+                words = [wd["text"] for wd in ana.words]
+                text = " ".join(words)
+
+                has_rarity = bool(rules.rarity.search(text))
+                has_trait  = bool(rules.trait_label.search(text))
+
+                # si hay poco texto, penaliza (pero no descartes)
+                text_penalty = 1.0 if len(words) >= 6 else 0.6
+                anchors_score = (0.6 if has_rarity else 0.0) + (0.6 if has_trait else 0.0)
+                cand.score = text_penalty * ((0.45 * anchors_score) + (0.55 * cand.geo_score))
+
+                if (best is None) or (cand.score > best.score):
+                    best = cand
+                if has_rarity and has_trait:
+                    stats["early_exit"] = True
+                    best = cand
+                    break
+
+    # Top-3 candidatos para inspección: solo con ocr_debug_dumps y en segundo plano
+    if get_config()["ocr_debug_dumps"]:
+        with trace.span("cv_debug_png"):
+            for i, cand in enumerate(cands[:3], start=1):
+                get_writer().write(frames.crop(img, cand.box), os.path.join(CACHE_DIR, f"cv_cand_{i}.png"))
 
     return best
 
-def save_debug(roi_img: Image.Image, candidate: Optional[Candidate]):
-    dbg = np.array(roi_img.convert("RGB")).copy()
+def locate_tooltip(roi_img, mouse_abs, bbox_abs, mode: Optional[str] = None,
+                   top_k: Optional[int] = None, stats: Optional[dict] = None) -> Optional[Candidate]:
+    """
+    Punto de entrada para localizar el tooltip según `mode` (por defecto DETECT_MODE).
+    `roi_img` puede ser una imagen PIL o un array RGB (p.ej. el de frames.grab).
+    En `stats` queda `method` ("template" / "contours") además de los contadores de cada detector.
+    """
+    from ocr.tooltip_templates import locate
+
+    mode = mode or DETECT_MODE
+    if stats is None:
+        stats = {}
+    stats.update(method=None, ocr_calls=0)
+    if mode in ("template", "auto"):
+        with trace.span("template"):
+            cand = locate(roi_img, mouse_abs, bbox_abs, stats=stats)
+        if cand or mode == "template":
+            stats["method"] = "template"
+            trace.attr("detect_method", "template")
+            return cand
+    stats["method"] = "contours"
+    trace.attr("detect_method", "contours")
+    with trace.span("contours"):
+        return find_tooltip_rect(roi_img, mouse_abs, bbox_abs, top_k=top_k, stats=stats)
+
+def save_debug(roi_img, candidate: Optional[Candidate]):
+    dbg = frames.rgb(roi_img).copy()  # única copia: se pinta encima
     if candidate:
         x1, y1, x2, y2 = candidate.box
         cv2.rectangle(dbg, (x1,y1), (x2,y2), (0,255,0), 2)
-    out = os.path.join(CACHE_DIR, "cv_big_roi_debug.png")
-    Image.fromarray(dbg).save(out)
-    return out
+    return get_writer().write(dbg, os.path.join(CACHE_DIR, "cv_big_roi_debug.png"))
 
 def run_once():
-    big_img, bbox, mouse_abs, big_path = grab_big_roi()
+    big_img, bbox, mouse_abs, big_path = grab_big_roi(save=True)
     print(f"[+] ROI grande guardado: {big_path}  bbox={bbox}")
 
-    cand = find_tooltip_rect(big_img, mouse_abs, bbox)
+    stats = {}
+    t0 = time.perf_counter()
+    cand = locate_tooltip(big_img, mouse_abs, bbox, stats=stats)
+    ms = (time.perf_counter() - t0) * 1000
+    if stats["method"] == "template":
+        print(f"[+] Plantillas: {ms:.1f} ms  (score={stats['template_score'] or 0:.2f})")
+    else:
+        print(f"[+] Contornos: {ms:.1f} ms  candidatos: {stats['candidates']}  llamadas OCR: {stats['ocr_calls']}"
+              f"{'  (corte temprano)' if stats['early_exit'] else ''}")
     dbg_path = save_debug(big_img, cand)
     print(f"[+] Debug contornos: {dbg_path}")
 
@@ -173,21 +315,21 @@ def run_once():
         print("[-] No se detectó un rectángulo de tooltip (ajusta heurísticas).")
         return
 
-    x1,y1,x2,y2 = cand.box
-    tip = big_img.crop((x1,y1,x2,y2))
-    out = os.path.join(CACHE_DIR, "cv_tooltip_crop.png")
-    tip.save(out)
+    out = get_writer().write(frames.crop(big_img, cand.box), os.path.join(CACHE_DIR, "cv_tooltip_crop.png"))
     print(f"[✓] Tooltip recortado: {out}  (score={cand.score:.2f}, aspect={cand.aspect:.2f})")
 
 def main():
+    import keyboard
     print("F12 = detectar y recortar tooltip | Ctrl+F12 = salir")
-    while True:
-        if keyboard.is_pressed("f12"):
-            run_once()
-            time.sleep(0.5)
-        if keyboard.is_pressed("ctrl+f12"):
-            print("Saliendo…"); break
-        time.sleep(0.05)
+    # el hook del teclado solo avisa; run_once (OCR incluido) corre en este hilo
+    go, stop = threading.Event(), threading.Event()
+    keyboard.add_hotkey("f12", go.set)
+    keyboard.add_hotkey("ctrl+f12", lambda: (stop.set(), go.set()))
+    while go.wait() and not stop.is_set():
+        go.clear()
+        run_once()
+    keyboard.unhook_all_hotkeys()
+    print("Saliendo…")
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
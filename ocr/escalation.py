@@ -0,0 +1,116 @@
+"""
+Reconocimiento escalonado: primero la pasada barata y solo si no convence la
+siguiente, en vez de pagar siempre el camino más caro (config: ocr_tiered).
+
+Escalera (ladder) para el recorte del tooltip, de menos a más coste:
+
+    strips       franjas de nombre y trait (ocr/strips.py, si el tamaño ya es conocido)
+    native       tooltip entero a resolución nativa y sin preprocesado
+    preprocess   el ocr_preprocess de config (si no es 'none')
+    upscale      ×UPSCALE (si el preprocesado configurado no escala ya)
+    alt_psm      otra segmentación de página (ALT_PSM)
+
+Una pasada se acepta (judge) si el trait coincide con el vocabulario, la línea del
+nombre es creíble (letras suficientes y en formato título: las líneas de lore van
+en minúsculas) y la confianza media de tesseract en la línea del nombre y en la del
+trait llega, cada una, a ocr_tier_min_conf. Si ninguna se acepta se devuelve la mejor puntuada.
+Cada captura anota el escalón que necesitó (analysis.meta["tier"], trace y stats()).
+"""
+import threading
+from collections import Counter
+from dataclasses import dataclass
+from typing import List
+
+from ocr import preprocess as preprocess_mod, trace
+from ocr.analysis import analyze, scaled
+from ocr.heuristics import get_rules, line_index, select
+from ocr.normalizer import traits, snap
+
+UPSCALE = 2
+ALT_PSM = 4              # bloques de texto de tamaño variable
+MIN_CONF = 60            # por defecto de ocr_tier_min_conf
+TITLE_MIN = 0.5          # fracción de palabras (3+ letras) con mayúscula inicial en el nombre
+
+@dataclass
+class Tier:
+    name: str
+    preprocess: str
+    psm: int
+
+def ladder(cfg: dict) -> List[Tier]:
+    """Escalones de pasada completa según config (las franjas van antes, en parse_tooltip)."""
+    psm, pre = cfg["ocr_psm"], cfg["ocr_preprocess"]
+    tiers = [Tier("native", "none", psm)]
+    if pre != "none":
+        tiers.append(Tier("preprocess", pre, psm))
+    if preprocess_mod.scale_of(pre) == 1:
+        tiers.append(Tier("upscale", f"upscale:{UPSCALE}", psm))
+    tiers.append(Tier("alt_psm", "none", ALT_PSM if psm != ALT_PSM else 6))
+    return tiers
+
+def title_fraction(text: str) -> float:
+    """Fracción de palabras (3+ letras) con mayúscula inicial: los nombres van en formato título."""
+    words = [w for w in text.split() if sum(c.isalpha() for c in w) >= 3]
+    return sum(w.lstrip("'\"([").startswith(tuple("ABCDEFGHIJKLMNOPQRSTUVWXYZ")) for w in words) / len(words) \
+        if words else 0.0
+
+def judge(analysis, min_conf: float = MIN_CONF):
+    """(aceptada, puntuación) de una pasada: nombre creíble + trait del vocabulario + confianza."""
+    ix = line_index(analysis)
+    name, trait = select(ix)
+    trait_ok = trait is not None and snap(trait.text, traits())[1] > 0
+    name_ok = (name is not None and name.letters >= get_rules().params["min_name_letters"]
+               and title_fraction(name.text) >= TITLE_MIN)
+    # cada línea por separado: un trait nítido no tapa un nombre ilegible
+    confs = [analysis.lines[li.idx].conf if li is not None else 0.0 for li in (name, trait)]
+    ok = trait_ok and name_ok and min(confs) >= min_conf
+    return ok, trait_ok + name_ok + min(confs) / 100.0
+
+_lock = threading.Lock()
+_counts = Counter()      # escalón aceptado -> capturas
+_passes = Counter()      # escalón -> pasadas hechas (aceptadas o no)
+
+def record(tier: str, tried: List[str] = ()):
+    with _lock:
+        _counts[tier] += 1
+        for t in tried or (tier,):
+            _passes[t] += 1
+    trace.attr("ocr_tier", tier)
+    trace.count("ocr_passes", len(tried) or 1)
+
+def recognize(img, lang: str, cfg: dict):
+    """Sube por la escalera hasta una pasada aceptada; devuelve el TooltipAnalysis (meta: tier, tiers_tried)."""
+    min_conf = cfg["ocr_tier_min_conf"]
+    best = best_score = None
+    tried = []
+    for tier in ladder(cfg):
+        timings = {}
+        with trace.span(f"ocr_tier_{tier.name}"):
+            pre = preprocess_mod.run(img, tier.preprocess, timings)
+            analysis = analyze(pre, lang=lang, psm=tier.psm, preprocess=tier.preprocess)
+            k = preprocess_mod.scale_of(tier.preprocess)
+            if k > 1:  # cajas de vuelta a coordenadas del recorte original
+                analysis = scaled(analysis, k)
+        analysis.meta["preprocess_ms"] = timings
+        tried.append(tier.name)
+        ok, score = judge(analysis, min_conf)
+        analysis.meta["tier"] = tier.name
+        if best is None or score > best_score:
+            best, best_score = analysis, score
+        if ok:
+            break
+    best.meta["tiers_tried"] = tried
+    record(best.meta["tier"], tried)
+    return best
+
+def stats() -> dict:
+    with _lock:
+        return {"accepted": dict(_counts), "passes": dict(_passes)}
+
+def format_stats() -> str:
+    s = stats()
+    n = sum(s["accepted"].values())
+    if not n:
+        return ""
+    parts = ", ".join(f"{k} {v}" for k, v in sorted(s["accepted"].items(), key=lambda kv: -kv[1]))
+    return f"OCR escalonado: {n} capturas ({parts}); {sum(s['passes'].values()) / n:.2f} pasadas por captura"
@@ -0,0 +1,75 @@
+"""
+Frames en memoria: captura de pantalla a array NumPy y utilidades que aceptan
+indistintamente rutas, imágenes PIL o arrays.
+
+Con mss instalado la captura lee el buffer BGRA de mss como array sin copiarlo
+y hace una única conversión a RGB; sin mss se usa PIL.ImageGrab. A partir de
+ahí el frame viaja como array: recortar es una vista (a[y1:y2, x1:x2]) y solo
+se copia cuando algo lo necesita (p.ej. tesseract, que quiere una imagen PIL).
+"""
+import os, threading
+from typing import Optional, Tuple
+
+import cv2
+import numpy as np
+from PIL import Image
+
+try:
+    import mss
+except Exception:  # mss es opcional
+    mss = None
+
+BACKEND = "mss" if mss is not None else "pil"
+
+_local = threading.local()   # una instancia de mss por hilo (no se comparten entre hilos)
+
+def grab(bbox: Optional[Tuple[int, int, int, int]] = None) -> np.ndarray:
+    """Pantalla (o bbox x1,y1,x2,y2 absoluto) como array RGB uint8 (H, W, 3)."""
+    if mss is not None:
+        sct = getattr(_local, "sct", None)
+        if sct is None:
+            sct = _local.sct = mss.mss()
+        if bbox is None:
+            region = sct.monitors[1]  # monitor principal, como ImageGrab.grab()
+        else:
+            x1, y1, x2, y2 = bbox
+            region = {"left": x1, "top": y1, "width": x2 - x1, "height": y2 - y1}
+        shot = sct.grab(region)
+        bgra = np.frombuffer(shot.raw, np.uint8).reshape(shot.height, shot.width, 4)  # vista, sin copia
+        return cv2.cvtColor(bgra, cv2.COLOR_BGRA2RGB)
+    from PIL import ImageGrab
+    img = ImageGrab.grab(bbox=bbox)
+    return np.asarray(img if img.mode == "RGB" else img.convert("RGB"))
+
+def load(img):
+    """Ruta -> array RGB; una imagen PIL o un array se devuelven tal cual."""
+    if isinstance(img, (str, os.PathLike)):
+        with Image.open(img) as im:
+            return np.asarray(im.convert("RGB"))
+    return img
+
+def size(img) -> Tuple[int, int]:
+    """(ancho, alto) de una imagen PIL o un array."""
+    if isinstance(img, np.ndarray):
+        return img.shape[1], img.shape[0]
+    return img.size
+
+def crop(img, box):
+    """Recorte (x1, y1, x2, y2): vista del array sin copiar, o Image.crop con PIL."""
+    if isinstance(img, np.ndarray):
+        x1, y1, x2, y2 = box
+        return img[y1:y2, x1:x2]
+    return img.crop(box)
+
+def rgb(img) -> np.ndarray:
+    """Array RGB (sin copiar si ya lo es)."""
+    a = img if isinstance(img, np.ndarray) else np.asarray(img.convert("RGB") if img.mode != "RGB" else img)
+    return cv2.cvtColor(a, cv2.COLOR_GRAY2RGB) if a.ndim == 2 else a
+
+def gray(img) -> np.ndarray:
+    if isinstance(img, np.ndarray):
+        return img if img.ndim == 2 else cv2.cvtColor(img, cv2.COLOR_RGB2GRAY)
+    return np.asarray(img.convert("L"))
+
+def to_image(img) -> Image.Image:
+    return img if isinstance(img, Image.Image) else Image.fromarray(np.ascontiguousarray(img))
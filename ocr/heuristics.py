@@ -0,0 +1,176 @@
+"""
+Reglas para sacar nombre y trait de un TooltipAnalysis.
+
+El vocabulario del juego (rarezas, tipos de item, lista negra de líneas que no
+pueden ser nombre, anclas inferiores, pistas de trait) vive en data/heuristics.json
+y se compila una sola vez: una regex por categoría, así que añadir palabras no
+añade pasadas. Por cada resultado de OCR se construye un índice de líneas (una
+pasada sobre las líneas del análisis) y la elección de nombre y trait es otra
+pasada lineal sobre ese índice.
+"""
+import os, re, json, threading
+from dataclasses import dataclass, field
+from typing import List, Optional, Tuple
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+RULES_PATH = os.path.join(ROOT, "data", "heuristics.json")
+
+DEFAULT_PARAMS = {"name_window": 180, "lower_window": 260, "min_name_letters": 6, "min_name_words": 2}
+
+_ALPHA = re.compile(r"[A-Za-z]")
+_NUMERIC = re.compile(r"[\W\d%.\-+ ]+")
+
+def _phrase(p: str) -> str:
+    # "off hand" también casa con "off-hand" / "offhand" / "off  hand"
+    return r"[\s\-]*".join(re.escape(w) for w in p.split())
+
+def compile_vocab(words, suffix: str = "") -> re.Pattern:
+    """Una sola regex (?i)\\b(a|b|...)suffix\\b; las frases largas primero."""
+    alts = sorted({_phrase(w) for w in words if w.strip()}, key=len, reverse=True)
+    if not alts:
+        return re.compile(r"(?!x)x")  # nunca casa
+    return re.compile(r"(?i)\b(" + "|".join(alts) + r")" + suffix + r"\b")
+
+class Rules:
+    def __init__(self, data: dict):
+        # el OCR suele pegar i/l/1 a la rareza ("Epicll")
+        self.rarity = compile_vocab(data.get("rarity", []), suffix=r"[il1]*")
+        self.item_type = compile_vocab(data.get("item_types", []))
+        self.trait_label = compile_vocab(data.get("trait_label", ["trait"]))
+        self.name_blacklist = compile_vocab(data.get("name_blacklist", []))
+        self.lower_anchor = compile_vocab(data.get("lower_anchors", []))
+        self.trait_hint = compile_vocab(data.get("trait_hints", []))
+        self.params = {**DEFAULT_PARAMS, **data.get("params", {})}
+
+    @classmethod
+    def load(cls, path: str = RULES_PATH) -> "Rules":
+        try:
+            with open(path, "r", encoding="utf-8-sig") as f:
+                return cls(json.load(f))
+        except FileNotFoundError:
+            return cls({})
+
+    def is_trait_label(self, word: str) -> bool:
+        return self.trait_label.fullmatch(word.strip(":.")) is not None
+
+_rules = None
+_rules_lock = threading.Lock()
+
+def get_rules() -> Rules:
+    global _rules
+    if _rules is None:
+        with _rules_lock:
+            if _rules is None:
+                _rules = Rules.load()
+    return _rules
+
+@dataclass
+class LineInfo:
+    idx: int
+    text: str
+    box: Tuple[int, int, int, int]
+    yc: float
+    alpha_words: int       # palabras con letras
+    alpha_width: int       # ancho sumado de esas palabras
+    max_h: int             # altura de letra máxima entre ellas
+    letters: int
+    blacklisted: bool
+    numeric: bool          # casi todo números/símbolos
+
+    @property
+    def name_score(self) -> int:
+        # preferir líneas anchas y con letra grande
+        return self.alpha_width + 3 * self.max_h
+
+@dataclass
+class LineIndex:
+    lines: List[LineInfo]
+    size: Tuple[int, int]
+    rarity_words: List[dict] = field(default_factory=list)
+    type_words: List[dict] = field(default_factory=list)
+    trait_label: Optional[int] = None     # línea con la etiqueta "Trait"
+    lower_y: Optional[int] = None         # y de la primera ancla inferior (Defense/Damage…)
+
+def line_index(analysis, rules: Rules = None) -> LineIndex:
+    """Índice de líneas del análisis (se calcula una vez y queda en analysis.meta)."""
+    ix = analysis.meta.get("line_index")
+    if ix is not None:
+        return ix
+    rules = rules or get_rules()
+    ix = LineIndex(lines=[], size=analysis.size)
+    for i, line in enumerate(analysis.lines):
+        alpha = []
+        for w in line.words:
+            t = w["text"]
+            if not _ALPHA.search(t):
+                continue
+            alpha.append(w)
+            if rules.rarity.search(t):
+                ix.rarity_words.append(w)
+            if rules.item_type.search(t):
+                ix.type_words.append(w)
+            if ix.trait_label is None and rules.is_trait_label(t):
+                ix.trait_label = i
+            if rules.lower_anchor.search(t) and (ix.lower_y is None or w["y"] < ix.lower_y):
+                ix.lower_y = w["y"]
+        x1, y1, x2, y2 = line.box
+        ix.lines.append(LineInfo(
+            idx=i, text=line.text, box=line.box, yc=(y1 + y2) / 2,
+            alpha_words=len(alpha),
+            alpha_width=sum(w["w"] for w in alpha),
+            max_h=max((w["h"] for w in alpha), default=0),
+            letters=len(_ALPHA.findall(line.text)),
+            blacklisted=bool(rules.name_blacklist.search(line.text)),
+            numeric=_NUMERIC.fullmatch(line.text) is not None,
+        ))
+    analysis.meta["line_index"] = ix
+    return ix
+
+def _name_window(ix: LineIndex, rules: Rules):
+    """Franja vertical bajo las anclas Rareza + Tipo donde suele estar el nombre."""
+    if not (ix.rarity_words and ix.type_words):
+        return None
+    cx = ix.size[0] // 2
+    a_r = min(ix.rarity_words, key=lambda w: abs((w["x"] + w["w"] // 2) - cx))
+    a_t = min(ix.type_words, key=lambda w: abs(w["y"] - a_r["y"]) + abs(w["x"] - a_r["x"]))
+    top = min(a_r["y"] + a_r["h"], a_t["y"] + a_t["h"]) + 2
+    return top, top + rules.params["name_window"]
+
+def select(ix: LineIndex, rules: Rules = None):
+    """
+    (línea del nombre, línea del trait) como LineInfo o None, en una pasada:
+      1) nombre dentro de la franja de las anclas Rareza + Tipo;
+      2) si no, la mejor línea por encima de la primera ancla inferior (Defense/Damage…);
+      3) si no, la línea más alta con letras.
+    El trait es la línea que sigue a la etiqueta "Trait" en orden de lectura.
+    """
+    rules = rules or get_rules()
+    p = rules.params
+    window = _name_window(ix, rules)
+    best_window = best_lower = top_line = None
+    for li in ix.lines:
+        if li.alpha_words and (top_line is None or li.box[1] < top_line.box[1]):
+            top_line = li
+        if li.alpha_words < p["min_name_words"] or li.blacklisted or li.numeric:
+            continue
+        if window and window[0] <= li.yc <= window[1]:
+            if best_window is None or li.name_score > best_window.name_score:
+                best_window = li
+        if (ix.lower_y is not None and li.yc < ix.lower_y and ix.lower_y - li.yc <= p["lower_window"]
+                and li.letters >= p["min_name_letters"]):
+            if best_lower is None or li.name_score > best_lower.name_score:
+                best_lower = li
+    name = best_window or best_lower or top_line
+
+    trait = None
+    if ix.trait_label is not None and ix.trait_label + 1 < len(ix.lines):
+        trait = ix.lines[ix.trait_label + 1]
+    return name, trait
+
+def trait_hint_line(ix: LineIndex, rules: Rules = None, start: int = 1, stop: int = None) -> Optional[LineInfo]:
+    """Primera línea (en [start, stop)) con alguna pista de trait."""
+    rules = rules or get_rules()
+    for li in ix.lines[start:stop]:
+        if rules.trait_hint.search(li.text):
+            return li
+    return None
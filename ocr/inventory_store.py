@@ -0,0 +1,244 @@
+"""
+Inventario en SQLite (data/inventory.sqlite, modo WAL).
+
+Una fila por (item_name, trait) normalizados, con índice único: cada captura es
+un upsert que suma qty y actualiza last_seen, y "¿cuántos X con trait Y tengo?"
+es una búsqueda por índice en vez de recorrer el CSV. Las escrituras se acumulan
+y se vuelcan en una sola transacción (cada BATCH_SIZE capturas o, como mucho,
+FLUSH_SECONDS después del primer avistamiento pendiente: un temporizador vuelca
+aunque no llegue otra captura).
+
+data/inventory.csv se mantiene como exportación (mismas columnas de siempre) y,
+la primera vez, se importa a la base fusionando las filas repetidas.
+
+    python ocr/inventory_store.py export [salida.csv]
+    python ocr/inventory_store.py migrate [entrada.csv]
+    python ocr/inventory_store.py count "Item name" ["Trait"]
+"""
+import os, re, csv, sys, time, sqlite3, threading, unicodedata
+from datetime import datetime
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DB_PATH = os.path.join(ROOT, "data", "inventory.sqlite")
+INV_CSV = os.path.join(ROOT, "data", "inventory.csv")
+
+CSV_HEADER = ["item_name", "trait", "qty", "slot_img", "tooltip_img", "last_seen"]
+
+BATCH_SIZE = 32        # upserts pendientes antes de volcar
+FLUSH_SECONDS = 1.0    # o este tiempo desde el último volcado
+
+_SPACES = re.compile(r"\s+")
+_EDGE_PUNCT = re.compile(r"^[\W_]+|[\W_]+$")
+
+class StoreClosed(RuntimeError):
+    """add() después de close(): la fila se perdería sin avisar."""
+
+def normalize(text: str) -> str:
+    """Clave de búsqueda: NFKC, minúsculas, espacios colapsados y sin puntuación en los extremos."""
+    t = unicodedata.normalize("NFKC", text or "").casefold()
+    t = _SPACES.sub(" ", t).strip()
+    return _EDGE_PUNCT.sub("", t)
+
+def now_iso():
+    return datetime.now().isoformat(timespec="seconds")
+
+class InventoryStore:
+    def __init__(self, path: str = DB_PATH, csv_path: str = INV_CSV):
+        self.path = path
+        self.csv_path = csv_path
+        self._lock = threading.Lock()
+        self._pending = []  # (item_name, trait, norm_name, norm_trait, qty, slot_img, tooltip_img, last_seen)
+        self._last_flush = time.monotonic()
+        self._timer = None  # volcado diferido mientras haya filas pendientes
+        self._closed = False
+        self.upserts = 0
+        self.flushes = 0
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._db = sqlite3.connect(path, check_same_thread=False, timeout=10)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute("""
+            CREATE TABLE IF NOT EXISTS inventory (
+                id INTEGER PRIMARY KEY,
+                item_name TEXT NOT NULL,
+                trait TEXT NOT NULL,
+                norm_name TEXT NOT NULL,
+                norm_trait TEXT NOT NULL,
+                qty INTEGER NOT NULL DEFAULT 0,
+                slot_img TEXT NOT NULL DEFAULT '',
+                tooltip_img TEXT NOT NULL DEFAULT '',
+                first_seen TEXT NOT NULL,
+                last_seen TEXT NOT NULL
+            )""")
+        self._db.execute("CREATE UNIQUE INDEX IF NOT EXISTS inventory_key ON inventory(norm_name, norm_trait)")
+        self._db.execute("CREATE INDEX IF NOT EXISTS inventory_last_seen ON inventory(last_seen)")
+        self._db.commit()
+        empty = self._db.execute("SELECT NOT EXISTS (SELECT 1 FROM inventory)").fetchone()[0]
+        if empty and os.path.exists(csv_path):
+            self.migrate_csv(csv_path)
+
+    # --- escritura ---------------------------------------------------------
+
+    def add(self, item_name: str, trait: str, qty: int = 1, tooltip_img: str = "",
+            slot_img: str = "", seen: str = None):
+        """Registra un avistamiento (upsert diferido: se vuelca por lotes)."""
+        item_name, trait = (item_name or "").strip(), (trait or "").strip()
+        row = (item_name, trait, normalize(item_name), normalize(trait), int(qty),
+               slot_img or "", tooltip_img or "", seen or now_iso())
+        with self._lock:
+            if self._closed:
+                raise StoreClosed(f"inventario cerrado ({self.path}): no se registra {item_name!r} / {trait!r}")
+            self._pending.append(row)
+            if (len(self._pending) >= BATCH_SIZE
+                    or time.monotonic() - self._last_flush >= FLUSH_SECONDS):
+                self._flush()
+            elif self._timer is None:
+                self._timer = threading.Timer(FLUSH_SECONDS, self._timed_flush)
+                self._timer.daemon = True
+                self._timer.start()
+
+    def flush(self):
+        with self._lock:
+            if not self._closed:
+                self._flush()
+
+    def _timed_flush(self):
+        with self._lock:
+            self._timer = None
+            if not self._closed:
+                self._flush()
+
+    def _flush(self):
+        self._last_flush = time.monotonic()
+        if not self._pending:
+            return
+        rows, self._pending = self._pending, []
+        # los avistamientos repetidos suman qty; last_seen/tooltip_img son los más recientes
+        with self._db:
+            self._db.executemany("""
+                INSERT INTO inventory (item_name, trait, norm_name, norm_trait, qty,
+                                       slot_img, tooltip_img, first_seen, last_seen)
+                VALUES (?1, ?2, ?3, ?4, ?5, ?6, ?7, ?8, ?8)
+                ON CONFLICT(norm_name, norm_trait) DO UPDATE SET
+                    qty = qty + excluded.qty,
+                    last_seen = max(last_seen, excluded.last_seen),
+                    tooltip_img = CASE WHEN excluded.tooltip_img != '' AND excluded.last_seen >= last_seen
+                                       THEN excluded.tooltip_img ELSE tooltip_img END,
+                    slot_img = CASE WHEN excluded.slot_img != '' THEN excluded.slot_img ELSE slot_img END
+                """, rows)
+        self.upserts += len(rows)
+        self.flushes += 1
+
+    def close(self):
+        with self._lock:
+            if self._closed:
+                return
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+            self._flush()
+            self._closed = True
+            self._db.close()
+
+    # --- lectura -----------------------------------------------------------
+
+    def get(self, item_name: str, trait: str = ""):
+        """Fila (dict) del item/trait o None."""
+        with self._lock:
+            self._flush()
+            cur = self._db.execute(
+                "SELECT item_name, trait, qty, slot_img, tooltip_img, first_seen, last_seen "
+                "FROM inventory WHERE norm_name = ? AND norm_trait = ?",
+                (normalize(item_name), normalize(trait)))
+            row = cur.fetchone()
+            return dict(zip([c[0] for c in cur.description], row)) if row else None
+
+    def count(self, item_name: str, trait: str = None) -> int:
+        """qty de item+trait; con trait=None, de todas las variantes del item."""
+        with self._lock:
+            self._flush()
+            if trait is None:
+                row = self._db.execute("SELECT COALESCE(SUM(qty), 0) FROM inventory WHERE norm_name = ?",
+                                       (normalize(item_name),)).fetchone()
+            else:
+                row = self._db.execute("SELECT qty FROM inventory WHERE norm_name = ? AND norm_trait = ?",
+                                       (normalize(item_name), normalize(trait))).fetchone()
+            return row[0] if row else 0
+
+    def rows(self):
+        """Filas en el formato del CSV (CSV_HEADER), de la más antigua a la más reciente."""
+        with self._lock:
+            self._flush()
+            return self._db.execute(
+                "SELECT item_name, trait, qty, slot_img, tooltip_img, last_seen "
+                "FROM inventory ORDER BY first_seen, id").fetchall()
+
+    def stats(self) -> dict:
+        with self._lock:
+            self._flush()
+            n, qty = self._db.execute("SELECT COUNT(*), COALESCE(SUM(qty), 0) FROM inventory").fetchone()
+        return {"entries": n, "qty": qty, "upserts": self.upserts, "flushes": self.flushes}
+
+    # --- CSV ---------------------------------------------------------------
+
+    def export_csv(self, path: str = None) -> str:
+        """Escribe el inventario con las columnas de siempre (utf-8 con BOM, para Excel)."""
+        path = path or self.csv_path
+        rows = self.rows()
+        tmp = path + ".tmp"
+        with open(tmp, "w", newline="", encoding="utf-8-sig") as f:
+            writer = csv.writer(f)
+            writer.writerow(CSV_HEADER)
+            writer.writerows(rows)
+        os.replace(tmp, path)
+        return path
+
+    def migrate_csv(self, path: str = None) -> int:
+        """Importa un inventory.csv antiguo (una fila por captura); devuelve filas leídas."""
+        path = path or self.csv_path
+        n = 0
+        with open(path, "r", newline="", encoding="utf-8-sig") as f:
+            for row in csv.DictReader(f):
+                try:
+                    qty = int(row.get("qty") or 1)
+                except ValueError:
+                    qty = 1
+                self.add(row.get("item_name", ""), row.get("trait", ""), qty=qty,
+                         tooltip_img=row.get("tooltip_img", ""), slot_img=row.get("slot_img", ""),
+                         seen=row.get("last_seen") or None)
+                n += 1
+        self.flush()
+        return n
+
+_store = None
+_store_lock = threading.Lock()
+
+def get_store() -> InventoryStore:
+    """Inventario compartido del proceso (se abre en el primer uso)."""
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = InventoryStore()
+    return _store
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    cmd = argv[0] if argv else "export"
+    store = get_store()
+    if cmd == "export":
+        print("Exportado:", store.export_csv(argv[1] if len(argv) > 1 else None))
+    elif cmd == "migrate":
+        print("Filas importadas:", store.migrate_csv(argv[1] if len(argv) > 1 else None))
+    elif cmd == "count" and len(argv) >= 2:
+        print(store.count(argv[1], argv[2] if len(argv) > 2 else None))
+    else:
+        print(__doc__)
+        return 2
+    s = store.stats()
+    print(f"{s['entries']} items distintos, {s['qty']} en total")
+    store.close()
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
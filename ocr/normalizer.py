@@ -0,0 +1,219 @@
+"""
+Normaliza nombres de item y traits leídos por OCR a sus entradas canónicas.
+
+Vocabulario en data/aliases.json (items) y data/traits_map.json (traits):
+
+    {"Collar of Nature's Wrath": ["Collar of Natures Wrath", "Coliar of Nature's Wrath"], ...}
+
+La clave es el ID canónico (el nombre tal cual se guarda en el inventario) y la
+lista son variantes conocidas. También vale la forma inversa {"variante": "Canónico"}.
+
+Búsqueda: coincidencia exacta de la forma normalizada y, si no, índice invertido
+de trigramas para quedarse con unos pocos candidatos y Levenshtein (completo o
+contra la mejor subcadena, porque el OCR suele pegar basura a los lados) sobre
+ellos. Cada consulta resuelta se guarda en un LRU.
+"""
+import os, re, sys, json, threading, unicodedata
+from collections import Counter, OrderedDict
+from dataclasses import dataclass
+from typing import Iterable, Optional
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+ALIASES_PATH = os.path.join(ROOT, "data", "aliases.json")
+TRAITS_PATH = os.path.join(ROOT, "data", "traits_map.json")
+
+MIN_SCORE = 0.80        # confianza mínima para sustituir el texto OCR
+PARTIAL_WEIGHT = 0.95   # una coincidencia contra una subcadena vale algo menos que una completa
+CANDIDATES = 5          # candidatos (por trigramas) que pasan a Levenshtein
+CACHE_ENTRIES = 4096
+FLOOR = 0.5             # por debajo de esto ni se guarda la coincidencia
+
+_NON_ALNUM = re.compile(r"[^0-9a-z]+")
+
+def norm(text: str) -> str:
+    """Minúsculas sin acentos ni puntuación, palabras separadas por un espacio."""
+    t = unicodedata.normalize("NFKD", text or "")
+    t = "".join(c for c in t if not unicodedata.combining(c)).casefold()
+    return _NON_ALNUM.sub(" ", t.replace("'", "")).strip()
+
+def trigrams(s: str):
+    s = f"  {s} "
+    return {s[i:i + 3] for i in range(len(s) - 2)}
+
+def _edit_rows(a: str, b: str, first_row, limit: int):
+    """DP de edición de `a` contra `b`; corta en cuanto toda la fila supera `limit`."""
+    prev = first_row
+    for i, ca in enumerate(a, 1):
+        cur = [i]
+        left = i
+        for j, cb in enumerate(b, 1):
+            d = prev[j - 1] + (ca != cb)
+            up = prev[j] + 1
+            if up < d:
+                d = up
+            if left + 1 < d:
+                d = left + 1
+            cur.append(d)
+            left = d
+        if min(cur) > limit:
+            return None
+        prev = cur
+    return prev
+
+def levenshtein(a: str, b: str, limit: int = None) -> int:
+    """Distancia de edición; con `limit` devuelve limit + 1 en cuanto se sabe que lo supera."""
+    limit = max(len(a), len(b)) if limit is None else limit
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+    row = _edit_rows(a, b, list(range(len(b) + 1)), limit)
+    return limit + 1 if row is None or row[-1] > limit else row[-1]
+
+def substring_distance(pattern: str, text: str, limit: int = None) -> int:
+    """Menor Levenshtein entre `pattern` y cualquier subcadena de `text` (Sellers)."""
+    limit = len(pattern) if limit is None else limit
+    # empezar en cualquier posición de text no cuesta: primera fila a cero
+    row = _edit_rows(pattern, text, [0] * (len(text) + 1), limit)
+    return limit + 1 if row is None else min(min(row), limit + 1)
+
+@dataclass(frozen=True)
+class Match:
+    id: str        # entrada canónica
+    score: float   # 0..1
+    variant: str   # variante (normalizada) que coincidió
+
+class Vocabulary:
+    def __init__(self, entries: dict = None):
+        self.variants = []      # (forma normalizada, id canónico)
+        self.exact = {}         # forma normalizada -> id
+        self.index = {}         # trigrama -> [posición en variants]
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = self.misses = 0
+        for cid, aliases in (entries or {}).items():
+            self.add(cid, cid)
+            for a in aliases:
+                self.add(cid, a)
+
+    @classmethod
+    def from_json(cls, path: str) -> "Vocabulary":
+        try:
+            with open(path, "r", encoding="utf-8-sig") as f:
+                data = json.load(f)
+        except FileNotFoundError:
+            data = {}
+        entries = {}
+        for key, value in data.items():
+            if isinstance(value, str):          # {"variante": "Canónico"}
+                entries.setdefault(value, []).append(key)
+            else:                               # {"Canónico": ["variante", ...]}
+                entries.setdefault(key, []).extend(value or [])
+        return cls(entries)
+
+    def __len__(self):
+        return len(self.exact)
+
+    def add(self, cid: str, variant: str):
+        n = norm(variant)
+        if not n or n in self.exact:
+            return
+        self.exact[n] = cid
+        pos = len(self.variants)
+        self.variants.append((n, cid))
+        for g in trigrams(n):
+            self.index.setdefault(g, []).append(pos)
+        self._cache.clear()
+
+    def match(self, text: str, min_score: float = MIN_SCORE) -> Optional[Match]:
+        q = norm(text)
+        if not q or not self.variants:
+            return None
+        with self._lock:
+            if q in self._cache:
+                self._cache.move_to_end(q)
+                self.hits += 1
+                m = self._cache[q]
+                return m if m is not None and m.score >= min_score else None
+        m = self._lookup(q)
+        with self._lock:
+            self.misses += 1
+            self._cache[q] = m
+            while len(self._cache) > CACHE_ENTRIES:
+                self._cache.popitem(last=False)
+        return m if m is not None and m.score >= min_score else None
+
+    def _lookup(self, q: str) -> Optional[Match]:
+        cid = self.exact.get(q)
+        if cid is not None:
+            return Match(cid, 1.0, q)
+        # candidatos: fracción de los trigramas de cada variante que aparecen en la consulta
+        shared = Counter()
+        for g in trigrams(q):
+            for pos in self.index.get(g, ()):
+                shared[pos] += 1
+        if not shared:
+            return None
+        overlap = {p: c / (len(self.variants[p][0]) + 2) for p, c in shared.items()}
+        ranked = sorted(overlap, key=overlap.get, reverse=True)[:CANDIDATES]
+        best = None
+        for pos in ranked:
+            if overlap[pos] < 0.5 * overlap[ranked[0]]:
+                break  # comparte menos de la mitad de trigramas que el mejor: no puede ganar
+            v, cid = self.variants[pos]
+            # solo interesa saber si supera al mejor hasta ahora: distancias acotadas
+            floor = max(FLOOR, best.score) if best is not None else FLOOR
+            size = max(len(q), len(v))
+            score = 1.0 - levenshtein(q, v, int((1.0 - floor) * size)) / size
+            if len(q) > len(v) and score < PARTIAL_WEIGHT:
+                d = substring_distance(v, q, int((1.0 - floor / PARTIAL_WEIGHT) * len(v)))
+                score = max(score, PARTIAL_WEIGHT * (1.0 - d / len(v)))
+            if score < FLOOR:
+                continue
+            # a igual confianza gana la variante más larga ("Magic Hit Chance" frente a "Hit Chance")
+            if best is None or (score, len(v)) > (best.score, len(best.variant)):
+                best = Match(cid, score, v)
+        return best
+
+    def best_of(self, texts: Iterable[str], min_score: float = MIN_SCORE) -> Optional[Match]:
+        """La mejor coincidencia entre varias líneas candidatas."""
+        best = None
+        for t in texts:
+            m = self.match(t, min_score)
+            if m is not None and (best is None or m.score > best.score):
+                best = m
+        return best
+
+    def stats(self) -> dict:
+        return {"variants": len(self.variants), "hits": self.hits, "misses": self.misses}
+
+_vocabs = {}
+_vocabs_lock = threading.Lock()
+
+def _vocab(path: str) -> Vocabulary:
+    v = _vocabs.get(path)
+    if v is None:
+        with _vocabs_lock:
+            v = _vocabs.get(path)
+            if v is None:
+                v = _vocabs[path] = Vocabulary.from_json(path)
+    return v
+
+def names() -> Vocabulary:
+    return _vocab(ALIASES_PATH)
+
+def traits() -> Vocabulary:
+    return _vocab(TRAITS_PATH)
+
+def canonical_name(text: str, min_score: float = MIN_SCORE) -> Optional[Match]:
+    return names().match(text, min_score)
+
+def canonical_trait(text: str, min_score: float = MIN_SCORE) -> Optional[Match]:
+    return traits().match(text, min_score)
+
+def snap(text, vocab: Vocabulary, min_score: float = MIN_SCORE):
+    """(id canónico, confianza) si hay coincidencia; si no, (texto OCR, 0.0)."""
+    m = vocab.match(text, min_score) if text else None
+    return (m.id, m.score) if m is not None else (text, 0.0)
+
+if __name__ == "__main__":
+    for t in sys.argv[1:]:
+        print(f"{t!r}\n  item : {names().match(t, 0.0)}\n  trait: {traits().match(t, 0.0)}")
@@ -0,0 +1,106 @@
+"""
+Caché de resultados de OCR por contenido, en cache/ocr_cache.sqlite.
+
+La clave es un hash de los píxeles ya preprocesados más los parámetros de OCR
+(lang, psm, preprocesado); el valor son las cajas de palabras (text_boxes /
+image_to_words), de las que sale todo lo demás (TooltipAnalysis, parse_tooltip).
+Hay un LRU pequeño en memoria delante de SQLite y desalojo LRU acotado en disco.
+"""
+import os, json, time, sqlite3, hashlib, threading
+from collections import OrderedDict
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+CACHE_PATH = os.path.join(ROOT, "cache", "ocr_cache.sqlite")
+
+MAX_ENTRIES = 20000      # entradas en disco antes de desalojar
+MEMORY_ENTRIES = 256     # LRU en memoria (aciertos en microsegundos)
+EVICT_FRACTION = 0.1     # al pasarse, se borra este % de las menos usadas
+
+def make_key(img, **params) -> str:
+    """Hash de los píxeles (modo, tamaño y bytes) + parámetros de OCR."""
+    h = hashlib.blake2b(digest_size=16)
+    h.update(f"{img.mode}|{img.size[0]}x{img.size[1]}|".encode())
+    h.update(json.dumps(params, sort_keys=True).encode())
+    h.update(img.tobytes())
+    return h.hexdigest()
+
+class OcrCache:
+    def __init__(self, path: str = CACHE_PATH, max_entries: int = MAX_ENTRIES):
+        self.path = path
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._mem = OrderedDict()
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._db = sqlite3.connect(path, check_same_thread=False, timeout=10)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS ocr (key TEXT PRIMARY KEY, value TEXT NOT NULL, last_used REAL NOT NULL)"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS ocr_last_used ON ocr(last_used)")
+        self._db.commit()
+        self._count = self._db.execute("SELECT COUNT(*) FROM ocr").fetchone()[0]
+
+    def _remember(self, key, value):
+        self._mem[key] = value
+        self._mem.move_to_end(key)
+        while len(self._mem) > MEMORY_ENTRIES:
+            self._mem.popitem(last=False)
+
+    def get(self, key: str):
+        with self._lock:
+            if key in self._mem:
+                self._mem.move_to_end(key)
+                self.hits += 1
+                return self._mem[key]
+            row = self._db.execute("SELECT value FROM ocr WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            self._db.execute("UPDATE ocr SET last_used = ? WHERE key = ?", (time.time(), key))
+            self._db.commit()
+            value = json.loads(row[0])
+            self._remember(key, value)
+            self.hits += 1
+            return value
+
+    def put(self, key: str, value):
+        with self._lock:
+            # rowcount vale 1 también cuando REPLACE sustituye una clave existente
+            new = self._db.execute("SELECT 1 FROM ocr WHERE key = ?", (key,)).fetchone() is None
+            self._db.execute(
+                "INSERT OR REPLACE INTO ocr (key, value, last_used) VALUES (?, ?, ?)",
+                (key, json.dumps(value, ensure_ascii=False), time.time()),
+            )
+            self._count += new
+            if self._count > self.max_entries:
+                self._evict()
+            self._db.commit()
+            self._remember(key, value)
+
+    def _evict(self):
+        """Borra las entradas menos usadas hasta quedar un EVICT_FRACTION por debajo del tope."""
+        keep = int(self.max_entries * (1 - EVICT_FRACTION))
+        self._db.execute(
+            "DELETE FROM ocr WHERE key IN (SELECT key FROM ocr ORDER BY last_used ASC LIMIT ?)",
+            (max(0, self._count - keep),),
+        )
+        self._count = self._db.execute("SELECT COUNT(*) FROM ocr").fetchone()[0]
+
+    def clear(self):
+        with self._lock:
+            self._db.execute("DELETE FROM ocr")
+            self._db.commit()
+            self._mem.clear()
+            self._count = 0
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {"hits": self.hits, "misses": self.misses, "entries": self._count,
+                "hit_rate": (self.hits / total) if total else 0.0}
@@ -0,0 +1,186 @@
+"""
+Capa de OCR compartida por parse_tooltip, detect_from_mouse_roi y detect_tooltip_cv.
+
+Con tesserocr instalado mantiene un handle de tesseract "caliente" por hilo
+(PyTessBaseAPI), así que cada llamada solo paga el reconocimiento: nada de
+lanzar el binario, escribir una imagen temporal ni recargar el traineddata.
+Sin tesserocr cae a pytesseract (un proceso por llamada) con la misma interfaz.
+
+Acepta imágenes en memoria (PIL o arrays NumPy) y devuelve cajas de palabras
+con el mismo formato que usaba text_boxes().
+"""
+import os, shlex, threading, time
+from PIL import Image
+
+from ocr import trace
+
+try:
+    import tesserocr
+except Exception:  # tesserocr es opcional
+    tesserocr = None
+
+BACKEND = "tesserocr" if tesserocr is not None else "pytesseract"
+
+# Carpeta de traineddata; si no se define se usa la que trae compilada tesseract
+TESSDATA_DIR = os.environ.get("TESSDATA_PREFIX")
+
+_local = threading.local()          # handles de tesseract por hilo
+_stats_lock = threading.Lock()
+_stats = {"calls": 0, "seconds": 0.0}
+
+# Caché de OCR por contenido (ocr_cache.OcrCache); se abre al primer uso
+_cache = None
+_cache_enabled = True
+_cache_max_entries = None
+
+def configure_cache(enabled: bool = True, max_entries: int = None):
+    """Activa/desactiva la caché de OCR (config: ocr_cache / ocr_cache_max_entries)."""
+    global _cache, _cache_enabled, _cache_max_entries
+    _cache_enabled = bool(enabled)
+    _cache_max_entries = max_entries
+    if _cache is not None and max_entries:
+        _cache.max_entries = max_entries
+    if not enabled:
+        _cache = None
+
+def get_cache():
+    global _cache
+    if _cache is None and _cache_enabled:
+        from ocr.ocr_cache import OcrCache, MAX_ENTRIES
+        _cache = OcrCache(max_entries=_cache_max_entries or MAX_ENTRIES)
+    return _cache
+
+def _to_pil(img) -> Image.Image:
+    if isinstance(img, Image.Image):
+        return img
+    # array NumPy (gris o RGB)
+    return Image.fromarray(img)
+
+def _api(lang: str, psm: int, variables: dict = None):
+    """
+    Handle de tesseract del hilo actual para `lang` (se crea una sola vez). Con
+    `variables` (p.ej. tessedit_char_whitelist, user_words_file, que solo se leen al
+    iniciar) es otro handle aparte, para no contaminar el de uso general.
+    """
+    apis = getattr(_local, "apis", None)
+    if apis is None:
+        apis = _local.apis = {}
+    key = (lang, tuple(sorted(variables.items()))) if variables else lang
+    api = apis.get(key)
+    if api is None:
+        kwargs = {"lang": lang}
+        if TESSDATA_DIR:
+            kwargs["path"] = TESSDATA_DIR.rstrip("/\\") + os.sep
+        if variables:
+            kwargs["variables"] = {k: str(v) for k, v in variables.items()}
+        api = apis[key] = tesserocr.PyTessBaseAPI(**kwargs)
+    api.SetPageSegMode(psm)
+    return api
+
+def _cli_config(psm: int, variables: dict = None) -> str:
+    """Mismos ajustes como línea de comandos de tesseract (camino pytesseract)."""
+    parts = [f"--psm {psm}"]
+    for k, v in (variables or {}).items():
+        if k == "user_words_file":
+            parts.append(f"--user-words {shlex.quote(str(v))}")
+        else:
+            parts.append(f"-c {k}={shlex.quote(str(v))}")
+    return " ".join(parts)
+
+def _count(t0: float):
+    trace.count("tesseract_calls")
+    with _stats_lock:
+        _stats["calls"] += 1
+        _stats["seconds"] += time.perf_counter() - t0
+
+def stats() -> dict:
+    """Llamadas a tesseract, segundos acumulados y aciertos de caché desde el arranque."""
+    with _stats_lock:
+        out = dict(_stats, backend=BACKEND)
+    if _cache is not None:
+        out["cache"] = _cache.stats()
+    return out
+
+def _parse_tsv(tsv: str):
+    """Filas de palabras (nivel 5) del TSV de tesseract."""
+    words = []
+    for row in tsv.splitlines():
+        cols = row.split("\t")
+        if len(cols) < 12 or cols[0] != "5":
+            continue
+        txt = cols[11].strip()
+        if not txt:
+            continue
+        words.append({
+            "text": txt,
+            "x": int(cols[6]), "y": int(cols[7]), "w": int(cols[8]), "h": int(cols[9]),
+            "conf": int(float(cols[10])),
+            "line": int(cols[4]), "block": int(cols[2]), "par": int(cols[3]),
+        })
+    return words
+
+def image_to_words(img, lang: str = "eng", psm: int = 6, preprocess: str = "none", variables: dict = None):
+    """
+    Lista de dicts de palabras: text, x, y, w, h, conf, line, block, par.
+    `preprocess` solo identifica el preprocesado aplicado a `img` (entra en la clave de caché).
+    `variables` son parámetros de tesseract para esta llamada (ver _api).
+    """
+    pil = _to_pil(img)
+    cache = get_cache()
+    if cache is not None:
+        from ocr.ocr_cache import make_key
+        params = {"lang": lang, "psm": psm, "preprocess": preprocess}
+        if variables:
+            params["variables"] = variables
+        key = make_key(pil, **params)
+        words = cache.get(key)
+        if words is not None:
+            trace.count("ocr_cache_hits")
+            return words
+        with trace.span("tesseract"):
+            words = _image_to_words(pil, lang, psm, variables)
+        cache.put(key, words)
+        return words
+    with trace.span("tesseract"):
+        return _image_to_words(pil, lang, psm, variables)
+
+def _image_to_words(pil: Image.Image, lang: str, psm: int, variables: dict = None):
+    t0 = time.perf_counter()
+    try:
+        if tesserocr is not None:
+            api = _api(lang, psm, variables)
+            api.SetImage(pil)
+            return _parse_tsv(api.GetTSVText(0))
+
+        import pytesseract
+        data = pytesseract.image_to_data(pil, lang=lang, config=_cli_config(psm, variables),
+                                         output_type=pytesseract.Output.DICT)
+        words = []
+        for i in range(len(data["text"])):
+            txt = (data["text"][i] or "").strip()
+            if not txt:
+                continue
+            words.append({
+                "text": txt,
+                "x": data["left"][i], "y": data["top"][i], "w": data["width"][i], "h": data["height"][i],
+                "conf": int(float(data["conf"][i])),
+                "line": data["line_num"][i], "block": data["block_num"][i], "par": data["par_num"][i],
+            })
+        return words
+    finally:
+        _count(t0)
+
+def image_to_text(img, lang: str = "eng", psm: int = 6) -> str:
+    """Texto plano reconocido (equivalente a image_to_string)."""
+    pil = _to_pil(img)
+    t0 = time.perf_counter()
+    try:
+        if tesserocr is not None:
+            api = _api(lang, psm)
+            api.SetImage(pil)
+            return api.GetUTF8Text()
+
+        import pytesseract
+        return pytesseract.image_to_string(pil, lang=lang, config=f"--psm {psm}")
+    finally:
+        _count(t0)
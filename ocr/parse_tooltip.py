@@ -1,104 +1,91 @@
-import re, os, json
-from PIL import Image
-import pytesseract
+from ocr.analysis import analyze, scaled
+from ocr import preprocess as preprocess_mod
+from ocr.config import get_config
+from ocr.normalizer import names, traits, snap
+from ocr.heuristics import line_index, trait_hint_line
+from ocr import escalation, frames, strips, trace
 
-# Palabras guía para detectar un rasgo
-TRAIT_HINTS = re.compile(
-    r"(hit|critical|max health|cooldown|evasion|endurance|heavy attack|attack speed|buff|debuff|range|magic|melee|skill|side|front|collision|mana|stun)",
-    re.IGNORECASE
-)
-
-ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
-CONFIG_PATH = os.path.join(ROOT, "config.json")
-CACHE_DIR = os.path.join(ROOT, "cache")
-os.makedirs(CACHE_DIR, exist_ok=True)
-
-def _load_cfg():
-    try:
-        with open(CONFIG_PATH, "r", encoding="utf-8") as f:
-            return json.load(f)
-    except Exception:
-        return {"language": "eng", "ocr_psm": 6, "ocr_preprocess": "none"}
-
-def _preprocess(img: Image.Image, mode: str) -> Image.Image:
+def _preprocess(img, mode: str, timings: dict = None):
     """
-    mode: 'binary' -> escala de grises + binarización Otsu
-          'none'   -> sin cambios
-    Siempre guarda una imagen en cache para depurar: last_input.png / last_preprocessed.png
+    Aplica la cadena de preprocesado `mode` (ver ocr/preprocess.py: 'none', 'binary',
+    'bg+gamma:0.7+adaptive', ...). Devuelve un array NumPy, o `img` tal cual con 'none'.
+    Los PNG de depuración solo se guardan con ocr_debug_dumps (en segundo plano).
     """
-    # Guardar la imagen original para inspección
-    try:
-        img.save(os.path.join(CACHE_DIR, "last_input.png"))
-    except Exception:
-        pass
-
-    if mode != "binary":
-        # Aun si no hay preprocesado, guarda copia como 'last_preprocessed.png'
-        try:
-            img.save(os.path.join(CACHE_DIR, "last_preprocessed.png"))
-        except Exception:
-            pass
-        return img
-
-    # Si hay modo binario, requerimos cv2/np:
-    try:
-        import cv2
-        import numpy as np
-        arr = cv2.cvtColor(np.array(img), cv2.COLOR_RGB2GRAY)
-        # Binarización Otsu
-        _, th = cv2.threshold(arr, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
-        out = Image.fromarray(th)
-        out.save(os.path.join(CACHE_DIR, "last_preprocessed.png"))
-        return out
-    except Exception as e:
-        # Si falla cv2, volvemos a la original y dejamos traza mínima
-        try:
-            with open(os.path.join(CACHE_DIR, "last_preprocess_error.txt"), "w", encoding="utf-8") as f:
-                f.write(str(e))
-        except Exception:
-            pass
-        return img
+    preprocess_mod.configure_dumps(get_config()["ocr_debug_dumps"])
+    return preprocess_mod.run(img, mode, timings)
 
-def parse_tooltip(img_path: str, lang: str = "eng"):
+def parse_tooltip(img_path, lang: str = "eng", analysis=None, full: bool = False):
     """
-    Devuelve dict con 'item_name', 'trait' y 'raw'.
+    Devuelve dict con 'item_name', 'trait', 'raw' y 'analysis' (TooltipAnalysis), más
+    'item_conf'/'trait_conf': item_name y trait son IDs canónicos (normalizer) cuando hay
+    coincidencia con el vocabulario (conf > 0) y el texto OCR tal cual si no (conf 0).
+    img_path puede ser una ruta, una imagen PIL o un array RGB/gris ya en memoria (p.ej. la
+    vista del recorte del tooltip sobre el frame capturado): en memoria no se copia ni se
+    reabre nada antes del preprocesado.
+    Si se pasa `analysis` (una pasada de OCR ya hecha) no se vuelve a llamar a tesseract.
     Usa psm desde config y preprocesado opcional.
-    (Mejora) Busca trait en TODAS las líneas si no aparece en las primeras.
-    (Mejora) Elige nombre como la primera línea con letras y sin ser una línea numérica/monetaria.
+    Trait: la línea que sigue a la etiqueta "Trait"; si no la hay, la primera con pistas de
+    trait (data/heuristics.json), primero en las líneas 1-11 y luego en todas.
+    Nombre: la primera línea con letras y sin ser una línea numérica/monetaria.
+    Con ocr_strips (config) y sin `full`, si el tamaño del tooltip ya tiene franjas
+    aprendidas solo se leen las del nombre y el trait (ocr/strips.py); `full=True`
+    fuerza la pasada completa, p.ej. cuando se quiere el texto entero (stats).
+    Con ocr_tiered la pasada completa es escalonada (ocr/escalation.py): nativa y sin
+    preprocesado primero, y preprocesado/escalado/otro psm solo si la lectura no convence.
+    'tier' dice qué escalón dio el resultado (None con la pasada fija de siempre).
     """
-    cfg = _load_cfg()
-    psm = cfg.get("ocr_psm", 6)
-    preprocess = cfg.get("ocr_preprocess", "none")
+    if analysis is None:
+        cfg = get_config()
+        psm = cfg["ocr_psm"]
+        preprocess = cfg["ocr_preprocess"]
 
-    img = Image.open(img_path)
-    img = _preprocess(img, preprocess)
+        img = frames.load(img_path)
+        use_strips = cfg["ocr_strips"] and not full
+        if use_strips:
+            with trace.span("ocr_strips"):
+                result = strips.parse(img, lang=lang)
+            if result is not None:
+                result["analysis"].meta["tier"] = result["tier"] = "strips"
+                if cfg["ocr_tiered"]:
+                    escalation.record("strips")
+                return result
+        if cfg["ocr_tiered"]:
+            preprocess_mod.configure_dumps(cfg["ocr_debug_dumps"])
+            with trace.span("ocr"):
+                analysis = escalation.recognize(img, lang, cfg)
+        else:
+            timings = {}
+            with trace.span("preprocess"):
+                pre = _preprocess(img, preprocess, timings)
+            with trace.span("ocr"):
+                analysis = analyze(pre, lang=lang, psm=psm, preprocess=preprocess)
+            k = preprocess_mod.scale_of(preprocess)
+            if k > 1:  # cajas de vuelta a coordenadas del recorte original
+                analysis = scaled(analysis, k)
+            analysis.meta["preprocess_ms"] = timings
+        if use_strips:
+            strips.learn(img, analysis)
 
-    tconf = f"--psm {psm}"
-    text = pytesseract.image_to_string(img, lang=lang, config=tconf)
+    with trace.span("parse_heuristics"):
+        text = analysis.raw
+        ix = line_index(analysis)
+        lines = [li.text.strip() for li in ix.lines if li.text.strip()]
 
-    lines_raw = [l for l in text.splitlines()]
-    lines = [l.strip() for l in lines_raw if l.strip()]
+        # Nombre: primera línea con letras y no dominada por dígitos/símbolos (en las 8 primeras)
+        first = next((li for li in ix.lines[:8] if li.letters and not li.numeric), None)
+        item_name = first.text.strip() if first else (lines[0] if lines else None)
 
-    # Heurística mejorada para nombre: línea con letras y no dominada por dígitos/símbolos
-    name_candidate = None
-    for l in lines[:8]:  # las primeras 8 líneas suelen contener el nombre
-        has_letter = re.search(r"[A-Za-z]", l) is not None
-        mostly_numbers = re.fullmatch(r"[\s\W\d]+", l) is not None
-        if has_letter and not mostly_numbers:
-            name_candidate = l
-            break
-    item_name = name_candidate or (lines[0] if lines else None)
+        # Trait: la línea tras la etiqueta "Trait"; si no, por pistas
+        if ix.trait_label is not None and ix.trait_label + 1 < len(ix.lines):
+            li = ix.lines[ix.trait_label + 1]
+        else:
+            li = trait_hint_line(ix, start=1, stop=12) or trait_hint_line(ix, start=0)
+        trait = li.text.strip() if li else None
 
-    # Trait: primero busca en las primeras líneas; si no, en todas
-    trait = None
-    for l in lines[1:12]:
-        if TRAIT_HINTS.search(l):
-            trait = l
-            break
-    if trait is None:
-        for l in lines:
-            if TRAIT_HINTS.search(l):
-                trait = l
-                break
+        # Normalización: nombre = mejor coincidencia entre las primeras líneas; trait = su línea
+        m = names().best_of(lines[:8])
+        item_name, item_conf = (m.id, m.score) if m is not None else (item_name, 0.0)
+        trait, trait_conf = snap(trait, traits())
 
-    return {"item_name": item_name, "trait": trait, "raw": text}
\ No newline at end of file
+    return {"item_name": item_name, "trait": trait, "raw": text, "analysis": analysis,
+            "item_conf": item_conf, "trait_conf": trait_conf, "tier": analysis.meta.get("tier")}
\ No newline at end of file
@@ -0,0 +1,202 @@
+"""
+Preprocesado de imágenes para OCR, sobre arrays NumPy de principio a fin.
+
+Un preprocesado es una cadena de etapas separadas por '+', con argumento opcional
+tras ':' (config: ocr_preprocess), por ejemplo:
+
+    "none"                  sin cambios (ni siquiera se convierte la imagen)
+    "binary"                gris + Otsu (el modo de siempre)
+    "bg+gamma:0.7+adaptive" quita el fondo del panel, realza el texto y binariza
+    "upscale:2+rarity"      ×2 y deja solo el texto del color de rareza
+
+Etapas: gray, binary (Otsu), adaptive[:bloque], bg[:umbral], gamma[:g],
+upscale[:k], rarity, invert. Las binarizaciones dejan texto blanco sobre negro
+como hacía "binary"; 'invert' lo da la vuelta.
+
+Cada etapa mide su tiempo (run(..., timings=...) y stats()). Los volcados de
+depuración (cache/last_input.png, cache/last_preprocessed.png) solo se escriben
+con ocr_debug_dumps activado, y en un hilo aparte: el OCR nunca espera al PNG.
+"""
+import os, queue, threading, time
+from typing import Dict, List, Optional, Tuple
+
+import cv2
+import numpy as np
+from PIL import Image
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+CACHE_DIR = os.path.join(ROOT, "cache")
+
+BG_MAX = 70              # panel del tooltip: ningún canal pasa de aquí
+ADAPTIVE_BLOCK = 31
+ADAPTIVE_C = -10         # negativo: el texto tiene que ser más claro que su entorno
+GAMMA = 0.7
+UPSCALE = 2
+
+# Tonos (OpenCV, 0-180) del texto por rareza: verde, azul, morado, naranja/dorado
+RARITY_HUES = (60, 105, 137, 15)
+RARITY_HUE_TOL = 12
+RARITY_MIN_SAT = 60
+RARITY_MIN_VAL = 100
+
+def to_array(img) -> np.ndarray:
+    """Array uint8 (H,W) o (H,W,3) RGB; un array se usa tal cual, sin copiar."""
+    if isinstance(img, np.ndarray):
+        return img
+    if img.mode not in ("RGB", "L"):
+        img = img.convert("RGB")
+    return np.asarray(img)
+
+def gray(a: np.ndarray, arg=None) -> np.ndarray:
+    return a if a.ndim == 2 else cv2.cvtColor(a, cv2.COLOR_RGB2GRAY)
+
+def binary(a: np.ndarray, arg=None) -> np.ndarray:
+    _, th = cv2.threshold(gray(a), 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
+    return th
+
+def adaptive(a: np.ndarray, arg=None) -> np.ndarray:
+    block = int(arg or ADAPTIVE_BLOCK) | 1
+    return cv2.adaptiveThreshold(gray(a), 255, cv2.ADAPTIVE_THRESH_MEAN_C, cv2.THRESH_BINARY,
+                                 block, ADAPTIVE_C)
+
+def bg(a: np.ndarray, arg=None) -> np.ndarray:
+    """Pone a negro el fondo oscuro del panel (y el ruido del marco) y deja el texto."""
+    limit = int(arg or BG_MAX)
+    lo, hi = (0, limit - 1) if a.ndim == 2 else ((0, 0, 0), (limit - 1,) * 3)
+    panel = cv2.inRange(a, lo, hi)  # todos los canales por debajo del umbral
+    return cv2.bitwise_and(a, a, mask=cv2.bitwise_not(panel))
+
+_gamma_luts: Dict[float, np.ndarray] = {}
+
+def gamma(a: np.ndarray, arg=None) -> np.ndarray:
+    g = float(arg or GAMMA)
+    lut = _gamma_luts.get(g)
+    if lut is None:
+        lut = _gamma_luts[g] = (255.0 * (np.arange(256) / 255.0) ** g).clip(0, 255).astype(np.uint8)
+    return cv2.LUT(a, lut)
+
+def upscale(a: np.ndarray, arg=None) -> np.ndarray:
+    k = int(arg or UPSCALE)
+    if k <= 1:
+        return a
+    return cv2.resize(a, None, fx=k, fy=k, interpolation=cv2.INTER_CUBIC)
+
+def rarity(a: np.ndarray, arg=None) -> np.ndarray:
+    """Máscara (blanco = texto) de los píxeles con color de rareza (nombre del item)."""
+    if a.ndim == 2:
+        return binary(a)
+    hsv = cv2.cvtColor(a, cv2.COLOR_RGB2HSV)
+    mask = None
+    for hue in RARITY_HUES:
+        lo = (max(0, hue - RARITY_HUE_TOL), RARITY_MIN_SAT, RARITY_MIN_VAL)
+        hi = (min(179, hue + RARITY_HUE_TOL), 255, 255)
+        m = cv2.inRange(hsv, lo, hi)
+        mask = m if mask is None else cv2.bitwise_or(mask, m, dst=mask)
+    return mask
+
+def invert(a: np.ndarray, arg=None) -> np.ndarray:
+    return cv2.bitwise_not(a)
+
+STAGES = {
+    "gray": gray, "binary": binary, "adaptive": adaptive, "bg": bg,
+    "gamma": gamma, "upscale": upscale, "rarity": rarity, "invert": invert,
+}
+
+def parse_chain(chain: str) -> List[Tuple[str, Optional[str]]]:
+    """'bg+gamma:0.7+adaptive' -> [('bg', None), ('gamma', '0.7'), ('adaptive', None)]."""
+    steps = []
+    for part in (chain or "none").split("+"):
+        name, _, arg = part.strip().partition(":")
+        name = name.strip().lower()
+        if name in ("", "none"):
+            continue
+        if name not in STAGES:
+            raise ValueError(f"etapa de preprocesado desconocida: {name!r} (válidas: {', '.join(STAGES)})")
+        steps.append((name, arg.strip() or None))
+    return steps
+
+def validate_chain(chain) -> bool:
+    try:
+        parse_chain(chain)
+        return True
+    except (ValueError, AttributeError):
+        return False
+
+def scale_of(chain: str) -> int:
+    """Factor total de upscale de la cadena (para devolver cajas a coordenadas originales)."""
+    k = 1
+    for name, arg in parse_chain(chain):
+        if name == "upscale":
+            k *= max(1, int(arg or UPSCALE))
+    return k
+
+# --- tiempos por etapa ------------------------------------------------------
+
+_stats_lock = threading.Lock()
+_stats: Dict[str, List[float]] = {}   # etapa -> [llamadas, segundos]
+
+def stats() -> dict:
+    """Por etapa: llamadas, ms totales y ms de media desde el arranque."""
+    with _stats_lock:
+        return {k: {"calls": int(n), "ms": s * 1000, "ms_mean": s * 1000 / n if n else 0.0}
+                for k, (n, s) in _stats.items()}
+
+def run(img, chain: str, timings: Optional[Dict[str, float]] = None):
+    """
+    Aplica la cadena y devuelve un array (o `img` tal cual si la cadena es 'none').
+    Con `timings` deja ahí los ms de cada etapa.
+    """
+    steps = parse_chain(chain)
+    if not steps:
+        return img
+    a = to_array(img)
+    src = a
+    for name, arg in steps:
+        t0 = time.perf_counter()
+        a = STAGES[name](a, arg)
+        dt = time.perf_counter() - t0
+        if timings is not None:
+            timings[name] = timings.get(name, 0.0) + dt * 1000
+        with _stats_lock:
+            acc = _stats.setdefault(name, [0, 0.0])
+            acc[0] += 1
+            acc[1] += dt
+    if _dumps_enabled:
+        dump(src, a)
+    return a
+
+# --- volcados de depuración (opcionales, asíncronos) -------------------------
+
+_dumps_enabled = False
+_dump_q: "queue.Queue" = queue.Queue(maxsize=4)
+_dump_thread = None
+_dump_lock = threading.Lock()
+
+def configure_dumps(enabled: bool):
+    """Activa los PNG de depuración (config: ocr_debug_dumps)."""
+    global _dumps_enabled
+    _dumps_enabled = bool(enabled)
+
+def _dump_worker():
+    while True:
+        src, out = _dump_q.get()
+        try:
+            os.makedirs(CACHE_DIR, exist_ok=True)
+            Image.fromarray(src).save(os.path.join(CACHE_DIR, "last_input.png"))
+            Image.fromarray(out).save(os.path.join(CACHE_DIR, "last_preprocessed.png"))
+        except Exception:
+            pass
+        finally:
+            _dump_q.task_done()
+
+def dump(src: np.ndarray, out: np.ndarray):
+    """Encola el par entrada/salida para guardarlo en cache/; si hay cola, se descarta."""
+    global _dump_thread
+    with _dump_lock:
+        if _dump_thread is None:
+            _dump_thread = threading.Thread(target=_dump_worker, name="preprocess-dumps", daemon=True)
+            _dump_thread.start()
+    try:
+        _dump_q.put_nowait((src, out))
+    except queue.Full:
+        pass
@@ -0,0 +1,398 @@
+"""
+Precios del mercado: tabla local sincronizada desde tldb_prices_url (config.json).
+
+En vez de una petición HTTP por item, se descarga de una vez la tabla de precios
+de la región (config: region) y se guarda en cache/prices.sqlite, con clave
+(región, nombre, trait) normalizados igual que el inventario. Después cada
+consulta es un dict en memoria: O(1) y sin red, desde la captura o un informe.
+
+La descarga usa una sesión HTTP persistente (requests.Session con pool si está
+instalado; si no, http.client con la conexión keep-alive reutilizada) y es
+condicional: se envían el ETag y el Last-Modified de la última descarga, y un
+304 solo renueva la marca de tiempo. La tabla vale prices_ttl_minutes; pasado
+ese tiempo las consultas siguen respondiendo con lo último descargado y
+refresh_async() la revalida en segundo plano.
+
+La URL puede llevar {region} (se sustituye). El cuerpo es JSON: una lista de
+registros o {"items"/"data"/"prices": [...]}, con el nombre en name/item_name/
+item, el trait (opcional) en trait y el precio en price/min_price/value; si un
+registro trae "region" y no coincide, se ignora. Varias filas del mismo
+item/trait se quedan con el precio más bajo.
+
+    python ocr/prices.py sync [--force] [--url URL]
+    python ocr/prices.py get "Item name" ["Trait"]
+    python ocr/prices.py value          (inventario valorado)
+"""
+import os, sys, gzip, json, time, sqlite3, threading
+from typing import Optional
+from urllib.parse import quote, urlsplit
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from ocr.inventory_store import normalize
+
+try:
+    import requests
+except Exception:  # requests es opcional
+    requests = None
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DB_PATH = os.path.join(ROOT, "cache", "prices.sqlite")
+
+TIMEOUT = 15            # segundos por petición
+TTL_MINUTES = 60
+POOL_SIZE = 4
+
+NAME_FIELDS = ("item_name", "name", "item")
+TRAIT_FIELDS = ("trait", "trait_name")
+PRICE_FIELDS = ("price", "min_price", "value", "lowest_price")
+LIST_FIELDS = ("items", "data", "prices")
+
+class PriceError(RuntimeError):
+    """La tabla de precios no se pudo descargar o no tiene un formato reconocible."""
+
+# --- HTTP --------------------------------------------------------------------
+
+class HttpSession:
+    """
+    GET con conexiones persistentes. Devuelve (status, headers en minúsculas, cuerpo).
+    Con requests: Session + HTTPAdapter con pool. Sin requests: una conexión
+    http.client por host que se reutiliza mientras el servidor la mantenga abierta.
+    """
+    def __init__(self, timeout: float = TIMEOUT):
+        self.timeout = timeout
+        self.requests = self.reused = 0
+        self._lock = threading.Lock()
+        self._conns = {}
+        self._session = None
+        if requests is not None:
+            self._session = requests.Session()
+            adapter = requests.adapters.HTTPAdapter(pool_connections=POOL_SIZE, pool_maxsize=POOL_SIZE)
+            self._session.mount("http://", adapter)
+            self._session.mount("https://", adapter)
+
+    def get(self, url: str, headers: dict = None):
+        headers = {"Accept": "application/json", "Accept-Encoding": "gzip", **(headers or {})}
+        with self._lock:
+            self.requests += 1
+            if self._session is not None:
+                r = self._session.get(url, headers=headers, timeout=self.timeout)
+                return r.status_code, {k.lower(): v for k, v in r.headers.items()}, r.content
+            return self._get_stdlib(url, headers)
+
+    def _get_stdlib(self, url: str, headers: dict):
+        import http.client
+        parts = urlsplit(url)
+        key = (parts.scheme, parts.netloc)
+        path = (parts.path or "/") + (f"?{parts.query}" if parts.query else "")
+        for attempt in (0, 1):
+            conn = self._conns.get(key)
+            if conn is None:
+                cls = http.client.HTTPSConnection if parts.scheme == "https" else http.client.HTTPConnection
+                conn = self._conns[key] = cls(parts.netloc, timeout=self.timeout)
+            elif attempt == 0:
+                self.reused += 1
+            try:
+                conn.request("GET", path, headers=headers)
+                resp = conn.getresponse()
+                body = resp.read()
+            except (http.client.HTTPException, ConnectionError):
+                # el servidor cerró la conexión keep-alive: se abre otra una vez
+                conn.close()
+                del self._conns[key]
+                if attempt:
+                    raise
+                continue
+            h = {k.lower(): v for k, v in resp.getheaders()}
+            if h.get("content-encoding") == "gzip":
+                body = gzip.decompress(body)
+            if h.get("connection", "").lower() == "close":
+                conn.close()
+                del self._conns[key]
+            return resp.status, h, body
+
+    def close(self):
+        with self._lock:
+            if self._session is not None:
+                self._session.close()
+            for conn in self._conns.values():
+                conn.close()
+            self._conns.clear()
+
+# --- formato de la tabla -----------------------------------------------------
+
+def _field(rec: dict, names):
+    for n in names:
+        v = rec.get(n)
+        if v not in (None, ""):
+            return v
+    return None
+
+def parse_table(data, region: str = ""):
+    """Registros (item_name, trait, price) del JSON de precios, ya canonizados con el vocabulario."""
+    from ocr.normalizer import names, traits, snap
+    if isinstance(data, dict):
+        data = next((data[k] for k in LIST_FIELDS if isinstance(data.get(k), list)), None)
+    if not isinstance(data, list):
+        raise PriceError("la tabla de precios no es una lista de registros")
+    want = normalize(region)
+    rows = []
+    for rec in data:
+        if not isinstance(rec, dict):
+            continue
+        if want and rec.get("region") and normalize(str(rec["region"])) != want:
+            continue
+        name, price = _field(rec, NAME_FIELDS), _field(rec, PRICE_FIELDS)
+        try:
+            price = float(price)
+        except (TypeError, ValueError):
+            continue
+        if not name:
+            continue
+        trait = _field(rec, TRAIT_FIELDS) or ""
+        # mismos IDs canónicos que guarda la captura en el inventario
+        name = snap(str(name).strip(), names())[0]
+        trait = snap(str(trait).strip(), traits())[0] if trait else ""
+        rows.append((name, trait, price))
+    return rows
+
+# --- tabla local -------------------------------------------------------------
+
+class PriceTable:
+    def __init__(self, path: str = DB_PATH, url: str = "", region: str = "", ttl_minutes: int = TTL_MINUTES,
+                 http: HttpSession = None):
+        self.path = path
+        self.url, self.region, self.ttl_minutes = url, region, ttl_minutes
+        self.http = http or HttpSession()
+        self._lock = threading.Lock()
+        self._sync_lock = threading.Lock()
+        self._index = None          # {(norm_name, norm_trait): precio} de self._index_region
+        self._index_region = None
+        self._refreshing = None
+        self.lookups = self.hits = 0
+        self.downloads = self.not_modified = self.bytes = 0
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._db = sqlite3.connect(path, check_same_thread=False, timeout=10)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute("""
+            CREATE TABLE IF NOT EXISTS prices (
+                region TEXT NOT NULL,
+                norm_name TEXT NOT NULL,
+                norm_trait TEXT NOT NULL,
+                item_name TEXT NOT NULL,
+                trait TEXT NOT NULL,
+                price REAL NOT NULL,
+                PRIMARY KEY (region, norm_name, norm_trait)
+            ) WITHOUT ROWID""")
+        self._db.execute("""
+            CREATE TABLE IF NOT EXISTS price_sync (
+                region TEXT PRIMARY KEY,
+                url TEXT NOT NULL,
+                etag TEXT NOT NULL DEFAULT '',
+                last_modified TEXT NOT NULL DEFAULT '',
+                fetched_at REAL NOT NULL,
+                checked_at REAL NOT NULL,
+                entries INTEGER NOT NULL
+            )""")
+        self._db.commit()
+
+    def configure(self, url: str, region: str, ttl_minutes: int):
+        with self._lock:
+            self.url, self.region, self.ttl_minutes = url, region, ttl_minutes
+
+    @property
+    def configured(self) -> bool:
+        """Hay una URL de verdad (no el marcador <PON_AQUI...> de config.json)."""
+        return self.url.startswith(("http://", "https://")) and "<" not in self.url
+
+    def source_url(self) -> str:
+        return self.url.replace("{region}", quote(self.region))
+
+    # --- sincronización ----------------------------------------------------
+
+    def _sync_row(self):
+        with self._lock:
+            cur = self._db.execute("SELECT url, etag, last_modified, fetched_at, checked_at, entries "
+                                   "FROM price_sync WHERE region = ?", (self.region,))
+            row = cur.fetchone()
+            return dict(zip([c[0] for c in cur.description], row)) if row else None
+
+    def stale(self) -> bool:
+        s = self._sync_row()
+        return (s is None or s["url"] != self.source_url()
+                or time.time() - s["checked_at"] > self.ttl_minutes * 60)
+
+    def sync(self, force: bool = False) -> str:
+        """
+        Descarga la tabla si caducó (o con force). Devuelve 'fresh' (no hacía falta),
+        'not_modified' (304) o 'updated'. Lanza PriceError si falla.
+        """
+        if not self.configured:
+            raise PriceError("tldb_prices_url no está configurada en config.json")
+        with self._sync_lock:   # una sola descarga a la vez
+            if not force and not self.stale():
+                return "fresh"
+            url = self.source_url()
+            s = self._sync_row()
+            headers = {}
+            if s is not None and s["url"] == url and not force:
+                if s["etag"]:
+                    headers["If-None-Match"] = s["etag"]
+                if s["last_modified"]:
+                    headers["If-Modified-Since"] = s["last_modified"]
+            try:
+                status, h, body = self.http.get(url, headers)
+            except Exception as e:
+                raise PriceError(f"{type(e).__name__}: {e}") from e
+            now = time.time()
+            if status == 304 and s is not None:
+                self.not_modified += 1
+                with self._lock, self._db:
+                    self._db.execute("UPDATE price_sync SET checked_at = ? WHERE region = ?", (now, self.region))
+                return "not_modified"
+            if status != 200:
+                raise PriceError(f"HTTP {status} al descargar {url}")
+            try:
+                rows = parse_table(json.loads(body.decode("utf-8-sig")), self.region)
+            except ValueError as e:
+                raise PriceError(f"la respuesta no es JSON: {e}") from e
+            self.downloads += 1
+            self.bytes += len(body)
+            self._replace(rows, url, h.get("etag", ""), h.get("last-modified", ""), now)
+            return "updated"
+
+    def _replace(self, rows, url, etag, last_modified, now):
+        best = {}
+        for name, trait, price in rows:
+            key = (normalize(name), normalize(trait))
+            if key not in best or price < best[key][2]:
+                best[key] = (name, trait, price)
+        with self._lock:
+            with self._db:
+                self._db.execute("DELETE FROM prices WHERE region = ?", (self.region,))
+                self._db.executemany(
+                    "INSERT INTO prices (region, norm_name, norm_trait, item_name, trait, price) "
+                    "VALUES (?, ?, ?, ?, ?, ?)",
+                    [(self.region, k[0], k[1], v[0], v[1], v[2]) for k, v in best.items()])
+                self._db.execute(
+                    "INSERT OR REPLACE INTO price_sync (region, url, etag, last_modified, fetched_at, checked_at, entries) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?)", (self.region, url, etag, last_modified, now, now, len(best)))
+            self._index = None   # se recarga en la próxima consulta
+
+    def refresh_async(self) -> Optional[threading.Thread]:
+        """Revalida en segundo plano si caducó (las consultas siguen con la tabla actual)."""
+        if not self.configured or not self.stale():
+            return None
+        with self._lock:
+            if self._refreshing is not None and self._refreshing.is_alive():
+                return self._refreshing
+            self._refreshing = threading.Thread(target=self._refresh, name="price-sync", daemon=True)
+            self._refreshing.start()
+            return self._refreshing
+
+    def _refresh(self):
+        try:
+            r = self.sync()
+            if r == "updated":
+                print(f"[precios] tabla actualizada: {self.stats()['entries']} precios ({self.region or 'sin región'})")
+        except PriceError as e:
+            print(f"[precios] no se pudo actualizar: {e}")
+
+    # --- consultas ---------------------------------------------------------
+
+    def _load_index(self):
+        with self._lock:
+            if self._index is None or self._index_region != self.region:
+                rows = self._db.execute("SELECT norm_name, norm_trait, price FROM prices WHERE region = ?",
+                                        (self.region,)).fetchall()
+                self._index = {(n, t): p for n, t, p in rows}
+                self._index_region = self.region
+            return self._index
+
+    def lookup(self, item_name: str, trait: str = "") -> Optional[float]:
+        """Precio de item+trait; si no hay de ese trait, el del item sin trait. None si no se conoce."""
+        index = self._load_index()
+        n = normalize(item_name)
+        price = index.get((n, normalize(trait)))
+        if price is None and trait:
+            price = index.get((n, ""))
+        self.lookups += 1
+        self.hits += price is not None
+        return price
+
+    def stats(self) -> dict:
+        s = self._sync_row() or {}
+        return {"entries": len(self._load_index()), "region": self.region,
+                "fetched_at": s.get("fetched_at"), "checked_at": s.get("checked_at"),
+                "lookups": self.lookups, "hits": self.hits, "downloads": self.downloads,
+                "not_modified": self.not_modified, "bytes": self.bytes,
+                "requests": self.http.requests, "reused": self.http.reused}
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+        self.http.close()
+
+_table = None
+_table_lock = threading.Lock()
+
+def get_prices() -> PriceTable:
+    """Tabla de precios compartida, con URL/región/TTL de config.json (se releen en cada llamada)."""
+    global _table
+    from ocr.config import get_config
+    cfg = get_config()
+    if _table is None:
+        with _table_lock:
+            if _table is None:
+                _table = PriceTable()
+    _table.configure(cfg["tldb_prices_url"], cfg["region"], cfg["prices_ttl_minutes"])
+    return _table
+
+def format_price(price: Optional[float]) -> str:
+    return "?" if price is None else f"{price:,.0f}"
+
+def main(argv=None):
+    import argparse
+    ap = argparse.ArgumentParser(description="Tabla local de precios (tldb_prices_url)")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    p = sub.add_parser("sync", help="descargar/revalidar la tabla de la región")
+    p.add_argument("--force", action="store_true", help="descargar aunque no haya caducado")
+    p.add_argument("--url", help="otra URL (p.ej. un servidor local de pruebas)")
+    p = sub.add_parser("get", help="precio de un item")
+    p.add_argument("item")
+    p.add_argument("trait", nargs="?", default="")
+    sub.add_parser("value", help="inventario valorado")
+    args = ap.parse_args(argv)
+
+    table = get_prices()
+    if args.cmd == "sync":
+        if args.url:
+            table.configure(args.url, table.region, table.ttl_minutes)
+        t0 = time.perf_counter()
+        try:
+            r = table.sync(force=args.force)
+        except PriceError as e:
+            print(f"[-] {e}")
+            return 1
+        s = table.stats()
+        print(f"{r}: {s['entries']} precios ({s['region'] or 'sin región'}) en {(time.perf_counter() - t0) * 1000:.0f} ms"
+              f"  |  {s['bytes'] / 1e3:.1f} KB descargados")
+    elif args.cmd == "get":
+        print(format_price(table.lookup(args.item, args.trait)))
+    else:
+        from ocr.inventory_store import get_store
+        total = 0.0
+        rows = get_store().rows()
+        for item_name, trait, qty, *_ in rows:
+            price = table.lookup(item_name, trait)
+            total += (price or 0.0) * qty
+            print(f"{qty:>4} x {item_name} / {trait or '-'}: {format_price(price)}")
+        s = table.stats()
+        print(f"Valor del inventario: {format_price(total)}  ({s['hits']} de {len(rows)} filas con precio)")
+        if table.configured and table.stale():
+            print("Aviso: la tabla de precios ha caducado (python ocr/prices.py sync)")
+    table.close()
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
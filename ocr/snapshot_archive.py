@@ -0,0 +1,375 @@
+"""
+Archivo compacto de capturas: recortes de tooltip en pack files de solo-añadir,
+deduplicados por contenido, con un índice de tamaño fijo que se mapea en memoria.
+
+data/archive/
+    pack_0000.pack ...   imágenes ya codificadas (png/webp/jpg), una tras otra
+    index.bin            un registro INDEX_DTYPE por captura (np.memmap)
+    meta.jsonl           una línea JSON por captura, en el mismo orden que index.bin
+
+Cada captura es un registro del índice (hash, pack, offset, longitud, hora,
+mouse, bbox, tamaño); los bytes se guardan una sola vez por contenido: si el
+mismo recorte vuelve (mismo hash de píxeles), el registro nuevo apunta a los
+bytes que ya estaban. La metadata variable (item, trait, origen, versión de la
+herramienta, ruta original) va en meta.jsonl y solo se lee si se busca por item.
+
+Leer una captura es un slice del pack mapeado en memoria + cv2.imdecode: nada de
+recorrer data/snaps ni abrir un archivo por imagen. La referencia de una captura
+es "archive:<hash>" (lo que se guarda en tooltip_img del inventario).
+
+    python ocr/snapshot_archive.py migrate [dir|glob ...] [--full] [--ocr] [--delete]
+    python ocr/snapshot_archive.py list [--item X] [--trait Y] [--since ISO] [--until ISO]
+    python ocr/snapshot_archive.py export REF|N salida.png
+    python ocr/snapshot_archive.py stats
+"""
+import os, sys, glob, json, mmap, time, hashlib, threading, subprocess
+from datetime import datetime
+from typing import List
+
+import cv2
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(ROOT)
+from ocr import frames
+
+ARCHIVE_DIR = os.path.join(ROOT, "data", "archive")
+SNAPS_DIR = os.path.join(ROOT, "data", "snaps")
+PACK_MAX_BYTES = 256 * 1024 * 1024   # se abre un pack nuevo al pasar de aquí
+REF_PREFIX = "archive:"
+
+INDEX_DTYPE = np.dtype([
+    ("hash", "u1", (16,)),
+    ("pack", "<u2"),
+    ("offset", "<u8"),
+    ("length", "<u4"),
+    ("time", "<f8"),        # epoch de la captura
+    ("mouse", "<i4", (2,)),
+    ("bbox", "<i4", (4,)),  # ROI absoluto de la captura (x1, y1, x2, y2)
+    ("width", "<u4"),
+    ("height", "<u4"),
+])
+
+def content_hash(img) -> bytes:
+    """blake2b-128 de los píxeles (forma + bytes): el mismo recorte da el mismo hash sea cual sea el códec."""
+    a = np.ascontiguousarray(frames.rgb(img))
+    h = hashlib.blake2b(digest_size=16)
+    h.update(f"{a.shape}".encode())
+    h.update(a.data)
+    return h.digest()
+
+def ref(img) -> str:
+    return REF_PREFIX + content_hash(img).hex()
+
+_version = None
+
+def tool_version() -> str:
+    """Commit corto del repo (o 'unknown'): qué versión de la herramienta hizo la captura."""
+    global _version
+    if _version is None:
+        try:
+            _version = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True,
+                                      text=True, timeout=5).stdout.strip() or "unknown"
+        except (OSError, subprocess.SubprocessError):
+            _version = "unknown"
+    return _version
+
+class SnapshotArchive:
+    def __init__(self, path: str = ARCHIVE_DIR):
+        self.path = path
+        os.makedirs(path, exist_ok=True)
+        self.index_path = os.path.join(path, "index.bin")
+        self.meta_path = os.path.join(path, "meta.jsonl")
+        self._lock = threading.RLock()
+        self._maps = {}          # pack -> (mmap, tamaño mapeado)
+        self._meta = None        # lista de dicts (se carga al buscar por item)
+        self._index = None       # memmap del índice (se rehace cuando crece)
+        self.added = self.deduped = 0
+        self._recover()
+        self._by_hash = {}
+        idx = self.index()
+        for i in range(len(idx)):
+            self._by_hash.setdefault(idx["hash"][i].tobytes(), i)
+
+    # --- ficheros ------------------------------------------------------------
+
+    def _pack_path(self, pack: int) -> str:
+        return os.path.join(self.path, f"pack_{pack:04d}.pack")
+
+    def _recover(self):
+        """Tras un corte a medias: índice en múltiplos de registro y meta.jsonl con el mismo número de líneas."""
+        size = os.path.getsize(self.index_path) if os.path.exists(self.index_path) else 0
+        n = size // INDEX_DTYPE.itemsize
+        lines = []
+        if os.path.exists(self.meta_path):
+            with open(self.meta_path, "r", encoding="utf-8") as f:
+                lines = [l for l in f if l.endswith("\n")]
+        n = min(n, len(lines))
+        if size != n * INDEX_DTYPE.itemsize:
+            with open(self.index_path, "r+b") as f:
+                f.truncate(n * INDEX_DTYPE.itemsize)
+        if len(lines) != n:
+            with open(self.meta_path, "w", encoding="utf-8") as f:
+                f.writelines(lines[:n])
+        self.count = n
+
+    def index(self) -> np.ndarray:
+        """Índice completo como array estructurado mapeado en memoria (vacío si no hay capturas)."""
+        with self._lock:
+            if self.count == 0:
+                return np.zeros(0, INDEX_DTYPE)
+            if self._index is None or len(self._index) != self.count:
+                self._index = np.memmap(self.index_path, INDEX_DTYPE, mode="r", shape=(self.count,))
+            return self._index
+
+    def _current_pack(self, extra: int):
+        pack = 0
+        while os.path.exists(self._pack_path(pack + 1)):
+            pack += 1
+        p = self._pack_path(pack)
+        if os.path.exists(p) and os.path.getsize(p) + extra > PACK_MAX_BYTES and os.path.getsize(p) > 0:
+            pack += 1
+        return pack
+
+    # --- escritura -----------------------------------------------------------
+
+    def add_encoded(self, data: bytes, digest: bytes, size, captured: float = None, mouse=None, bbox=None,
+                    **meta) -> str:
+        """
+        Añade una captura ya codificada (`digest` = content_hash de sus píxeles). Si el
+        contenido ya estaba solo se añade el registro del índice. Devuelve la referencia.
+        """
+        with self._lock:
+            rec = np.zeros(1, INDEX_DTYPE)
+            prev = self._by_hash.get(digest)
+            if prev is not None:
+                old = self.index()[prev]
+                rec["pack"], rec["offset"], rec["length"] = old["pack"], old["offset"], old["length"]
+                self.deduped += 1
+            else:
+                pack = self._current_pack(len(data))
+                with open(self._pack_path(pack), "ab") as f:
+                    offset = f.tell()
+                    f.write(data)
+                rec["pack"], rec["offset"], rec["length"] = pack, offset, len(data)
+                self._by_hash[digest] = self.count
+                self.added += 1
+            rec["hash"][0] = np.frombuffer(digest, np.uint8)
+            rec["time"] = captured if captured is not None else time.time()
+            rec["mouse"][0] = mouse or (0, 0)
+            rec["bbox"][0] = bbox or (0, 0, 0, 0)
+            rec["width"], rec["height"] = size
+            meta = {"version": tool_version(), **meta}
+            # primero el índice y luego meta.jsonl: _recover recorta lo que quede a medias
+            with open(self.index_path, "ab") as f:
+                f.write(rec.tobytes())
+            with open(self.meta_path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(meta, ensure_ascii=False) + "\n")
+            self.count += 1
+            if self._meta is not None:
+                self._meta.append(meta)
+            return REF_PREFIX + digest.hex()
+
+    def add(self, img, ext: str = ".png", params=None, digest: bytes = None, **kwargs) -> str:
+        """Codifica `img` (array RGB o PIL) y la añade (ver add_encoded)."""
+        a = frames.rgb(img)
+        digest = digest or content_hash(a)
+        if digest in self._by_hash:   # no hace falta codificar
+            return self.add_encoded(b"", digest, frames.size(a), **kwargs)
+        ok, buf = cv2.imencode(ext, cv2.cvtColor(a, cv2.COLOR_RGB2BGR), params or [])
+        if not ok:
+            raise ValueError(f"no se pudo codificar {ext}")
+        return self.add_encoded(buf.tobytes(), digest, frames.size(a), **kwargs)
+
+    # --- lectura -------------------------------------------------------------
+
+    def _map(self, pack: int, end: int):
+        m = self._maps.get(pack)
+        if m is None or m[1] < end:   # el pack creció desde que se mapeó
+            if m is not None:
+                m[0].close()
+            with open(self._pack_path(pack), "rb") as f:
+                mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            m = self._maps[pack] = (mm, len(mm))
+        return m[0]
+
+    def index_of(self, key) -> int:
+        """Número de registro de `key` (número o referencia 'archive:<hash>'); KeyError si no está."""
+        if isinstance(key, (int, np.integer)):
+            return int(key)
+        digest = bytes.fromhex(key[len(REF_PREFIX):] if key.startswith(REF_PREFIX) else key)
+        i = self._by_hash.get(digest)
+        if i is None:
+            raise KeyError(key)
+        return i
+
+    def read_bytes(self, key) -> bytes:
+        with self._lock:
+            r = self.index()[self.index_of(key)]
+            off, n = int(r["offset"]), int(r["length"])
+            return self._map(int(r["pack"]), off + n)[off:off + n]
+
+    def get(self, key) -> np.ndarray:
+        """Captura como array RGB, por número de registro o referencia 'archive:<hash>'."""
+        buf = np.frombuffer(self.read_bytes(key), np.uint8)
+        return cv2.cvtColor(cv2.imdecode(buf, cv2.IMREAD_COLOR), cv2.COLOR_BGR2RGB)
+
+    def meta(self) -> List[dict]:
+        with self._lock:
+            if self._meta is None:
+                with open(self.meta_path, "r", encoding="utf-8") as f:
+                    self._meta = [json.loads(l) for _, l in zip(range(self.count), f)]
+            return self._meta
+
+    def record(self, i: int) -> dict:
+        r = self.index()[i]
+        return {"n": i, "ref": REF_PREFIX + r["hash"].tobytes().hex(), "time": float(r["time"]),
+                "mouse": r["mouse"].tolist(), "bbox": r["bbox"].tolist(),
+                "size": (int(r["width"]), int(r["height"])), "bytes": int(r["length"]), **self.meta()[i]}
+
+    def find(self, item: str = None, trait: str = None, since: float = None, until: float = None) -> List[int]:
+        """Números de registro por rango de hora (vectorizado sobre el índice) y/o item/trait."""
+        idx = self.index()
+        mask = np.ones(len(idx), bool)
+        if since is not None:
+            mask &= idx["time"] >= since
+        if until is not None:
+            mask &= idx["time"] <= until
+        hits = np.flatnonzero(mask).tolist()
+        if item is None and trait is None:
+            return hits
+        from ocr.inventory_store import normalize
+        meta = self.meta()
+        ni, nt = normalize(item) if item else None, normalize(trait) if trait else None
+        return [i for i in hits
+                if (ni is None or normalize(meta[i].get("item_name", "")) == ni)
+                and (nt is None or normalize(meta[i].get("trait", "")) == nt)]
+
+    def stats(self) -> dict:
+        idx = self.index()
+        packs = sorted(glob.glob(os.path.join(self.path, "pack_*.pack")))
+        return {"entries": self.count, "unique": len(self._by_hash), "packs": len(packs),
+                "pack_bytes": sum(os.path.getsize(p) for p in packs),
+                "index_bytes": self.count * INDEX_DTYPE.itemsize,
+                "first": float(idx["time"].min()) if len(idx) else None,
+                "last": float(idx["time"].max()) if len(idx) else None}
+
+    def close(self):
+        with self._lock:
+            for mm, _ in self._maps.values():
+                mm.close()
+            self._maps.clear()
+
+_archive = None
+_archive_lock = threading.Lock()
+
+def get_archive() -> SnapshotArchive:
+    global _archive
+    if _archive is None:
+        with _archive_lock:
+            if _archive is None:
+                _archive = SnapshotArchive()
+    return _archive
+
+# --- migración desde data/snaps ----------------------------------------------
+
+def snap_time(path: str) -> float:
+    """Hora de captura desde el nombre (..._YYYYmmdd_HHMMSS[_mmm].ext) o el mtime."""
+    import re
+    m = re.search(r"(\d{8}_\d{6})(?:_(\d{3}))?", os.path.basename(path))
+    if m:
+        t = datetime.strptime(m.group(1), "%Y%m%d_%H%M%S").timestamp()
+        return t + int(m.group(2) or 0) / 1000
+    return os.path.getmtime(path)
+
+def migrate(paths, archive: SnapshotArchive, crop: bool = True, delete: bool = False, ocr: bool = False):
+    """
+    Pasa capturas sueltas al archivo. Con `crop` (por defecto) se guarda solo el recorte
+    del tooltip (detect_tooltip_cv.locate_tooltip) y si no se encuentra, la imagen entera
+    con sus bytes originales. Con `ocr` se leen item/trait del recorte para la metadata.
+    Con `delete` se borra cada archivo tras comprobar la copia.
+    """
+    from ocr.detect_tooltip_cv import locate_tooltip
+    n = before = 0
+    for path in paths:
+        with open(path, "rb") as f:
+            data = f.read()
+        img = cv2.imdecode(np.frombuffer(data, np.uint8), cv2.IMREAD_COLOR)
+        if img is None:
+            print(f"[-] {path}: no es una imagen")
+            continue
+        img = cv2.cvtColor(img, cv2.COLOR_BGR2RGB)
+        h, w = img.shape[:2]
+        kwargs = {"captured": snap_time(path), "source": "migrated", "orig": os.path.relpath(path, ROOT)}
+        cand = locate_tooltip(img, (w, h // 2), (0, 0, w, h)) if crop else None
+        if cand and ocr:
+            from ocr.parse_tooltip import parse_tooltip
+            from ocr.detect_from_mouse_roi import item_and_trait
+            tip = frames.crop(img, cand.box)
+            name, trait, _, _ = item_and_trait(tip, parse_tooltip(tip, analysis=cand.analysis))
+            kwargs.update(item_name=name, trait=trait)
+        if cand:
+            stored = frames.crop(img, cand.box)
+            key = archive.add(stored, ext=".png", params=[cv2.IMWRITE_PNG_COMPRESSION, 6],
+                              bbox=cand.box, **kwargs)
+        else:   # los bytes originales tal cual, sin recodificar
+            stored = img
+            key = archive.add_encoded(data, content_hash(img), (w, h), bbox=(0, 0, w, h), **kwargs)
+        if delete:
+            if np.array_equal(archive.get(key), stored):
+                os.remove(path)
+            else:
+                print(f"[-] {path}: la copia no coincide, no se borra")
+        before += len(data)
+        n += 1
+    return n, before
+
+def main(argv=None):
+    import argparse
+    ap = argparse.ArgumentParser(description="Archivo de capturas en pack files")
+    ap.add_argument("--dir", default=ARCHIVE_DIR, help="carpeta del archivo (default: data/archive)")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    p = sub.add_parser("migrate", help="importar capturas sueltas (PNG/JPG/WebP)")
+    p.add_argument("inputs", nargs="*", help="directorios o globs (default: data/snaps)")
+    p.add_argument("--full", action="store_true", help="guardar la imagen entera, sin recortar el tooltip")
+    p.add_argument("--ocr", action="store_true", help="leer item/trait de cada recorte para poder buscar por item")
+    p.add_argument("--delete", action="store_true", help="borrar cada archivo tras comprobar la copia")
+    p = sub.add_parser("list", help="capturas por item/trait/hora")
+    p.add_argument("--item"); p.add_argument("--trait")
+    p.add_argument("--since"); p.add_argument("--until")
+    p = sub.add_parser("export", help="sacar una captura a un archivo")
+    p.add_argument("key", help="número de registro o archive:<hash>")
+    p.add_argument("out")
+    sub.add_parser("stats")
+    args = ap.parse_args(argv)
+
+    archive = SnapshotArchive(args.dir)
+    if args.cmd == "migrate":
+        from ocr.snapshot_writer import snapshot_paths
+        # todas las capturas sueltas (también las miniaturas), no solo los recortes
+        paths = sorted(snapshot_paths(args.inputs or [SNAPS_DIR], pattern="*"), key=snap_time)
+        t0 = time.perf_counter()
+        n, before = migrate(paths, archive, crop=not args.full, delete=args.delete, ocr=args.ocr)
+        s = archive.stats()
+        print(f"{n} capturas migradas en {time.perf_counter() - t0:.1f} s: {before / 1e6:.1f} MB sueltos -> "
+              f"{s['pack_bytes'] / 1e6:.1f} MB en {s['packs']} pack(s) ({archive.deduped} duplicadas)")
+    elif args.cmd == "list":
+        ts = lambda v: datetime.fromisoformat(v).timestamp() if v else None
+        for i in archive.find(args.item, args.trait, ts(args.since), ts(args.until)):
+            r = archive.record(i)
+            when = datetime.fromtimestamp(r["time"]).isoformat(timespec="seconds")
+            print(f"{i:>6} {when} {r['size'][0]}x{r['size'][1]} {r.get('item_name', '')!r} / "
+                  f"{r.get('trait', '')!r}  {r['ref']}  {r.get('orig', '')}")
+    elif args.cmd == "export":
+        key = int(args.key) if args.key.isdigit() else args.key
+        frames.to_image(archive.get(key)).save(args.out)
+        print("Exportado:", args.out)
+    else:
+        s = archive.stats()
+        print(f"{s['entries']} capturas ({s['unique']} distintas) en {s['packs']} pack(s): "
+              f"{s['pack_bytes'] / 1e6:.1f} MB + índice {s['index_bytes'] / 1e3:.1f} KB")
+    archive.close()
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,161 @@
+"""
+Escritura de capturas a disco en segundo plano.
+
+write() decide la ruta, encola el array y vuelve al momento: codificar y
+escribir lo hace un hilo aparte, fuera del camino de latencia de la captura.
+El formato sale de config (snapshot_format: png/webp/jpg) con su nivel de
+compresión (snapshot_png_level, 0-9: 1 comprime casi igual que el 6 de PIL
+en una fracción del tiempo) o calidad (snapshot_quality, webp/jpg).
+
+Con snapshot_archive, archive() manda el recorte al archivo de pack files
+(ocr/snapshot_archive.py) en vez de a un PNG suelto, por el mismo hilo.
+
+La cola es acotada: si el disco no da abasto, write() espera a que haya sitio
+en vez de perder capturas. flush() espera a que se escriba todo lo pendiente
+(p.ej. al salir).
+"""
+import os, glob, queue, threading, time
+from typing import Optional
+
+import cv2
+import numpy as np
+
+from ocr import frames
+
+QUEUE_SIZE = 64
+EXTENSIONS = {"png": ".png", "webp": ".webp", "jpg": ".jpg"}
+SNAPSHOT_PATTERN = "tooltip_*"   # recortes que guarda capture.py (tooltip_<fecha>_<ms>.<ext>)
+
+def snapshot_paths(inputs, pattern: str = SNAPSHOT_PATTERN):
+    """
+    Capturas guardadas: cada directorio da sus `pattern` en cualquiera de los
+    formatos de EXTENSIONS (snapshot_format puede haber cambiado entre sesiones);
+    el resto se trata como glob. Rutas absolutas, sin repetir y en orden estable.
+    """
+    paths = []
+    for item in inputs:
+        if os.path.isdir(item):
+            for ext in EXTENSIONS.values():
+                paths.extend(glob.glob(os.path.join(item, pattern + ext)))
+        else:
+            paths.extend(glob.glob(item))
+    return sorted({os.path.abspath(p) for p in paths})
+
+def encode_params(ext: str, png_level: int = 1, quality: int = 90):
+    ext = ext.lower()
+    if ext == ".png":
+        return [cv2.IMWRITE_PNG_COMPRESSION, png_level]
+    if ext == ".webp":
+        return [cv2.IMWRITE_WEBP_QUALITY, quality]
+    if ext in (".jpg", ".jpeg"):
+        return [cv2.IMWRITE_JPEG_QUALITY, quality]
+    return []
+
+def _resize_width(a: np.ndarray, width: int) -> np.ndarray:
+    h, w = a.shape[:2]
+    if w <= width:
+        return a
+    return cv2.resize(a, (width, max(1, h * width // w)), interpolation=cv2.INTER_AREA)
+
+class SnapshotWriter:
+    def __init__(self, fmt: str = "png", png_level: int = 1, quality: int = 90, maxsize: int = QUEUE_SIZE):
+        self.fmt = fmt
+        self.png_level = png_level
+        self.quality = quality
+        self.q = queue.Queue(maxsize=maxsize)
+        self._thread = None
+        self._lock = threading.Lock()
+        self.written = self.errors = self.bytes = 0
+        self.seconds = 0.0
+
+    @property
+    def ext(self) -> str:
+        return EXTENSIONS.get(self.fmt, ".png")
+
+    def configure(self, fmt: str, png_level: int, quality: int):
+        self.fmt, self.png_level, self.quality = fmt, png_level, quality
+
+    def write(self, img, path: str, width: Optional[int] = None, quality: Optional[int] = None) -> str:
+        """
+        Encola `img` (array o PIL) para guardarla en `path` (la extensión decide el
+        códec) y devuelve `path` sin esperar. `width` reduce antes de codificar.
+        """
+        self._put((img, path, width, quality, None))
+        return path
+
+    def archive(self, img, ref: str, **meta) -> str:
+        """
+        Encola `img` para el archivo de pack files con su metadata (captured, mouse, bbox,
+        item_name...). `ref` es snapshot_archive.ref(img), calculada por quien llama para
+        poder guardarla ya (p.ej. en el inventario); se devuelve sin esperar.
+        """
+        self._put((img, None, None, None, {"ref": ref, **meta}))
+        return ref
+
+    def _put(self, item):
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._worker, name="snapshot-writer", daemon=True)
+                self._thread.start()
+        self.q.put(item)
+
+    def _worker(self):
+        while True:
+            img, path, width, quality, meta = self.q.get()
+            t0 = time.perf_counter()
+            try:
+                a = frames.rgb(img)
+                if width:
+                    a = _resize_width(a, width)
+                ext = os.path.splitext(path)[1] if path else self.ext
+                if meta is not None:
+                    from ocr.snapshot_archive import get_archive, REF_PREFIX
+                    digest = bytes.fromhex(meta.pop("ref")[len(REF_PREFIX):])
+                    path = get_archive().add(a, ext, encode_params(ext, self.png_level, self.quality),
+                                             digest=digest, **meta)
+                    with self._lock:
+                        self.written += 1
+                        self.seconds += time.perf_counter() - t0
+                    continue
+                params = encode_params(ext, self.png_level, quality or self.quality)
+                ok, buf = cv2.imencode(ext, cv2.cvtColor(a, cv2.COLOR_RGB2BGR), params)
+                if not ok:
+                    raise ValueError(f"no se pudo codificar {ext}")
+                os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+                with open(path, "wb") as f:
+                    f.write(buf)
+                with self._lock:
+                    self.written += 1
+                    self.bytes += len(buf)
+                    self.seconds += time.perf_counter() - t0
+            except Exception as e:
+                with self._lock:
+                    self.errors += 1
+                print(f"[-] No se pudo guardar {path}: {type(e).__name__}: {e}")
+            finally:
+                self.q.task_done()
+
+    def flush(self):
+        """Espera a que se haya escrito todo lo encolado."""
+        if self._thread is not None:
+            self.q.join()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"written": self.written, "errors": self.errors, "pending": self.q.qsize(),
+                    "bytes": self.bytes, "ms_mean": self.seconds * 1000 / self.written if self.written else 0.0}
+
+_writer = None
+_writer_lock = threading.Lock()
+
+def get_writer() -> SnapshotWriter:
+    """Escritor compartido, con el formato de config.json (se relee en cada llamada)."""
+    global _writer
+    from ocr.config import get_config
+    cfg = get_config()
+    if _writer is None:
+        with _writer_lock:
+            if _writer is None:
+                _writer = SnapshotWriter()
+    _writer.configure(cfg["snapshot_format"], cfg["snapshot_png_level"], cfg["snapshot_quality"])
+    return _writer
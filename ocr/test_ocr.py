@@ -1,5 +1,7 @@
-import sys
-from parse_tooltip import parse_tooltip
+import sys, os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from ocr import daemon
+from ocr.config import get_config
 
 def main():
     if len(sys.argv) < 2:
@@ -7,7 +9,11 @@ def main():
         return
 
     img_path = sys.argv[1]
-    result = parse_tooltip(img_path, lang="eng")
+    # con el demonio en marcha (python ocr/daemon.py serve) no se carga nada de OCR aquí
+    result = daemon.parse(img_path, lang="eng", timeout=get_config()["daemon_timeout_s"])
+    if result is None:
+        from ocr.parse_tooltip import parse_tooltip
+        result = parse_tooltip(img_path, lang="eng")
 
     print("=== OCR RESULT ===")
     print("Item Name:", result["item_name"])
@@ -0,0 +1,183 @@
+"""
+Deduplicado perceptual de tooltips antes de cualquier OCR.
+
+Se calcula un dHash 16x16 (256 bits) del recorte del tooltip y se busca en un
+índice en memoria (BK-tree con distancia de Hamming) de las capturas recientes.
+Con las capturas de referencia: el mismo item da distancia 0, desplazado 1 px ~9,
+e items distintos >= 48 bits, así que MAX_DISTANCE = 20 deja margen a ambos lados.
+
+El hash global no ve una sola línea de texto: dos tooltips del mismo item que solo
+cambian en el trait quedan a 2-5 bits. Por eso cada entrada guarda también las
+filas del nombre y del trait (de su OCR) y un dHash de cada franja (STRIP_HASH);
+un acierto solo cuenta si esas franjas también coinciden en la captura nueva,
+buscando en ±STRIP_SHIFT px (desplazada 1-2 px: 0 bits; trait distinto: ~34).
+Sin esas filas no se indexa.
+"""
+from typing import List, Optional, Tuple
+
+import numpy as np
+from PIL import Image
+
+from ocr import frames
+
+HASH_SIZE = 16          # dHash de HASH_SIZE x HASH_SIZE bits
+MAX_DISTANCE = 20       # bits distintos para considerar "mismo tooltip"
+SIZE_TOLERANCE = 0.03   # además, ancho/alto del recorte deben coincidir en ±3 %
+MAX_ITEMS = 4096        # hashes recientes que se recuerdan
+STRIP_HASH = (48, 4)    # dHash de cada franja de texto: 48 x 4 bits
+STRIP_PAD = 4           # filas de margen alrededor de la línea de texto
+STRIP_MARGIN_X = 8      # columnas del marco que no entran en la franja
+STRIP_SHIFT = 2         # px de desplazamiento que se prueban al comparar franjas
+STRIP_MAX_DISTANCE = 12 # bits distintos por franja para considerar "mismo texto"
+
+def _dhash(gray: Image.Image, w: int, h: int) -> int:
+    g = gray.resize((w + 1, h), Image.BILINEAR).tobytes()
+    v = 0
+    row = w + 1
+    for y in range(h):
+        base = y * row
+        for x in range(w):
+            v = (v << 1) | (g[base + x] > g[base + x + 1])
+    return v
+
+def dhash(img, size: int = HASH_SIZE) -> int:
+    """Gradiente horizontal de la imagen (PIL o array) reducida a (size+1) x size en gris."""
+    gray = frames.to_image(frames.gray(img)) if isinstance(img, np.ndarray) else img.convert("L")
+    return _dhash(gray, size, size)
+
+def _strip_hash(gray: np.ndarray, y1: int, y2: int, dx: int = 0, dy: int = 0) -> int:
+    h, w = gray.shape[:2]
+    m = STRIP_MARGIN_X if w > 4 * STRIP_MARGIN_X else 0
+    strip = gray[max(0, y1 - STRIP_PAD + dy):min(h, y2 + STRIP_PAD + dy), max(0, m + dx):min(w, w - m + dx)]
+    return _dhash(frames.to_image(np.ascontiguousarray(strip)), *STRIP_HASH) if strip.size else 0
+
+def strip_hashes(img, rows) -> Tuple[int, ...]:
+    """dHash (STRIP_HASH) de cada franja de filas (y1, y2) del recorte."""
+    g = frames.gray(img)
+    return tuple(_strip_hash(g, y1, y2) for y1, y2 in rows)
+
+def strip_distance(img, rows, hashes) -> int:
+    """Peor distancia entre `hashes` y las franjas `rows` de img, cada una en su mejor desplazamiento."""
+    g = frames.gray(img)
+    r = range(-STRIP_SHIFT, STRIP_SHIFT + 1)
+    worst = 0
+    for (y1, y2), ref in zip(rows, hashes):
+        best = None
+        for dy in r:
+            for dx in r:
+                d = hamming(ref, _strip_hash(g, y1, y2, dx, dy))
+                best = d if best is None else min(best, d)
+                if best == 0:
+                    break
+            if best == 0:
+                break
+        worst = max(worst, best)
+    return worst
+
+def text_rows(*boxes) -> List[Tuple[int, int]]:
+    """Filas (y1, y2) de las cajas de línea que haya (nombre, trait); las None se saltan."""
+    return [(int(b[1]), int(b[3])) for b in boxes if b is not None]
+
+def hamming(a: int, b: int) -> int:
+    return bin(a ^ b).count("1")
+
+class BKTree:
+    """BK-tree sobre distancia de Hamming: búsqueda por radio sin recorrer todo."""
+
+    def __init__(self):
+        self.root = None  # (hash, value, {dist: child})
+        self.size = 0
+
+    def add(self, h: int, value):
+        self.size += 1
+        if self.root is None:
+            self.root = (h, value, {})
+            return
+        node = self.root
+        while True:
+            d = hamming(h, node[0])
+            child = node[2].get(d)
+            if child is None:
+                node[2][d] = (h, value, {})
+                return
+            node = child
+
+    def search(self, h: int, radius: int):
+        """Lista de (distancia, hash, value) con distancia <= radius."""
+        out = []
+        stack = [self.root] if self.root else []
+        while stack:
+            node = stack.pop()
+            d = hamming(h, node[0])
+            if d <= radius:
+                out.append((d, node[0], node[1]))
+            for cd, child in node[2].items():
+                if d - radius <= cd <= d + radius:
+                    stack.append(child)
+        return out
+
+class DedupIndex:
+    """
+    Índice de tooltips ya registrados en la sesión. `value` suele ser
+    {"item_name":…, "trait":…}; lookup devuelve ese value o None.
+    Cada entrada lleva las filas de sus líneas de texto (rows) y el hash de cada
+    franja; lookup las compara con el recorte nuevo antes de dar el acierto.
+    """
+
+    def __init__(self, max_distance: int = MAX_DISTANCE, max_items: int = MAX_ITEMS):
+        self.max_distance = max_distance
+        self.max_items = max_items
+        self.tree = BKTree()
+        self.recent = []  # (hash, entrada) en orden de llegada, para reconstruir
+        self.hits = 0
+        self.misses = 0
+        self.rejected = 0  # hash global parecido pero el nombre/trait no coincide
+
+    @staticmethod
+    def _same_size(a, b) -> bool:
+        return all(abs(x - y) <= SIZE_TOLERANCE * max(x, y) for x, y in zip(a, b))
+
+    @staticmethod
+    def _same_text(img, size, entry) -> bool:
+        """Las franjas de nombre/trait de la entrada, en el recorte nuevo, dan el mismo hash."""
+        sz, _, rows, hashes = entry
+        k = size[1] / sz[1]   # tamaños en ±SIZE_TOLERANCE: filas a escala
+        rows = [(round(y1 * k), round(y2 * k)) for y1, y2 in rows]
+        return strip_distance(img, rows, hashes) <= STRIP_MAX_DISTANCE
+
+    def lookup(self, h: int, size, img) -> Optional[dict]:
+        """Value del tooltip ya visto con el mismo aspecto y el mismo texto en nombre/trait, o None."""
+        found = None
+        near = sorted((hit for hit in self.tree.search(h, self.max_distance) if self._same_size(hit[2][0], size)),
+                      key=lambda hit: hit[0])
+        for _, _, entry in near:
+            if self._same_text(img, size, entry):
+                found = entry[1]
+                break
+        if found is None:
+            self.misses += 1
+            self.rejected += 1 if near else 0
+            return None
+        self.hits += 1
+        return found
+
+    def add(self, h: int, size, value, img, rows) -> bool:
+        """
+        Indexa el recorte `img` con las filas (y1, y2) de su nombre/trait (text_rows).
+        Sin filas no se indexa (False): un acierto no se podría confirmar.
+        """
+        if not rows:
+            return False
+        entry = (tuple(size), value, tuple(rows), strip_hashes(img, rows))
+        self.recent.append((h, entry))
+        self.tree.add(h, entry)
+        if len(self.recent) > self.max_items:
+            # el BK-tree no borra: se reconstruye con la mitad más reciente
+            self.recent = self.recent[-(self.max_items // 2):]
+            self.tree = BKTree()
+            for rh, entry in self.recent:
+                self.tree.add(rh, entry)
+        return True
+
+    def stats(self) -> dict:
+        return {"hits": self.hits, "misses": self.misses, "rejected": self.rejected, "entries": self.tree.size}
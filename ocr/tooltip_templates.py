@@ -0,0 +1,331 @@
+"""
+Localización del tooltip por plantillas, sin OCR.
+
+Todos los tooltips comparten el mismo marco: una línea clara por fuera y una línea
+oscura 2 px hacia dentro. Las plantillas son las cuatro esquinas de ese marco,
+aprendidas una sola vez de las capturas de referencia (pantallas completas
+data/snaps/tooltip_YYYYmmdd_HHMMSS.png) y guardadas en cache/tooltip_templates.npz. Después, localizar es: un filtro aritmético que deja
+solo los puntos con la doble línea del marco, correlación (cv2.matchTemplate,
+multiescala) de las esquinas en esos puntos y un emparejado de picos: unos ms.
+
+Construir (o reconstruir tras añadir referencias) las plantillas:
+    python ocr/tooltip_templates.py build [glob]
+
+locate() solo lee el .npz: si no existe, devuelve None (locate_tooltip pasa a
+contornos) y no vuelve a mirar. Construir cuesta OCR sobre cada referencia, así que
+solo se hace con "build" o al arrancar la captura/el demonio (ensure_templates).
+"""
+import os, sys, glob
+from typing import Optional
+
+import cv2
+import numpy as np
+from PIL import Image
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(ROOT)
+from ocr import frames
+
+# referencias: pantallas completas con el nombre de siempre (sin los _mmm de los recortes
+# que guarda la captura en la misma carpeta) y, por si acaso, al menos REF_MIN_WIDTH de ancho
+REFS_GLOB = os.path.join(ROOT, "data", "snaps", "tooltip_[0-9]*_[0-9][0-9][0-9][0-9][0-9][0-9].png")
+REF_MIN_WIDTH = 1280
+TEMPLATES_PATH = os.path.join(ROOT, "cache", "tooltip_templates.npz")
+
+PATCH = 16                                   # lado (px) de cada plantilla de esquina
+CORNERS = ("tl", "tr", "bl", "br")
+TEMPLATE_SCALES = (1.0, 0.9, 1.1, 0.8, 1.25) # se prueban en orden; 1.0 primero
+MATCH_MIN = 0.55       # correlación mínima de un pico de esquina
+MATCH_GOOD = 0.80      # con un emparejado así de bueno no se prueban más escalas
+MATCH_ACCEPT = 0.78    # media mínima de las 4 esquinas; por debajo, None (locate_tooltip prueba contornos)
+MAX_PEAKS = 40         # picos por esquina que se consideran
+MAX_PAIRS = 20         # parejas TL/BR que se verifican con las otras dos esquinas
+MIN_HEIGHT = 150       # alto mínimo de un tooltip (px a escala 1.0)
+WIDTH_SLACK = 0.08     # tolerancia sobre el rango de anchos aprendido
+
+# Marco: la línea clara debe superar a la oscura por esto, y la oscura quedar por debajo de DARK_LINE_MAX
+FRAME_CONTRAST = 25
+DARK_LINE_MAX = 40
+
+_templates = None          # None: sin cargar; _UNAVAILABLE: no hay plantillas (no se reintenta)
+_UNAVAILABLE = object()
+_build_tried = False       # ensure_templates construye como mucho una vez por proceso
+
+# --- Construcción -----------------------------------------------------------
+
+def _line_score(a, b):
+    """Contraste medio línea clara (a) vs línea oscura (b) del marco."""
+    return float(np.mean((a - b) * (b < DARK_LINE_MAX)))
+
+def refine_box(gray: np.ndarray, box, search: int = 15):
+    """
+    Ajusta una caja aproximada (p.ej. de find_tooltip_rect) a la línea clara del marco.
+    Devuelve ((x1, y1, x2, y2), scores) con x2/y2 exclusivos; los lados sin marco
+    dan score ~0, lo que sirve para descartar referencias malas.
+    """
+    g = gray.astype(np.int16)
+    H, W = g.shape
+    x1, y1, x2, y2 = box
+    x2, y2 = x2 - 1, y2 - 1
+    ym1, ym2 = y1 + (y2 - y1) // 4, y2 - (y2 - y1) // 4
+
+    def col(x, d):
+        if not (0 <= x < W and 0 <= x + d < W): return -1.0
+        return _line_score(g[ym1:ym2, x], g[ym1:ym2, x + d])
+
+    x1 = max(range(x1 - search, x1 + search + 1), key=lambda x: col(x, 2))
+    x2 = max(range(x2 - search, x2 + search + 1), key=lambda x: col(x, -2))
+    xm1, xm2 = x1 + (x2 - x1) // 4, x2 - (x2 - x1) // 4
+
+    def row(y, d):
+        if not (0 <= y < H and 0 <= y + d < H): return -1.0
+        return _line_score(g[y, xm1:xm2], g[y + d, xm1:xm2])
+
+    y2 = max(range(y2 - search, y2 + search + 1), key=lambda y: row(y, -2))
+
+    # el borde superior suele estar mal (la cabecera se funde con el icono):
+    # se sube por la línea izquierda del marco mientras siga presente
+    if x1 + 2 < W:
+        ok = ((g[:, x1] - g[:, x1 + 2]) > FRAME_CONTRAST) & (g[:, x1 + 2] < DARK_LINE_MAX)
+        y, top, gap = ym1, ym1, 0
+        while y > 0 and gap <= 4:
+            y -= 1
+            if ok[y]: top, gap = y, 0
+            else: gap += 1
+        y1 = max(range(max(0, top - 6), top + 7), key=lambda y: row(y, 2))
+
+    scores = (col(x1, 2), col(x2, -2), row(y1, 2), row(y2, -2))
+    return (x1, y1, x2 + 1, y2 + 1), scores
+
+def _corner_patches(gray: np.ndarray, box):
+    x1, y1, x2, y2 = box
+    p = PATCH
+    return {
+        "tl": gray[y1:y1 + p, x1:x1 + p],
+        "tr": gray[y1:y1 + p, x2 - p:x2],
+        "bl": gray[y2 - p:y2, x1:x1 + p],
+        "br": gray[y2 - p:y2, x2 - p:x2],
+    }
+
+def build_templates(paths=None, save: bool = True) -> Optional[dict]:
+    """
+    Aprende las esquinas del marco a partir de capturas de referencia.
+    La caja aproximada sale de find_tooltip_rect (con OCR: solo se paga aquí, una vez).
+    """
+    from ocr.detect_tooltip_cv import find_tooltip_rect
+
+    paths = sorted(paths if paths is not None else glob.glob(REFS_GLOB))
+    patches = {c: [] for c in CORNERS}
+    widths, sources = [], []
+    for path in paths:
+        img = Image.open(path)
+        if img.width < REF_MIN_WIDTH:   # un recorte del tooltip, no una pantalla
+            continue
+        img = img.convert("RGB")
+        cand = find_tooltip_rect(img, (img.width, img.height // 2), (0, 0, img.width, img.height))
+        if not cand:
+            continue
+        gray = np.array(img.convert("L"))
+        box, scores = refine_box(gray, cand.box)
+        # un lado sin marco (o con otro tooltip pegado) invalida la referencia
+        if min(scores) < 35 or max(scores) > 110:
+            continue
+        x1, y1, x2, y2 = box
+        if (y2 - y1) < MIN_HEIGHT or (x2 - x1) < 2 * PATCH:
+            continue
+        for c, patch in _corner_patches(gray, box).items():
+            patches[c].append(patch.astype(np.float32))
+        widths.append(x2 - x1)
+        sources.append(os.path.relpath(path, ROOT))
+
+    if not widths:
+        return None
+    tpl = {c: np.mean(patches[c], axis=0).round().astype(np.uint8) for c in CORNERS}
+    tpl.update(width_min=min(widths), width_max=max(widths), sources=np.array(sources))
+    if save:
+        os.makedirs(os.path.dirname(TEMPLATES_PATH), exist_ok=True)
+        np.savez_compressed(TEMPLATES_PATH, **tpl)
+    return tpl
+
+def load_templates(rebuild: bool = False) -> Optional[dict]:
+    """
+    Plantillas de cache/tooltip_templates.npz; None si no hay (y no se vuelve a mirar).
+    Solo con rebuild=True se construyen (OCR de las referencias): nunca en locate().
+    """
+    global _templates
+    if rebuild:
+        _templates = _UNAVAILABLE   # si build_templates falla, tampoco se reintenta
+        tpl = build_templates()
+        if tpl is not None:
+            _templates = tpl
+    elif _templates is None:
+        if os.path.exists(TEMPLATES_PATH):
+            with np.load(TEMPLATES_PATH) as z:
+                tpl = {k: z[k] for k in z.files}
+            tpl["width_min"] = int(tpl["width_min"])
+            tpl["width_max"] = int(tpl["width_max"])
+            _templates = tpl
+        else:
+            _templates = _UNAVAILABLE
+    return None if _templates is _UNAVAILABLE else _templates
+
+def ensure_templates() -> Optional[dict]:
+    """Al arrancar (capture, demonio): carga las plantillas o, si no existen, las construye una vez."""
+    global _build_tried
+    if load_templates() is None and not _build_tried:
+        _build_tried = True
+        print("[…] Construyendo plantillas del marco del tooltip (una sola vez)…")
+        try:
+            if load_templates(rebuild=True) is None:
+                print("[-] Ninguna captura de referencia sirvió: se localiza por contornos.")
+        except Exception as e:   # p.ej. tesseract sin tessdata
+            print(f"[-] No se pudieron construir las plantillas ({type(e).__name__}: {e}): se localiza por contornos.")
+    return load_templates()
+
+# --- Localización -----------------------------------------------------------
+
+def _frame_gate(gray: np.ndarray, corner: str, p: int) -> np.ndarray:
+    """
+    Posiciones (x, y) de plantilla donde la esquina es plausible: el punto medio de
+    sus dos lados tiene la doble línea del marco. Es aritmética de arrays sobre el ROI
+    y deja del orden de cientos de puntos, en vez de correlacionar cada píxel.
+    """
+    g = gray.astype(np.int16)
+    H, W = g.shape
+    h = p // 2
+    out = np.zeros((H, W), bool)
+    if H <= p + 2 or W <= p + 2:
+        return np.empty((0, 2), int)
+    if corner == "tl":
+        v = ((g[:, :-2] - g[:, 2:]) > FRAME_CONTRAST) & (g[:, 2:] < DARK_LINE_MAX)   # línea izquierda en x
+        hz = ((g[:-2] - g[2:]) > FRAME_CONTRAST) & (g[2:] < DARK_LINE_MAX)           # línea superior en y
+        out[:H - 2 - h, :W - 2 - h] = v[h:H - 2, :W - 2 - h] & hz[:H - 2 - h, h:W - 2]
+    else:  # "br": líneas en x + p - 1 / y + p - 1
+        v = ((g[:, 2:] - g[:, :-2]) > FRAME_CONTRAST) & (g[:, :-2] < DARK_LINE_MAX)  # línea derecha en x+2
+        hz = ((g[2:] - g[:-2]) > FRAME_CONTRAST) & (g[:-2] < DARK_LINE_MAX)          # línea inferior en y+2
+        q = p - 3
+        out[:H - p, :W - p] = v[h:H - p + h, q:W - p + q] & hz[q:H - p + q, h:W - p + h]
+    # 1 px de holgura: la plantilla es una media y el borde puede caer un píxel al lado
+    out = cv2.dilate(out.astype(np.uint8), np.ones((3, 3), np.uint8)).astype(bool)
+    ys, xs = np.nonzero(out)
+    return np.stack([xs, ys], axis=1)
+
+def _peaks(gray: np.ndarray, t: np.ndarray, points, k: int = MAX_PEAKS):
+    """
+    Correlación normalizada (equivale a TM_CCOEFF_NORMED) solo en los puntos del gate,
+    vectorizada sobre una vista deslizante del ROI (sin copiar la imagen).
+    Devuelve los k mejores con NMS de 5 px.
+    """
+    h, w = gray.shape
+    p = t.shape[0]
+    points = points[(points[:, 0] <= w - p) & (points[:, 1] <= h - p)]
+    if not len(points):
+        return []
+    win = np.lib.stride_tricks.sliding_window_view(gray, (p, p))
+    P = win[points[:, 1], points[:, 0]].reshape(len(points), -1).astype(np.float32)
+    P -= P.mean(axis=1, keepdims=True)
+    T = t.astype(np.float32).ravel()
+    T -= T.mean()
+    scores = (P @ T) / (np.sqrt((P * P).sum(axis=1) * float(T @ T)) + 1e-6)
+
+    out = []
+    for i in np.argsort(scores)[::-1]:
+        if scores[i] < MATCH_MIN:
+            break
+        x, y = int(points[i, 0]), int(points[i, 1])
+        if all(abs(x - ox) > 4 or abs(y - oy) > 4 for ox, oy, _ in out):
+            out.append((x, y, float(scores[i])))
+            if len(out) >= k:
+                break
+    return out
+
+def _match_at(gray: np.ndarray, t: np.ndarray, x: int, y: int, r: int = 2) -> float:
+    """Correlación de la plantilla solo alrededor de (x, y): una ventana diminuta."""
+    h, w = gray.shape
+    p = t.shape[0]
+    x0, y0 = max(0, x - r), max(0, y - r)
+    x1, y1 = min(w, x + p + r), min(h, y + p + r)
+    if x1 - x0 < p or y1 - y0 < p:
+        return -1.0
+    return float(cv2.matchTemplate(gray[y0:y1, x0:x1], t, cv2.TM_CCOEFF_NORMED).max())
+
+def locate(roi_img, mouse_abs, bbox_abs, templates=None,
+           scales=TEMPLATE_SCALES, stats: Optional[dict] = None):
+    """
+    Busca el tooltip en el ROI por correlación de las cuatro esquinas.
+    Devuelve un Candidate (coords del ROI) o None; nunca llama a tesseract.
+    Solo acepta tooltips a la izquierda del mouse, igual que find_tooltip_rect.
+    """
+    from ocr.detect_tooltip_cv import Candidate
+
+    tpl = templates if templates is not None else load_templates()
+    if stats is not None:
+        stats.update(scales_tried=0, template_score=None)
+    if tpl is None:
+        return None
+
+    gray = frames.gray(roi_img)
+    max_x_allowed = mouse_abs[0] - bbox_abs[0] - 6
+
+    # el tooltip queda entero a la izquierda del mouse: el resto del ROI no se mira
+    gray = gray[:, :max(0, min(gray.shape[1], max_x_allowed))]
+
+    best = None  # (score, box)
+    for s in scales:
+        if stats is not None:
+            stats["scales_tried"] += 1
+        p = max(4, int(round(PATCH * s)))
+        if p >= min(gray.shape):
+            continue
+        t = {c: tpl[c] if p == PATCH else cv2.resize(tpl[c], (p, p), interpolation=cv2.INTER_LINEAR)
+             for c in CORNERS}
+        # TL/BR solo donde el gate ve el marco; TR/BL se verifican después en su punto
+        tls = _peaks(gray, t["tl"], _frame_gate(gray, "tl", p))
+        brs = _peaks(gray, t["br"], _frame_gate(gray, "br", p))
+
+        w_lo = tpl["width_min"] * s * (1 - WIDTH_SLACK)
+        w_hi = tpl["width_max"] * s * (1 + WIDTH_SLACK)
+        pairs = []
+        for x1, y1, s_tl in tls:
+            for bx, by, s_br in brs:
+                x2, y2 = bx + p, by + p
+                if (w_lo <= x2 - x1 <= w_hi) and (y2 - y1) >= MIN_HEIGHT * s:
+                    pairs.append((s_tl + s_br, x1, y1, x2, y2))
+        pairs.sort(reverse=True)
+        for s2, x1, y1, x2, y2 in pairs[:MAX_PAIRS]:
+            s_tr = _match_at(gray, t["tr"], x2 - p, y1)
+            s_bl = _match_at(gray, t["bl"], x1, y2 - p)
+            score = (s2 + s_tr + s_bl) / 4.0
+            if best is None or score > best[0]:
+                best = (score, (x1, y1, x2, y2))
+        if best and best[0] >= MATCH_GOOD:
+            break
+
+    if best is None:
+        return None
+    score, (x1, y1, x2, y2) = best
+    if stats is not None:
+        stats["template_score"] = score
+    if score < MATCH_ACCEPT:
+        return None
+    cw, ch = x2 - x1, y2 - y1
+    return Candidate(box=(x1, y1, x2, y2), area=cw * ch, aspect=cw / ch, score=score, geo_score=score)
+
+def main(argv=None):
+    import argparse
+    ap = argparse.ArgumentParser(description="Plantillas del marco del tooltip")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    p = sub.add_parser("build", help="construir las plantillas desde las capturas de referencia")
+    p.add_argument("glob", nargs="?", default=None, help=f"referencias (default: {os.path.relpath(REFS_GLOB, ROOT)})")
+    args = ap.parse_args(argv)
+
+    tpl = build_templates(glob.glob(args.glob) if args.glob else None)
+    if tpl is None:
+        print("[-] Ninguna captura de referencia sirvió para construir plantillas.")
+        return 1
+    print(f"[✓] Plantillas guardadas en {TEMPLATES_PATH}")
+    print(f"    referencias: {len(tpl['sources'])}  ancho: {tpl['width_min']}-{tpl['width_max']} px")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
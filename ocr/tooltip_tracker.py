@@ -0,0 +1,136 @@
+"""
+Seguimiento del tooltip entre capturas: mientras el cursor sigue sobre el mismo
+item (o sobre otro con un tooltip del mismo tamaño) la caja del tooltip está en
+el mismo sitio respecto al mouse, así que no hace falta buscarla otra vez.
+
+Tras cada detección completa (detect_tooltip_cv.locate_tooltip) se recuerda la
+caja relativa al mouse y las franjas del borde del panel (BAND px hacia dentro
+de cada lado, en gris). En la captura siguiente se coloca esa caja junto al
+mouse nuevo y se comparan solo esas franjas: si las cuatro difieren en media
+menos de MAX_BORDER_DIFF, es el mismo panel y se devuelve la caja sin plantillas
+ni contornos ni OCR (decenas de microsegundos). Si no coincide ninguna de las
+cajas recientes (RECENT, una por tamaño de tooltip) se hace la detección
+completa y se aprende su caja.
+
+El marco del panel es el mismo en todos los tooltips de ese tamaño; el fondo de
+fuera (inventario, mapa) no entra en la comparación, solo el borde por dentro.
+stats() da la tasa de aciertos.
+"""
+import time, threading
+from collections import OrderedDict
+from typing import Optional, Tuple
+
+import numpy as np
+
+from ocr import frames, trace
+
+BAND = 4                 # px del borde (hacia dentro) que se comparan
+MAX_BORDER_DIFF = 12.0   # diferencia media de gris (0-255) por lado para aceptar la caja
+RECENT = 8               # cajas recordadas (por tamaño de tooltip)
+
+def _strips(img, box) -> Optional[Tuple[np.ndarray, ...]]:
+    """Franjas de borde (arriba, abajo, izquierda, derecha) en gris, o None si la caja se sale."""
+    x1, y1, x2, y2 = box
+    w, h = frames.size(img)
+    if x1 < 0 or y1 < 0 or x2 > w or y2 > h or x2 - x1 <= 2 * BAND or y2 - y1 <= 2 * BAND:
+        return None
+    b = BAND
+    return tuple(frames.gray(np.ascontiguousarray(s)).astype(np.int16) for s in (
+        img[y1:y1 + b, x1:x2], img[y2 - b:y2, x1:x2], img[y1:y2, x1:x1 + b], img[y1:y2, x2 - b:x2]))
+
+class TooltipTracker:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._recent = OrderedDict()   # (ancho, alto) -> (caja relativa al mouse, franjas)
+        self.lookups = self.hits = self.misses = 0
+        self.check_s = 0.0
+
+    def predict(self, img, mouse_abs, bbox_abs):
+        """Caja (coords del ROI) de un tooltip recordado que sigue en su sitio, o None."""
+        from ocr.detect_tooltip_cv import Candidate
+        t0 = time.perf_counter()
+        img = frames.rgb(img) if not isinstance(img, np.ndarray) else img
+        ox, oy = mouse_abs[0] - bbox_abs[0], mouse_abs[1] - bbox_abs[1]
+        with self._lock:
+            recent = list(reversed(self._recent.items()))
+        found = None
+        for size, (rel, ref) in recent:
+            box = (ox + rel[0], oy + rel[1], ox + rel[2], oy + rel[3])
+            cur = _strips(img, box)
+            if cur is None:
+                continue
+            if all(float(np.abs(c - r).mean()) <= MAX_BORDER_DIFF for c, r in zip(cur, ref)):
+                found = box
+                with self._lock:
+                    if size in self._recent:
+                        self._recent.move_to_end(size)
+                break
+        with self._lock:
+            self.check_s += time.perf_counter() - t0
+        if found is None:
+            return None
+        w, h = found[2] - found[0], found[3] - found[1]
+        return Candidate(box=found, area=w * h, aspect=w / h, score=1.0, geo_score=1.0)
+
+    def learn(self, img, mouse_abs, bbox_abs, box):
+        ref = _strips(img, box)
+        if ref is None:
+            return
+        ox, oy = mouse_abs[0] - bbox_abs[0], mouse_abs[1] - bbox_abs[1]
+        rel = (box[0] - ox, box[1] - oy, box[2] - ox, box[3] - oy)
+        size = (box[2] - box[0], box[3] - box[1])
+        with self._lock:
+            self._recent[size] = (rel, ref)
+            self._recent.move_to_end(size)
+            while len(self._recent) > RECENT:
+                self._recent.popitem(last=False)
+
+    def locate(self, img, mouse_abs, bbox_abs, detect=None, **kwargs):
+        """
+        Como detect_tooltip_cv.locate_tooltip, pero probando antes las cajas recordadas.
+        `detect` es la detección completa para los fallos (por defecto locate_tooltip).
+        """
+        if detect is None:
+            from ocr.detect_tooltip_cv import locate_tooltip as detect
+        with trace.span("track"):
+            cand = self.predict(img, mouse_abs, bbox_abs)
+        with self._lock:
+            self.lookups += 1
+            if cand is not None:
+                self.hits += 1
+            else:
+                self.misses += 1
+        trace.attr("track_hit", cand is not None)
+        if cand is not None:
+            return cand
+        cand = detect(img, mouse_abs, bbox_abs, **kwargs)
+        if cand is not None:
+            self.learn(img, mouse_abs, bbox_abs, cand.box)
+        return cand
+
+    def reset(self):
+        with self._lock:
+            self._recent.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            n = self.lookups
+            return {"lookups": n, "hits": self.hits, "misses": self.misses,
+                    "hit_rate": self.hits / n if n else 0.0,
+                    "check_ms_mean": self.check_s * 1000 / n if n else 0.0}
+
+    def format_stats(self) -> str:
+        s = self.stats()
+        return (f"Seguimiento del tooltip: {s['hits']} de {s['lookups']} capturas sin detección "
+                f"({100 * s['hit_rate']:.0f} %), comprobación {s['check_ms_mean']:.2f} ms de media")
+
+_tracker = None
+_tracker_lock = threading.Lock()
+
+def get_tracker() -> TooltipTracker:
+    global _tracker
+    if _tracker is None:
+        with _tracker_lock:
+            if _tracker is None:
+                _tracker = TooltipTracker()
+    return _tracker
@@ -0,0 +1,208 @@
+"""
+Trazas por captura: spans cronometrados y contadores en el camino caliente.
+
+Se activa con la variable de entorno TLINV_TRACE=1 (tiene prioridad) o con
+"trace": true en config.json. Apagado, span() y count() solo miran una
+ContextVar y devuelven, así que pueden quedarse en el código sin coste.
+
+Una captura es un Trace: se crea con begin() (en el hilo del hotkey, al tomar
+los píxeles), se activa con `with active(t):` en el hilo que la procesa y se
+cierra con end(t), que añade una línea JSON a cache/trace.jsonl. El trabajo que
+se reparte en un pool (p.ej. las franjas de strips.py) se lanza con
+submit(pool, fn, ...), que lleva la traza activa al hilo del pool:
+
+    {"name": "capture", "t": "...", "total_ms": 812.4,
+     "spans": [{"name": "grab", "at_ms": 0.0, "ms": 31.2, "depth": 0}, ...],
+     "counters": {"tesseract_calls": 1, "bytes_written": 183004, ...}, "attrs": {...}}
+
+Además se mantiene un resumen de las últimas ROLLING capturas (p50/p95 por span
+y media de cada contador) en cache/trace_summary.json.
+"""
+import os, json, time, threading, contextvars
+from collections import deque
+from datetime import datetime
+from typing import Optional
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+TRACE_PATH = os.path.join(ROOT, "cache", "trace.jsonl")
+SUMMARY_PATH = os.path.join(ROOT, "cache", "trace_summary.json")
+
+ENV_VAR = "TLINV_TRACE"
+ROLLING = 500          # capturas que entran en el resumen
+SUMMARY_EVERY = 10     # reescribir trace_summary.json cada N capturas
+
+# traza activa; una ContextVar (no un thread-local) para que copy_context() la lleve a otros hilos
+_current = contextvars.ContextVar("trace", default=None)
+
+def enabled() -> bool:
+    env = os.environ.get(ENV_VAR)
+    if env is not None:
+        return env.strip().lower() not in ("", "0", "false", "no", "off")
+    from ocr.config import get_config
+    return bool(get_config()["trace"])
+
+class Trace:
+    def __init__(self, name: str, **attrs):
+        self.name = name
+        self.attrs = attrs
+        self.t0 = time.perf_counter()
+        self.wall = datetime.now().isoformat(timespec="milliseconds")
+        self.spans = []
+        self.counters = {}
+        self.depth = 0
+        self._lock = threading.Lock()
+
+    def count(self, name: str, n=1):
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + n
+
+    def to_dict(self) -> dict:
+        return {"name": self.name, "t": self.wall,
+                "total_ms": round((time.perf_counter() - self.t0) * 1000, 3),
+                "spans": self.spans, "counters": self.counters, "attrs": self.attrs}
+
+class _Span:
+    __slots__ = ("trace", "name", "t")
+
+    def __init__(self, trace: Trace, name: str):
+        self.trace = trace
+        self.name = name
+
+    def __enter__(self):
+        self.t = time.perf_counter()
+        with self.trace._lock:   # puede haber spans a la vez en los hilos de un pool
+            self.trace.depth += 1
+        return self
+
+    def __exit__(self, *exc):
+        tr = self.trace
+        end = time.perf_counter()
+        with tr._lock:
+            tr.depth -= 1
+            tr.spans.append({"name": self.name, "at_ms": round((self.t - tr.t0) * 1000, 3),
+                             "ms": round((end - self.t) * 1000, 3), "depth": tr.depth})
+        return False
+
+class _Noop:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+_NOOP = _Noop()
+
+def begin(name: str = "capture", **attrs) -> Optional[Trace]:
+    """Nueva traza si el tracing está activo; None si no (y todo lo demás no hace nada)."""
+    return Trace(name, **attrs) if enabled() else None
+
+class active:
+    """`with active(t):` hace de `t` la traza actual (t puede ser None)."""
+    __slots__ = ("trace", "token")
+
+    def __init__(self, trace: Optional[Trace]):
+        self.trace = trace
+
+    def __enter__(self):
+        self.token = _current.set(self.trace)
+        return self.trace
+
+    def __exit__(self, *exc):
+        _current.reset(self.token)
+        return False
+
+def current() -> Optional[Trace]:
+    return _current.get()
+
+def submit(pool, fn, *args, **kwargs):
+    """pool.submit(fn, ...) con la traza actual activa en el hilo del pool."""
+    return pool.submit(contextvars.copy_context().run, fn, *args, **kwargs)
+
+def span(name: str):
+    tr = _current.get()
+    return _NOOP if tr is None else _Span(tr, name)
+
+def count(name: str, n=1):
+    tr = _current.get()
+    if tr is not None:
+        tr.count(name, n)
+
+def attr(name: str, value):
+    tr = _current.get()
+    if tr is not None:
+        tr.attrs[name] = value
+
+# --- salida -----------------------------------------------------------------
+
+_out_lock = threading.Lock()
+_recent = deque(maxlen=ROLLING)
+_ended = 0
+
+def end(trace: Optional[Trace]):
+    """Cierra la traza: una línea en trace.jsonl y entra en el resumen."""
+    global _ended
+    if trace is None:
+        return
+    rec = trace.to_dict()
+    line = json.dumps(rec, ensure_ascii=False)
+    with _out_lock:
+        os.makedirs(os.path.dirname(TRACE_PATH), exist_ok=True)
+        with open(TRACE_PATH, "a", encoding="utf-8") as f:
+            f.write(line + "\n")
+        _recent.append(rec)
+        _ended += 1
+        write = _ended % SUMMARY_EVERY == 0
+    if write:
+        _write_summary()
+
+def _pct(values, p):
+    v = sorted(values)
+    return v[min(len(v) - 1, int(round(p / 100.0 * (len(v) - 1))))] if v else 0.0
+
+def summary() -> dict:
+    """p50/p95/máx por span y media por captura de cada contador (últimas ROLLING)."""
+    with _out_lock:
+        recs = list(_recent)
+    spans, counters = {}, {}
+    for rec in recs:
+        per = {}
+        for s in rec["spans"]:
+            per[s["name"]] = per.get(s["name"], 0.0) + s["ms"]
+        per["total"] = rec["total_ms"]
+        for k, ms in per.items():
+            spans.setdefault(k, []).append(ms)
+        for k, n in rec["counters"].items():
+            counters[k] = counters.get(k, 0) + n
+    n = len(recs)
+    return {
+        "captures": n,
+        "spans": {k: {"n": len(v), "p50_ms": round(_pct(v, 50), 2), "p95_ms": round(_pct(v, 95), 2),
+                      "max_ms": round(max(v), 2)} for k, v in spans.items()},
+        "counters": {k: {"total": v, "per_capture": round(v / n, 2)} for k, v in counters.items()} if n else {},
+    }
+
+def _write_summary():
+    try:
+        tmp = SUMMARY_PATH + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(summary(), f, indent=2, ensure_ascii=False)
+        os.replace(tmp, SUMMARY_PATH)
+    except OSError:
+        pass
+
+def flush():
+    """Escribe el resumen ya (p.ej. al salir)."""
+    if _recent:
+        _write_summary()
+
+def format_summary() -> str:
+    s = summary()
+    if not s["captures"]:
+        return "Traza: sin capturas"
+    rows = sorted(s["spans"].items(), key=lambda kv: kv[1]["p50_ms"], reverse=True)
+    out = [f"Traza ({s['captures']} capturas, {TRACE_PATH}):"]
+    out += [f"  {k:20s} p50 {v['p50_ms']:8.1f} ms  p95 {v['p95_ms']:8.1f} ms" for k, v in rows]
+    out += [f"  {k:20s} {v['per_capture']:.2f} por captura" for k, v in s["counters"].items()]
+    return "\n".join(out)
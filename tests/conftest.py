@@ -0,0 +1,70 @@
+"""
+Fixtures comunes: ningún test escribe en cache/ ni en data/ del repo.
+
+Cada test tiene su caché de OCR, su inventario, sus layouts y user-words de franjas en
+tmp_path; las plantillas del marco se construyen una vez por sesión a partir de
+data/snaps (sin leer ni escribir cache/tooltip_templates.npz). Los tests que
+necesitan tesseract piden la fixture `ocr`, que los salta si no hay OCR.
+"""
+import os, sys, functools
+
+import numpy as np
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(ROOT)
+from ocr import inventory_store, ocr_cache, ocr_engine, strips, tooltip_templates
+
+@functools.lru_cache(maxsize=None)
+def ocr_available() -> bool:
+    """Hay tesseract con eng.traineddata (tesserocr, o pytesseract y el binario)."""
+    try:
+        ocr_engine.image_to_text(np.full((24, 64), 255, np.uint8), lang="eng", psm=7)
+        return True
+    except Exception:
+        return False
+
+@pytest.fixture
+def ocr():
+    if not ocr_available():
+        pytest.skip("tesseract/tessdata no disponible")
+
+@pytest.fixture(scope="session")
+def templates(tmp_path_factory):
+    """Plantillas del marco construidas desde data/snaps, o None sin OCR."""
+    if not ocr_available():
+        return None
+    cache = ocr_cache.OcrCache(str(tmp_path_factory.mktemp("templates") / "ocr_cache.sqlite"))
+    saved, ocr_engine._cache = ocr_engine._cache, cache
+    try:
+        return tooltip_templates.build_templates(save=False)
+    finally:
+        ocr_engine._cache = saved
+        cache.close()
+
+@pytest.fixture(autouse=True)
+def isolated_paths(tmp_path, monkeypatch, templates):
+    cache_path = str(tmp_path / "ocr_cache.sqlite")
+    monkeypatch.setattr(ocr_cache, "CACHE_PATH", cache_path)
+    cache = ocr_cache.OcrCache(cache_path)
+    monkeypatch.setattr(ocr_engine, "_cache", cache)
+    monkeypatch.setattr(ocr_engine, "_cache_enabled", True)
+
+    monkeypatch.setattr(tooltip_templates, "TEMPLATES_PATH", str(tmp_path / "tooltip_templates.npz"))
+    monkeypatch.setattr(tooltip_templates, "_templates",
+                        templates if templates is not None else tooltip_templates._UNAVAILABLE)
+    monkeypatch.setattr(tooltip_templates, "_build_tried", True)
+
+    db, csv = str(tmp_path / "inventory.sqlite"), str(tmp_path / "inventory.csv")
+    monkeypatch.setattr(inventory_store, "DB_PATH", db)
+    monkeypatch.setattr(inventory_store, "INV_CSV", csv)
+    store = inventory_store.InventoryStore(db, csv_path=csv)
+    monkeypatch.setattr(inventory_store, "_store", store)
+
+    monkeypatch.setattr(strips, "CACHE_DIR", str(tmp_path))   # user_words_<kind>.txt
+    monkeypatch.setattr(strips, "_variables", {})
+    monkeypatch.setattr(strips, "LAYOUTS_PATH", str(tmp_path / "strip_layouts.json"))
+    monkeypatch.setattr(strips, "_layouts", strips.Layouts(str(tmp_path / "strip_layouts.json")))
+    yield
+    store.close()
+    cache.close()
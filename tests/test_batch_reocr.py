@@ -0,0 +1,22 @@
+import os, sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(ROOT)
+from ocr.batch_reocr import expand_inputs, main
+
+def test_directories_expand_to_every_snapshot_format(tmp_path):
+    for name in ("tooltip_1.png", "tooltip_2.webp", "tooltip_3.jpg", "shot_4.jpg", "notes.txt"):
+        (tmp_path / name).write_bytes(b"")
+    got = [os.path.basename(p) for p in expand_inputs([str(tmp_path), str(tmp_path / "tooltip_1.*")])]
+    assert got == ["tooltip_1.png", "tooltip_2.webp", "tooltip_3.jpg"]
+
+def test_main_fails_when_no_input_matches(tmp_path):
+    assert main([str(tmp_path / "tooltip_*.png"), "--out", str(tmp_path / "out.csv")]) == 1
+    assert not (tmp_path / "out.csv").exists()
+
+def test_main_succeeds_when_everything_was_already_done(tmp_path):
+    snap = tmp_path / "tooltip_1.png"
+    snap.write_bytes(b"")
+    out = tmp_path / "out.csv"
+    out.write_text(f"item_name,trait,qty,slot_img,tooltip_img,last_seen\nItem,,1,,{snap},\n", encoding="utf-8")
+    assert main([str(tmp_path), "--out", str(out)]) == 0
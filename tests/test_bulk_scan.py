@@ -0,0 +1,12 @@
+import os, sys, glob
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(ROOT)
+from ocr import bulk_scan
+
+SNAP = sorted(glob.glob(os.path.join(ROOT, "data", "snaps", "*.png")))[0]
+
+def test_grid_command_detects_bag(capsys):
+    assert bulk_scan.main(["grid", SNAP]) == 0
+    out = capsys.readouterr().out
+    assert "casillas de" in out
@@ -0,0 +1,43 @@
+import os, sys, json
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(ROOT)
+from ocr import config
+from ocr.config import Config, ConfigError, DEFAULTS, read_config, validate
+
+def _write(path, data, mtime_ns):
+    path.write_text(data if isinstance(data, str) else json.dumps(data), encoding="utf-8")
+    os.utime(path, ns=(mtime_ns, mtime_ns))   # mtime distinto aunque se escriba en el mismo tick
+
+def test_defaults_fill_missing_keys(tmp_path):
+    assert read_config(str(tmp_path / "none.json")) == DEFAULTS
+    cfg = validate({"language": "spa"})
+    assert cfg["language"] == "spa" and cfg["auto_fps"] == DEFAULTS["auto_fps"]
+
+def test_invalid_values_are_all_reported():
+    with pytest.raises(ConfigError) as e:
+        validate({"capture_workers": 0, "dedup": "yes", "snapshot_format": "bmp"})
+    msg = str(e.value)
+    assert "capture_workers" in msg and "dedup" in msg and "snapshot_format" in msg
+
+def test_broken_json_names_the_line(tmp_path):
+    path = tmp_path / "config.json"
+    path.write_text('{\n  "language": "eng",\n}', encoding="utf-8")
+    with pytest.raises(ConfigError, match="línea 3"):
+        read_config(str(path))
+
+def test_edits_reload_and_bad_edits_keep_the_last_valid(tmp_path, monkeypatch, capsys):
+    monkeypatch.setattr(config, "CHECK_INTERVAL", 0.0)
+    path = tmp_path / "config.json"
+    _write(path, {"auto_fps": 5}, 1_000_000_000)
+    cfg = Config(str(path))
+    assert cfg["auto_fps"] == 5
+
+    _write(path, {"auto_fps": 12}, 2_000_000_000)
+    assert cfg["auto_fps"] == 12 and cfg.reloads == 1
+
+    _write(path, {"auto_fps": "rápido"}, 3_000_000_000)
+    assert cfg["auto_fps"] == 12 and cfg.reloads == 1
+    assert "auto_fps" in capsys.readouterr().err
@@ -0,0 +1,37 @@
+import os, sys, time, socket, tempfile, threading
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(ROOT)
+from ocr import daemon
+
+def _fake_daemon(monkeypatch, reply: bytes):
+    """Demonio falso: acepta, lee la petición y contesta `reply` (b'' = se queda callado)."""
+    path = os.path.join(tempfile.mkdtemp(), "d.sock")
+    srv = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    srv.bind(path)
+    srv.listen(1)
+    done = threading.Event()
+
+    def serve():
+        conn, _ = srv.accept()
+        conn.recv(4096)
+        if reply:
+            conn.sendall(reply)
+        done.wait(5)
+        conn.close()
+    threading.Thread(target=serve, daemon=True).start()
+    monkeypatch.setattr(daemon, "SOCKET_PATH", path)
+    return done
+
+@pytest.mark.skipif(not daemon.USE_UNIX, reason="sin sockets Unix")
+@pytest.mark.parametrize("reply", [b"", b"esto no es JSON\n"])
+def test_parse_falls_back_when_daemon_misbehaves(monkeypatch, reply):
+    done = _fake_daemon(monkeypatch, reply)
+    t0 = time.perf_counter()
+    try:
+        assert daemon.parse("x.png", timeout=0.3) is None
+        assert time.perf_counter() - t0 < 2.0
+    finally:
+        done.set()
@@ -0,0 +1,50 @@
+import os, sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(ROOT)
+from ocr.analysis import from_words
+from ocr.heuristics import Rules, get_rules, line_index, select
+
+def _analysis(lines, size=(400, 300)):
+    """Líneas [(y, alto, "texto")] -> TooltipAnalysis con una palabra de 12 px por letra."""
+    words = []
+    for n, (y, h, text) in enumerate(lines):
+        x = 20
+        for t in text.split():
+            words.append({"text": t, "x": x, "y": y, "w": 12 * len(t), "h": h, "conf": 90,
+                          "line": n, "block": 0, "par": 0})
+            x += 12 * len(t) + 8
+    return from_words(words, size)
+
+TOOLTIP = [
+    (10, 12, "Epic Ring"),
+    (36, 20, "Sinking Sun Signet"),
+    (70, 12, "Off-hand Melee Defense 120"),
+    (100, 12, "Max Health 225"),
+    (150, 12, "Trait"),
+    (170, 12, "Mana Regen 15"),
+]
+
+def test_name_and_trait_from_anchors():
+    name, trait = select(line_index(_analysis(TOOLTIP)))
+    assert name.text == "Sinking Sun Signet"
+    assert trait.text == "Mana Regen 15"
+
+def test_blacklist_and_trait_label_vocabulary():
+    ix = line_index(_analysis(TOOLTIP))
+    assert [li.blacklisted for li in ix.lines] == [False, False, True, False, True, False]
+    assert ix.trait_label == 4 and ix.lower_y == 70
+    rules = get_rules()
+    assert rules.is_trait_label("Trait:") and not rules.is_trait_label("Traits")
+
+def test_without_rarity_anchor_the_name_is_above_the_first_stat():
+    lines = [(36, 20, "Sinking Sun Signet")] + TOOLTIP[2:]
+    name, _ = select(line_index(_analysis(lines)))
+    assert name.text == "Sinking Sun Signet"
+
+def test_rules_come_from_data_and_index_is_built_once():
+    rules = Rules({"rarity": ["mythic"], "item_types": ["ring"], "params": {"min_name_words": 3}})
+    assert rules.rarity.search("Mythicl") and not rules.rarity.search("Epic")
+    assert rules.params["min_name_words"] == 3 and rules.params["name_window"] == 180
+    ana = _analysis(TOOLTIP)
+    assert line_index(ana) is line_index(ana)
@@ -0,0 +1,35 @@
+import os, sys, time, sqlite3
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(ROOT)
+from ocr import inventory_store
+from ocr.inventory_store import InventoryStore
+
+def _rows(path):
+    with sqlite3.connect(path) as db:
+        return db.execute("SELECT item_name, trait, qty FROM inventory").fetchall()
+
+def test_pending_rows_are_flushed_without_another_add(tmp_path, monkeypatch):
+    monkeypatch.setattr(inventory_store, "FLUSH_SECONDS", 0.05)
+    path = str(tmp_path / "inventory.sqlite")
+    store = InventoryStore(path, csv_path=str(tmp_path / "inventory.csv"))
+    store.add("Item", "Trait")
+    assert _rows(path) == []
+    deadline = time.monotonic() + 2.0
+    while not _rows(path) and time.monotonic() < deadline:
+        time.sleep(0.02)
+    assert _rows(path) == [("Item", "Trait", 1)]
+    store.close()
+
+def test_add_after_close_raises(tmp_path):
+    path = str(tmp_path / "inventory.sqlite")
+    store = InventoryStore(path, csv_path=str(tmp_path / "inventory.csv"))
+    store.add("Item", "Trait")
+    store.close()
+    with pytest.raises(inventory_store.StoreClosed):
+        store.add("Item", "Trait")
+    store.flush()
+    store.close()
+    assert _rows(path) == [("Item", "Trait", 1)]
@@ -0,0 +1,21 @@
+import os, sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(ROOT)
+from ocr.normalizer import Vocabulary, names, snap, traits
+
+def test_ocr_variant_snaps_to_canonical_item():
+    assert snap("Ca1anthia's Visaqe", names())[0] == "Calanthia's Visage"
+    assert snap("Sinkinq Sun Signet.", names())[0] == "Sinking Sun Signet"
+
+def test_noise_and_stat_lines_are_not_item_names():
+    for text in ("Eich o~ Ri", "Melee Defense"):
+        assert snap(text, names()) == (text, 0.0)
+
+def test_known_variant_maps_to_its_id():
+    vocab = Vocabulary({"Collar of Nature's Wrath": ["Coliar of Natures Wrath"]})
+    item, conf = snap("Coliar of Natures Wrath", vocab)
+    assert item == "Collar of Nature's Wrath" and conf == 1.0
+
+def test_trait_vocabulary_is_loaded():
+    assert snap("Mana Regen 15", traits())[0] == "Mana Regen"
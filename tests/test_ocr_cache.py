@@ -0,0 +1,47 @@
+import os, sys, itertools
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(ROOT)
+from ocr import ocr_cache
+from ocr.ocr_cache import OcrCache
+
+WORDS = [{"text": "Trait", "x": 1, "y": 2, "w": 30, "h": 9, "conf": 95, "line": 1, "block": 1, "par": 1}]
+
+def test_hits_and_misses_are_counted(tmp_path):
+    path = str(tmp_path / "ocr.sqlite")
+    cache = OcrCache(path)
+    assert cache.get("k") is None
+    cache.put("k", WORDS)
+    assert cache.get("k") == WORDS          # LRU en memoria
+    cache.close()
+    cache = OcrCache(path)
+    assert cache.get("k") == WORDS          # desde SQLite
+    assert cache.get("otra") is None
+    assert cache.stats() == {"hits": 1, "misses": 1, "entries": 1, "hit_rate": 0.5}
+    cache.close()
+
+def test_replacing_a_key_does_not_grow_the_count(tmp_path):
+    cache = OcrCache(str(tmp_path / "ocr.sqlite"), max_entries=10)
+    for _ in range(5):
+        cache.put("k", WORDS)
+    cache.put("k2", WORDS)
+    assert cache.stats()["entries"] == 2
+    assert cache._db.execute("SELECT COUNT(*) FROM ocr").fetchone()[0] == 2
+    cache.close()
+
+def test_least_recently_used_entries_are_evicted(tmp_path, monkeypatch):
+    clock = itertools.count(1000)
+    monkeypatch.setattr(ocr_cache.time, "time", lambda: float(next(clock)))
+    path = str(tmp_path / "ocr.sqlite")
+    cache = OcrCache(path, max_entries=10)
+    for i in range(10):
+        cache.put(f"k{i}", WORDS)
+    cache.close()
+    cache = OcrCache(path, max_entries=10)
+    assert cache.get("k0") == WORDS         # leída desde disco: pasa a ser la más reciente
+    cache.put("k10", WORDS)                 # 11 > 10: quedan int(10 * 0.9) = 9
+    assert cache.stats()["entries"] == 9
+    cache.close()
+    cache = OcrCache(path)
+    assert [k for k in ("k0", "k1", "k2", "k3", "k10") if cache.get(k) is not None] == ["k0", "k3", "k10"]
+    cache.close()
@@ -0,0 +1,52 @@
+import os, sys
+
+import numpy as np
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(ROOT)
+from ocr import preprocess
+
+def _panel():
+    """Panel oscuro (30) con un trazo de texto claro (200) y otro dorado."""
+    a = np.full((40, 80, 3), 30, np.uint8)
+    a[10:20, 10:40] = 200
+    a[25:32, 45:70] = (230, 170, 40)
+    return a
+
+def test_none_returns_the_input_untouched():
+    a = _panel()
+    assert preprocess.run(a, "none") is a
+
+def test_chain_parsing_and_validation():
+    assert preprocess.parse_chain("bg + gamma:0.7+adaptive") == [("bg", None), ("gamma", "0.7"), ("adaptive", None)]
+    assert preprocess.scale_of("upscale:2+binary+upscale:3") == 6
+    assert not preprocess.validate_chain("bg+sharpen")
+    with pytest.raises(ValueError, match="sharpen"):
+        preprocess.run(_panel(), "sharpen")
+
+def test_stages_keep_text_white_on_black():
+    a = _panel()
+    out = preprocess.run(a, "bg+binary")
+    assert out.shape == (40, 80) and out[15, 20] == 255 and out[2, 2] == 0
+    assert preprocess.run(a, "upscale:2").shape == (80, 160, 3)
+    mask = preprocess.run(a, "rarity")
+    assert mask[28, 50] == 255 and mask[15, 20] == 0   # solo el texto de color de rareza
+
+def test_each_stage_reports_its_time():
+    timings = {}
+    preprocess.run(_panel(), "bg+gamma+adaptive", timings)
+    assert set(timings) == {"bg", "gamma", "adaptive"}
+    assert preprocess.stats()["gamma"]["calls"] >= 1
+
+def test_debug_dumps_are_opt_in(tmp_path, monkeypatch):
+    dumps = tmp_path / "dumps"
+    monkeypatch.setattr(preprocess, "CACHE_DIR", str(dumps))
+    monkeypatch.setattr(preprocess, "_dumps_enabled", False)
+    preprocess.run(_panel(), "binary")
+    preprocess._dump_q.join()
+    assert not dumps.exists()
+    preprocess.configure_dumps(True)
+    preprocess.run(_panel(), "binary")
+    preprocess._dump_q.join()
+    assert sorted(os.listdir(dumps)) == ["last_input.png", "last_preprocessed.png"]
@@ -0,0 +1,90 @@
+import os, sys, gzip, json, sqlite3, threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(ROOT)
+from ocr.prices import HttpSession, PriceTable
+
+ETAG = '"v1"'
+TABLE = [{"item_name": "Sinking Sun Signet", "price": 1200},
+         {"item_name": "Sinking Sun Signet", "trait": "Mana Regen", "price": 3500},
+         {"item_name": "Sinking Sun Signet", "price": 900}]
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"   # keep-alive, para comprobar que se reutiliza la conexión
+
+    def do_GET(self):
+        srv = self.server
+        srv.seen.append(dict(self.headers))
+        srv.peers.add(self.client_address)
+        if self.headers.get("If-None-Match") == ETAG:
+            self.send_response(304)
+            self.send_header("ETag", ETAG)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        body = json.dumps({"items": TABLE}).encode()
+        self.send_response(200)
+        self.send_header("ETag", ETAG)
+        self.send_header("Content-Type", "application/json")
+        if "gzip" in self.headers.get("Accept-Encoding", ""):
+            body = gzip.compress(body)
+            self.send_header("Content-Encoding", "gzip")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+@pytest.fixture
+def server():
+    srv = ThreadingHTTPServer(("127.0.0.1", 0), _Handler)
+    srv.seen, srv.peers = [], set()
+    threading.Thread(target=srv.serve_forever, daemon=True).start()
+    yield srv
+    srv.shutdown()
+    srv.server_close()
+
+@pytest.fixture
+def table(tmp_path, server):
+    t = PriceTable(str(tmp_path / "prices.sqlite"), url=f"http://127.0.0.1:{server.server_port}/prices",
+                   region="eu", ttl_minutes=60, http=HttpSession(timeout=5))
+    yield t
+    t.close()
+
+def _expire(t):
+    with sqlite3.connect(t.path) as db:
+        db.execute("UPDATE price_sync SET checked_at = checked_at - 7200")
+
+def test_first_sync_stores_rows_and_lookup_returns_price(table, server):
+    assert table.sync() == "updated"
+    assert server.seen[0]["Accept-Encoding"] == "gzip"
+    assert table.stats()["entries"] == 2          # el duplicado se queda con el más barato
+    assert table.lookup("Sinking Sun Signet") == 900
+    assert table.lookup("sinking sun signet", "Mana Regen") == 3500
+    assert table.lookup("Sinking Sun Signet", "Max Health") == 900   # sin ese trait: el del item
+    assert table.lookup("Celestial Cyclone Warblade") is None
+    assert table.sync() == "fresh" and len(server.seen) == 1
+
+def test_expired_table_revalidates_with_etag(table, server):
+    table.sync()
+    before = table._sync_row()
+    _expire(table)
+    assert table.stale()
+    assert table.sync() == "not_modified"
+    assert server.seen[1]["If-None-Match"] == ETAG
+    after = table._sync_row()
+    assert after["fetched_at"] == before["fetched_at"]
+    assert after["checked_at"] >= before["checked_at"] and not table.stale()
+    assert table.lookup("Sinking Sun Signet") == 900
+    assert table.downloads == 1 and table.not_modified == 1
+
+def test_keep_alive_connection_is_reused(table, server):
+    table.sync()
+    _expire(table)
+    table.sync()
+    assert table.http.requests == 2 and table.http.reused == 1
+    assert len(server.peers) == 1
@@ -0,0 +1,47 @@
+import os, sys
+
+import cv2
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(ROOT)
+from ocr.snapshot_archive import SnapshotArchive, migrate
+
+def _img(seed):
+    return np.random.default_rng(seed).integers(0, 256, (48, 64, 3), dtype=np.uint8)
+
+def _save(path, a):
+    assert cv2.imwrite(str(path), cv2.cvtColor(a, cv2.COLOR_RGB2BGR))
+
+def test_round_trip_dedup_and_reopen(tmp_path):
+    archive = SnapshotArchive(str(tmp_path / "archive"))
+    a, b = _img(1), _img(2)
+    ra = archive.add(a, captured=100.0, mouse=(5, 6), item_name="Sinking Sun Signet")
+    rb = archive.add(b, captured=200.0)
+    assert archive.add(a.copy(), captured=300.0) == ra           # mismo contenido, mismos bytes
+    assert (archive.added, archive.deduped) == (2, 1)
+    assert np.array_equal(archive.get(ra), a) and np.array_equal(archive.get(rb), b)
+    archive.close()
+
+    archive = SnapshotArchive(str(tmp_path / "archive"))
+    assert archive.count == 3 and archive.stats()["unique"] == 2
+    assert archive.find(since=150.0) == [1, 2]
+    assert archive.find(item="sinking sun signet") == [0]
+    r = archive.record(2)
+    assert r["ref"] == ra and r["time"] == 300.0 and r["size"] == (64, 48)
+    assert np.array_equal(archive.get(2), a)
+    archive.close()
+
+def test_migrate_deletes_only_verified_copies(tmp_path, monkeypatch):
+    archive = SnapshotArchive(str(tmp_path / "archive"))
+    good, bad = tmp_path / "tooltip_20250816_094940.png", tmp_path / "tooltip_20250816_094941.png"
+    _save(good, _img(3))
+    _save(bad, _img(4))
+    n, _ = migrate([str(good)], archive, crop=False, delete=True)
+    assert n == 1 and not good.exists()
+    assert np.array_equal(archive.get(0), _img(3))
+
+    monkeypatch.setattr(archive, "get", lambda key: np.zeros((48, 64, 3), np.uint8))   # copia corrupta
+    migrate([str(bad)], archive, crop=False, delete=True)
+    assert bad.exists()
+    archive.close()
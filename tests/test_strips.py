@@ -0,0 +1,34 @@
+import os, sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(ROOT)
+from ocr import frames, strips
+from ocr.detect_tooltip_cv import locate_tooltip
+from ocr.normalizer import snap, traits
+from ocr.parse_tooltip import parse_tooltip
+
+pytestmark = pytest.mark.usefixtures("ocr")
+
+def _crop(name):
+    img = frames.load(os.path.join(ROOT, "data", "snaps", name))
+    w, h = frames.size(img)
+    return frames.crop(img, locate_tooltip(img, (w, h // 2), (0, 0, w, h)).box).copy()
+
+def test_strips_read_a_learned_size():
+    a = _crop("tooltip_20250816_094940.png")
+    assert strips.learn(a, parse_tooltip(a, full=True)["analysis"])
+    r = strips.parse(a)
+    assert (r["item_name"], r["trait"]) == ("Infernal Demonpact Steps", "Melee Evasion")
+
+def test_stat_line_in_the_learned_trait_row_is_rejected():
+    a = _crop("tooltip_20250816_094940.png")
+    assert strips.learn(a, parse_tooltip(a, full=True)["analysis"])
+    # mismo tamaño, otro bloque de stats: "Max Health 225" (y 264) cae en la fila del trait (y 394)
+    b = a.copy()
+    b[340:420] = a[210:290]
+    layout = strips.get_layouts().get(frames.size(b))
+    words, _ = strips._read(frames.gray(b), tuple(layout["trait"]), "trait", "eng")
+    assert snap(" ".join(w["text"] for w in words), traits())[0] == "Max Health"
+    assert strips.parse(b) is None
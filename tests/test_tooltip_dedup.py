@@ -0,0 +1,55 @@
+import os, sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(ROOT)
+from ocr import frames
+from ocr.detect_tooltip_cv import locate_tooltip
+from ocr.tooltip_dedup import DedupIndex, dhash, hamming, text_rows
+
+pytestmark = pytest.mark.usefixtures("ocr")
+
+SNAPS = os.path.join(ROOT, "data", "snaps")
+
+def _crop(name):
+    img = frames.load(os.path.join(SNAPS, name))
+    w, h = frames.size(img)
+    cand = locate_tooltip(img, (w, h // 2), (0, 0, w, h))
+    return frames.crop(img, cand.box).copy()
+
+# 094940: nombre en las filas 70-87 y trait ("Melee Evasion") en 394-406
+ROWS = text_rows((79, 70, 280, 87), (38, 394, 171, 406))
+
+def test_same_tooltip_is_a_hit():
+    a = _crop("tooltip_20250816_094940.png")
+    index = DedupIndex()
+    index.add(dhash(a), frames.size(a), {"trait": "Melee Evasion"}, a, ROWS)
+    assert index.lookup(dhash(a), frames.size(a), a.copy()) == {"trait": "Melee Evasion"}
+
+def test_crops_that_differ_only_in_trait_do_not_match():
+    a = _crop("tooltip_20250816_094940.png")
+    other = _crop("tooltip_20250816_094934.png")   # trait "Mana Regen" en 579-593
+    b = a.copy()
+    b[390:410, 30:200] = other[575:595, 30:200]
+    index = DedupIndex()
+    assert hamming(dhash(a), dhash(b)) <= index.max_distance   # el hash global no los separa
+    index.add(dhash(a), frames.size(a), {"trait": "Melee Evasion"}, a, ROWS)
+    assert index.lookup(dhash(b), frames.size(b), b) is None
+    assert index.stats()["rejected"] == 1
+
+def test_entries_without_text_rows_are_not_indexed():
+    a = _crop("tooltip_20250816_094940.png")
+    index = DedupIndex()
+    assert not index.add(dhash(a), frames.size(a), {}, a, text_rows(None, None))
+    assert index.lookup(dhash(a), frames.size(a), a) is None
+
+def test_shifted_crop_of_same_tooltip_is_a_hit():
+    img = frames.load(os.path.join(SNAPS, "tooltip_20250816_094940.png"))
+    w, h = frames.size(img)
+    x1, y1, x2, y2 = locate_tooltip(img, (w, h // 2), (0, 0, w, h)).box
+    a = frames.crop(img, (x1, y1, x2, y2))
+    b = frames.crop(img, (x1 + 1, y1 + 1, x2 + 1, y2 + 1))
+    index = DedupIndex()
+    index.add(dhash(a), frames.size(a), {"trait": "Melee Evasion"}, a, ROWS)
+    assert index.lookup(dhash(b), frames.size(b), b) == {"trait": "Melee Evasion"}
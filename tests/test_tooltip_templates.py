@@ -0,0 +1,32 @@
+import fnmatch, os, sys
+
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(ROOT)
+from ocr import tooltip_templates
+
+def test_missing_templates_are_not_built_on_locate(tmp_path, monkeypatch):
+    monkeypatch.setattr(tooltip_templates, "TEMPLATES_PATH", str(tmp_path / "none.npz"))
+    monkeypatch.setattr(tooltip_templates, "_templates", None)
+    builds = []
+    monkeypatch.setattr(tooltip_templates, "build_templates", lambda *a, **k: builds.append(1))
+    img = np.zeros((400, 600, 3), np.uint8)
+    for _ in range(5):
+        assert tooltip_templates.locate(img, (600, 200), (0, 0, 600, 400)) is None
+    assert builds == []
+
+def test_failed_build_is_not_retried(tmp_path, monkeypatch):
+    monkeypatch.setattr(tooltip_templates, "TEMPLATES_PATH", str(tmp_path / "none.npz"))
+    monkeypatch.setattr(tooltip_templates, "_templates", None)
+    monkeypatch.setattr(tooltip_templates, "_build_tried", False)
+    builds = []
+    monkeypatch.setattr(tooltip_templates, "build_templates", lambda *a, **k: builds.append(1))
+    for _ in range(3):
+        assert tooltip_templates.ensure_templates() is None
+    assert builds == [1]
+
+def test_reference_glob_skips_capture_crops():
+    pattern = os.path.basename(tooltip_templates.REFS_GLOB)
+    assert fnmatch.fnmatch("tooltip_20250816_094940.png", pattern)
+    assert not fnmatch.fnmatch("tooltip_20250816_094940_123.png", pattern)
@@ -0,0 +1,56 @@
+import os, sys
+
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(ROOT)
+from ocr.detect_tooltip_cv import Candidate
+from ocr.tooltip_tracker import TooltipTracker
+
+W, H = 640, 480
+SIZE = (200, 150)          # tooltip a la izquierda y por encima del mouse
+
+def _frame(mouse, border=180, seed=0):
+    """Fondo con ruido y un panel oscuro con marco `border` pegado al mouse."""
+    img = np.random.default_rng(seed).integers(0, 256, (H, W, 3), dtype=np.uint8)
+    x2, y2 = mouse[0] - 10, mouse[1] + 20
+    x1, y1 = x2 - SIZE[0], y2 - SIZE[1]
+    img[y1:y2, x1:x2] = 25
+    img[y1:y1 + 3, x1:x2] = img[y2 - 3:y2, x1:x2] = border
+    img[y1:y2, x1:x1 + 3] = img[y1:y2, x2 - 3:x2] = border
+    return img, (x1, y1, x2, y2)
+
+class _Detector:
+    """Detección completa falsa: devuelve la caja real y cuenta las llamadas."""
+    def __init__(self):
+        self.calls = 0
+        self.box = None
+
+    def __call__(self, img, mouse_abs, bbox_abs):
+        self.calls += 1
+        x1, y1, x2, y2 = self.box
+        return Candidate(box=self.box, area=(x2 - x1) * (y2 - y1), aspect=(x2 - x1) / (y2 - y1),
+                         score=1.0, geo_score=1.0)
+
+def test_same_panel_next_to_the_moved_mouse_is_a_hit():
+    tracker, detect = TooltipTracker(), _Detector()
+    img, detect.box = _frame((400, 300))
+    assert tracker.locate(img, (400, 300), (0, 0, W, H), detect=detect).box == detect.box
+    # el cursor se mueve a otro item con un tooltip del mismo tamaño; el fondo cambia
+    img2, box2 = _frame((450, 260), seed=1)
+    assert tracker.locate(img2, (450, 260), (0, 0, W, H), detect=detect).box == box2
+    assert detect.calls == 1
+    s = tracker.stats()
+    assert (s["lookups"], s["hits"], s["misses"]) == (2, 1, 1) and s["hit_rate"] == 0.5
+
+def test_different_panel_falls_back_to_detection():
+    tracker, detect = TooltipTracker(), _Detector()
+    img, detect.box = _frame((400, 300))
+    tracker.locate(img, (400, 300), (0, 0, W, H), detect=detect)
+    img2, detect.box = _frame((400, 300), border=90, seed=1)      # otro marco en el mismo sitio
+    assert tracker.locate(img2, (400, 300), (0, 0, W, H), detect=detect).box == detect.box
+    img3, _ = _frame((400, 300), seed=2)
+    img3[:] = np.random.default_rng(3).integers(0, 256, img3.shape, dtype=np.uint8)   # sin tooltip
+    detect.box = (0, 0, 10, 10)
+    tracker.locate(img3, (400, 300), (0, 0, W, H), detect=detect)
+    assert detect.calls == 3 and tracker.stats()["hits"] == 0
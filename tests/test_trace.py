@@ -0,0 +1,21 @@
+import os, sys
+from concurrent.futures import ThreadPoolExecutor
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(ROOT)
+from ocr import trace
+
+def _work():
+    with trace.span("strip"):
+        trace.count("tesseract_calls")
+    return trace.current()
+
+def test_pool_tasks_record_on_the_submitting_trace():
+    tr = trace.Trace("capture")
+    with ThreadPoolExecutor(max_workers=2) as pool, trace.active(tr):
+        got = [trace.submit(pool, _work).result() for _ in range(3)]
+        plain = pool.submit(_work).result()   # sin submit() el hilo del pool no ve la traza
+    assert got == [tr] * 3 and plain is None
+    assert tr.counters == {"tesseract_calls": 3}
+    assert [s["name"] for s in tr.spans] == ["strip"] * 3
+    assert trace.current() is None